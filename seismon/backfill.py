@@ -0,0 +1,149 @@
+#!/usr/bin/python
+
+"""Resumable, parallel backfills.
+
+A backfill is a list of independent work units (a catalogue month, a PDL
+event folder, ...), each with a string key.  run_units runs them in a
+process pool and records the key of every finished unit in a small
+append-only state file, so an interrupted backfill started again with
+the same state file skips the units it already did.  Files written by
+the units go through atomic_write, so a crash never leaves a partially
+written file behind.
+"""
+
+import os, tempfile, contextlib, multiprocessing
+
+def load_state(stateFile):
+    """@keys of the units a state file records as done.
+
+    @param stateFile
+        state file (missing means nothing done yet)
+    """
+
+    done = set()
+    if stateFile is None or not os.path.isfile(stateFile):
+        return done
+    with open(stateFile) as f:
+        for line in f:
+            # a line cut short by a crash has no newline and does not count
+            if line.endswith("\n"):
+                done.add(line[:-1])
+    return done
+
+def mark_done(stateFile,key):
+    """@record a finished unit.
+
+    @param stateFile
+        state file
+    @param key
+        unit key (one line, no newlines)
+    """
+
+    with open(stateFile,"a") as f:
+        f.write("%s\n"%key)
+        f.flush()
+        os.fsync(f.fileno())
+
+def _umask():
+    """@the process umask (read without changing it where /proc allows)
+    """
+
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1],8)
+    except (IOError, OSError, ValueError):
+        pass
+    umask = os.umask(0o022)
+    os.umask(umask)
+    return umask
+
+def file_mode(filename):
+    """@permissions a rewrite of filename should get: those of the existing
+    file, or what open() would give a new one (0666 less the umask).
+
+    @param filename
+        file name
+    """
+
+    try:
+        return os.stat(filename).st_mode & 0o7777
+    except FileNotFoundError:
+        return 0o666 & ~_umask()
+
+@contextlib.contextmanager
+def atomic_write(filename,mode="w"):
+    """@open a temporary file next to filename and rename it into place on
+    success (and remove it on failure).  The file ends up with the
+    permissions open() would have left it with.
+
+    @param filename
+        final file name
+    @param mode
+        "w" or "wb"
+    """
+
+    directory = os.path.dirname(os.path.abspath(filename))
+    fd, tmpFile = tempfile.mkstemp(dir=directory, prefix=".%s."%os.path.basename(filename),
+                                   suffix=".tmp")
+    try:
+        # mkstemp creates the file 0600
+        os.fchmod(fd, file_mode(filename))
+        with os.fdopen(fd, mode) as f:
+            yield f
+        os.replace(tmpFile, filename)
+    except BaseException:
+        if os.path.exists(tmpFile):
+            os.remove(tmpFile)
+        raise
+
+def _run_unit(task):
+    worker, key, args = task
+    return key, worker(*args)
+
+def run_units(units,worker,jobs=1,stateFile=None,callback=None):
+    """@run work units, skipping those the state file records as done.
+
+    Returns the results of the units that ran, keyed by unit key.
+
+    @param units
+        list of (key, args) pairs; worker(*args) runs one unit
+    @param worker
+        module-level function (it is pickled to the pool)
+    @param jobs
+        number of worker processes (1 runs in this process)
+    @param stateFile
+        optional state file that makes the backfill resumable
+    @param callback
+        optional callback(key, result) run here, in completion order,
+        before the unit is recorded as done
+    """
+
+    done = load_state(stateFile)
+    tasks = [(worker, key, args) for key, args in units if not key in done]
+
+    results = {}
+    def finish(key, result):
+        results[key] = result
+        if callback is not None:
+            callback(key, result)
+        if stateFile is not None:
+            mark_done(stateFile, key)
+
+    if jobs <= 1:
+        for task in tasks:
+            finish(*_run_unit(task))
+    else:
+        pool = multiprocessing.Pool(jobs)
+        try:
+            for key, result in pool.imap_unordered(_run_unit, tasks):
+                finish(key, result)
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+    return results
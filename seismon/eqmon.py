@@ -1,11 +1,14 @@
 #!/usr/bin/python
 
-import os, sys, time, glob, math, matplotlib, random, string
+import os, sys, time, glob, math, matplotlib
 import csv
 import pickle
+import hashlib
 import calendar
 import re
 import json
+import sqlite3
+import urllib.request
 
 matplotlib.use('Agg') 
 matplotlib.rcParams.update({'font.size': 18})
@@ -28,10 +31,10 @@ import smtplib, email.mime.text
 from scipy.spatial.distance import cdist
 from scipy.special import  erf
 
-import astropy.time
 #import lal.gpstime
 
-import seismon.utils, seismon.eqmon_plot
+import seismon.utils, seismon.eqmon_plot, seismon.traveltimes, seismon.gpstime
+import seismon.psdstore, seismon.textarchive, seismon.backfill, seismon.geojson
 
 try:
     import gwpy.time, gwpy.timeseries, gwpy.frequencyseries
@@ -47,28 +50,290 @@ except:
 
 ############################# makePredictionsV3.py #############################
 
+# process-wide cache of parsed training catalogues, keyed by file path
+_catalogue_cache = {}
+
+def load_catalogue(trainFile,sidecar=False):
+    """@load training catalogue into contiguous column arrays.
+
+    The catalogue is parsed once per process and kept resident; it is
+    re-read only if the file's mtime or size changes.  Numeric columns
+    are float64; the others (time, id, place, ...) are kept as parsed,
+    so the rows make_prediction hands back carry every column.
+
+    @param trainFile
+        training catalogue csv file
+    @param sidecar
+        read (and write) a pre-parsed .npz copy next to the csv
+    """
+
+    stat = os.stat(trainFile)
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _catalogue_cache.get(trainFile)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    sidecarFile = "%s.npz"%os.path.splitext(trainFile)[0]
+    catalogue = None
+    if sidecar and os.path.isfile(sidecarFile) and \
+        os.stat(sidecarFile).st_mtime_ns >= stat.st_mtime_ns:
+        try:
+            catalogue = read_catalogue_sidecar(sidecarFile)
+        except (OSError, ValueError, KeyError):
+            print("Could not read catalogue sidecar %s"%sidecarFile)
+
+    if catalogue is None:
+        data = pd.read_csv(trainFile)
+        numeric = data.select_dtypes(include=[np.number]).columns
+        catalogue = {}
+        for name in data.columns:
+            if name in numeric:
+                catalogue[name] = np.ascontiguousarray(data[name].values, dtype=np.float64)
+            else:
+                # pandas may hand back its own string arrays
+                catalogue[name] = data[name].to_numpy(dtype=object)
+        if sidecar:
+            try:
+                write_catalogue_sidecar(sidecarFile,catalogue)
+            except OSError:
+                print("Could not write catalogue sidecar %s"%sidecarFile)
+
+    _catalogue_cache[trainFile] = (key, catalogue)
+    return catalogue
+
+def write_catalogue_sidecar(sidecarFile,catalogue):
+    """@write a parsed catalogue as an .npz (no pickled objects)
+
+    Text columns are stored as unicode arrays next to a mask of the
+    entries that were missing in the csv.
+
+    @param sidecarFile
+        .npz file
+    @param catalogue
+        catalogue from load_catalogue
+    """
+
+    arrays = {"columns": np.array(list(catalogue), dtype=str)}
+    for ii, (name, values) in enumerate(catalogue.items()):
+        if values.dtype == object:
+            missing = pd.isnull(values)
+            arrays["text%d"%ii] = np.where(missing, "", values).astype(str)
+            arrays["missing%d"%ii] = missing
+        else:
+            arrays["column%d"%ii] = values
+    with seismon.backfill.atomic_write(sidecarFile,"wb") as f:
+        np.savez(f, **arrays)
+
+def read_catalogue_sidecar(sidecarFile):
+    """@catalogue written by write_catalogue_sidecar
+
+    @param sidecarFile
+        .npz file
+    """
+
+    catalogue = {}
+    with np.load(sidecarFile, allow_pickle=False) as data:
+        for ii, name in enumerate(data["columns"].tolist()):
+            if "column%d"%ii in data.files:
+                catalogue[name] = np.ascontiguousarray(data["column%d"%ii], dtype=np.float64)
+            else:
+                values = data["text%d"%ii].astype(object)
+                values[data["missing%d"%ii]] = np.nan
+                catalogue[name] = values
+    return catalogue
+
+def clear_catalogue_cache():
+    """@drop all cached training catalogues.
+    """
+
+    _catalogue_cache.clear()
+    _catalogue_index_cache.clear()
+
+# spatial indexes over the cached catalogues, keyed by file path
+_catalogue_index_cache = {}
+
+def build_catalogue_index(trainData):
+    """@build a spatial neighbour index over the catalogue locations.
+
+    The (latitude, longitude) features are whitened with the Cholesky
+    factor of the inverse catalogue covariance so that Euclidean distance
+    in the cKDTree equals the catalogue Mahalanobis distance.
+
+    @param trainData
+        training catalogue (DataFrame or load_catalogue arrays)
+    """
+
+    features = np.column_stack((np.asarray(trainData['latitude'], dtype=np.float64),
+                                np.asarray(trainData['longitude'], dtype=np.float64)))
+    n = features.shape[0]
+
+    center = np.mean(features, axis=0)
+    centered = features - center
+    scatter = np.dot(centered.T, centered)
+    whiten = np.linalg.cholesky(np.linalg.inv(scatter / (n-1)))
+
+    index = {}
+    index["features"] = features
+    index["center"] = center
+    index["whiten"] = whiten
+    index["tree"] = scipy.spatial.cKDTree(np.dot(centered, whiten))
+    return index
+
+def load_catalogue_index(trainFile):
+    """@load (and cache) the spatial index of a training catalogue.
+
+    @param trainFile
+        training catalogue csv file
+    """
+
+    catalogue = load_catalogue(trainFile)
+    cached = _catalogue_index_cache.get(trainFile)
+    if cached is not None and cached[0] is catalogue:
+        return cached[1]
+
+    index = build_catalogue_index(catalogue)
+    _catalogue_index_cache[trainFile] = (catalogue, index)
+    return index
+
+def catalogue_neighbours(index,lat,lon,thresh):
+    """@catalogue rows within a Mahalanobis distance of a query point.
+
+    Distances match cdist(features,[[lat,lon]],'mahalanobis'), whose
+    covariance also includes the query point.  That covariance is never
+    smaller than (n-1)/n of the catalogue one plus a rank-one term, which
+    bounds how far out in whitened space a neighbour can be; the tree is
+    queried with that radius and the candidates are then refined exactly.
+
+    Returns (rows, distances) sorted by distance.
+
+    @param index
+        catalogue index from build_catalogue_index
+    @param lat, lon
+        query point
+    @param thresh
+        Mahalanobis distance threshold
+    """
+
+    features = index["features"]
+    n = features.shape[0]
+    query = np.array([lat, lon], dtype=np.float64)
+
+    offset = np.dot(query - index["center"], index["whiten"])
+    radius = thresh * np.sqrt((n-1.0)/n + np.dot(offset, offset)/(n+1.0))
+    candidates = np.array(index["tree"].query_ball_point(offset, radius*(1+1e-9)),
+                          dtype=int)
+    if candidates.size == 0:
+        return candidates, np.zeros(0)
+
+    VI = mahalanobis_inverse_covariances(features, query)[0]
+    P = cdist(features[candidates], [query], 'mahalanobis', VI=VI).ravel()
+    order = np.argsort(P)
+    keep = P[order] <= thresh
+    return candidates[order][keep], P[order][keep]
+
+def makePredictions(trainFile,mag,lat,lon,dist,depth,azi,
+                                        siteLat=30.562894,siteLon=-90.774242,
+                                        thresh=0.1,predictor='peak_data_um_mean_subtracted',
+                                        locklossMotionThresh=10*1e-6,
+                                        testFile=None,predictionFile=None):
+    """@predict ground motion amplitude and lockloss for one event.
+
+    Features go in and the prediction comes out in memory; nothing is
+    written unless testFile / predictionFile are given (debug only).
+
+    @param trainFile
+        training catalogue csv file
+    @param mag, lat, lon, dist, depth, azi
+        event features
+    @param siteLat, siteLon
+        site location
+    @param testFile
+        optional csv to write the feature vector to
+    @param predictionFile
+        optional csv to write the prediction to
+    """
+
+    trainData = load_catalogue(trainFile,sidecar=True)
+    index = load_catalogue_index(trainFile)
+    (predicted_peak_amplitude,LocklossTag,Rfamp_sigma,LocklossTag_sigma,TD) = make_prediction(trainData,lat,lon,mag,depth,siteLat,siteLon,thresh,predictor,locklossMotionThresh,index=index)
+
+    if testFile is not None:
+        pd.DataFrame({'mag':[mag],'latitude':[lat],'longitude':[lon],
+                      'dist':[dist],'depth':[depth],'azi':[azi]}).to_csv(testFile,index=False)
+    if predictionFile is not None:
+        pd.DataFrame({'Rfamp':[predicted_peak_amplitude],'Lockloss':[LocklossTag],
+                      'Rfamp_sigma':[Rfamp_sigma],'Lockloss_sigma':[LocklossTag_sigma]}).to_csv(predictionFile,index=False)
+
+    return predicted_peak_amplitude,LocklossTag,Rfamp_sigma,LocklossTag_sigma
+
+def makePredictionsGrid(trainFile,mag,lat,lon,depth,
+                                        siteLat=30.562894,siteLon=-90.774242,
+                                        thresh=0.1,predictor='peak_data_um_mean_subtracted',
+                                        locklossMotionThresh=10*1e-6):
+    """@predictions for a whole grid of feature vectors in one call.
+
+    Rows sharing the same (lat, lon, mag, depth) are evaluated once, all
+    together by make_prediction_batch, and the result is scattered back,
+    so the output matches calling makePredictions for every row.
+
+    @param trainFile
+        training catalogue csv file
+    @param mag, lat, lon, depth
+        event features (arrays, one entry per grid point)
+    @param siteLat, siteLon
+        site location
+    """
+
+    trainData = load_catalogue(trainFile,sidecar=True)
+
+    features = np.column_stack(np.broadcast_arrays(
+        *[np.atleast_1d(np.asarray(x, dtype=np.float64))
+          for x in (lat, lon, mag, depth)]))
+    unique, inverse = np.unique(features, axis=0, return_inverse=True)
+
+    predictions = np.column_stack(make_prediction_batch(
+        trainData,unique[:,0],unique[:,1],unique[:,2],unique[:,3],
+        siteLat,siteLon,thresh,predictor,locklossMotionThresh))
+
+    predictions = predictions[inverse.ravel()]
+    return predictions[:,0],predictions[:,1],predictions[:,2],predictions[:,3]
+
 def makePredictionsV3(trainFile,testFile,predictionFile,mag,lat,lon,dist,depth,azi,
                                         siteLat=30.562894,siteLon=-90.774242,
                                         thresh=0.1,predictor='peak_data_um_mean_subtracted',
                                         locklossMotionThresh=10*1e-6):
-    trainData = pd.read_csv(trainFile)
-    (predicted_peak_amplitude,LocklossTag,Rfamp_sigma,LocklossTag_sigma,TD) = make_prediction(trainData,lat,lon,mag,depth,siteLat,siteLon,thresh,predictor,locklossMotionThresh)
-    return predicted_peak_amplitude,LocklossTag,Rfamp_sigma,LocklossTag_sigma
+    """@file-based signature kept for existing callers; see makePredictions.
+    """
+
+    return makePredictions(trainFile,mag,lat,lon,dist,depth,azi,
+                           siteLat=siteLat,siteLon=siteLon,
+                           thresh=thresh,predictor=predictor,
+                           locklossMotionThresh=locklossMotionThresh,
+                           testFile=testFile,predictionFile=predictionFile)
 
 #--------------------  makePredictionsV3.py : Sub-functions -----------------------#
 
 
 
-def make_prediction(trainData,lat,lon,mag,depth,siteLat,siteLon,thresh,predictor,locklossMotionThresh):
+def make_prediction(trainData,lat,lon,mag,depth,siteLat,siteLon,thresh,predictor,locklossMotionThresh,index=None):
     #Get Mahalanobis Dist of test point from the training points (Ref: N. Mukund et al. DOI: 10.1088/1361-6382/ab0d2c)
 
-    P = cdist(trainData[['latitude','longitude']].values,
-              [[lat,lon]],'mahalanobis').ravel()    
-    # Sort as per minimum distance
-    Val = np.sort(P,axis=0)
-    ID  = np.argsort(P,axis=0)
-    # Select events within a threshold [LOCATION]
+    # trainData is either a DataFrame or a cached catalogue (see load_catalogue)
+    if not isinstance(trainData, pd.DataFrame):
+        trainData = pd.DataFrame(trainData, copy=False)
+
     Val_thresh = thresh # 0.1
+    if index is not None:
+        # only look at catalogue rows that can be within the threshold
+        ID, Val = catalogue_neighbours(index,lat,lon,Val_thresh)
+    if index is None or ID.size == 0:
+        P = cdist(trainData[['latitude','longitude']].values,
+                  [[lat,lon]],'mahalanobis').ravel()    
+        # Sort as per minimum distance
+        Val = np.sort(P,axis=0)
+        ID  = np.argsort(P,axis=0)
+    # Select events within a threshold [LOCATION]
     Val_idx = np.where(Val <= Val_thresh)[0]
     # deal with empty arrays
     if Val_idx.size==0:
@@ -116,6 +381,109 @@ def scaleFac(m1,r1,h1,m2,r2,h2,b=1.31,c=4672.83,d=0.81):
     scaleFac = m1*(1.0/m2) * ( 10**(0.5*b*(m1-m2)) ) * (((r2) * (1.0/r1))**d)  * (np.exp(1))**(2*np.pi*(1.0/c)* (  (h2* 10**(2.3-0.5*m2) ) - (h1*10**(2.3-0.5*m1) )   )  )
     return scaleFac
 
+def mahalanobis_inverse_covariances(features,queries):
+    """@inverse covariance seen by cdist(features,[query],'mahalanobis').
+
+    scipy estimates the covariance from the catalogue rows stacked with
+    the query point, so every query gets its own matrix.  It is obtained
+    from the catalogue scatter matrix with a rank-one update.
+
+    @param features
+        (n,k) catalogue features
+    @param queries
+        (m,k) query points
+    """
+
+    features = np.asarray(features, dtype=np.float64)
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float64))
+    n = features.shape[0]
+
+    center = np.mean(features, axis=0)
+    centered = features - center
+    scatter = np.dot(centered.T, centered)
+    offsets = queries - center
+
+    cov = (scatter[np.newaxis,:,:] + (float(n)/(n+1)) *
+           offsets[:,:,np.newaxis] * offsets[:,np.newaxis,:]) / n
+    return np.linalg.inv(cov)
+
+def make_prediction_batch(trainData,lat,lon,mag,depth,siteLat,siteLon,thresh,predictor,locklossMotionThresh,maxElements=2**22):
+    """@vectorized make_prediction over many (event, site) pairs.
+
+    Returns the same amplitudes and lockloss tags as calling
+    make_prediction once per query point.
+
+    @param trainData
+        training catalogue (DataFrame or load_catalogue arrays)
+    @param lat, lon, mag, depth
+        event parameters (arrays of query points)
+    @param siteLat, siteLon
+        site location (arrays of query points)
+    @param thresh
+        Mahalanobis distance threshold for neighbour selection
+    @param predictor
+        catalogue column to predict
+    @param locklossMotionThresh
+        ground motion [m/s] above which lockloss is predicted
+    @param maxElements
+        maximum number of query x catalogue elements held per chunk
+    """
+
+    lat, lon, mag, depth, siteLat, siteLon = np.broadcast_arrays(
+        *[np.atleast_1d(np.asarray(x, dtype=np.float64))
+          for x in (lat, lon, mag, depth, siteLat, siteLon)])
+
+    trainLat = np.asarray(trainData['latitude'], dtype=np.float64)
+    trainLon = np.asarray(trainData['longitude'], dtype=np.float64)
+    trainMag = np.asarray(trainData['mag'], dtype=np.float64)
+    trainDepth = np.asarray(trainData['depth'], dtype=np.float64)
+    trainPredictor = np.asarray(trainData[predictor], dtype=np.float64)
+
+    features = np.column_stack((trainLat, trainLon))
+    queries = np.column_stack((lat, lon))
+    VI = mahalanobis_inverse_covariances(features, queries)
+
+    numQueries = len(lat)
+    chunk = max(1, int(maxElements // len(trainLat)))
+
+    predicted_peak_amplitude = np.zeros(numQueries)
+    for start in range(0, numQueries, chunk):
+        sl = slice(start, min(start+chunk, numQueries))
+
+        diff = features[np.newaxis,:,:] - queries[sl,np.newaxis,:]
+        P = np.sqrt(np.einsum('qnk,qkl,qnl->qn', diff, VI[sl], diff))
+
+        # Select events within a threshold, or all of them if none are
+        mask = P <= thresh
+        mask[~np.any(mask, axis=1),:] = True
+
+        gcDist = degrees2kilometers(locations2degrees(
+            trainLat[np.newaxis,:], trainLon[np.newaxis,:],
+            siteLat[sl,np.newaxis], siteLon[sl,np.newaxis]))
+        gcDistEvent = degrees2kilometers(locations2degrees(
+            lat[sl], lon[sl], siteLat[sl], siteLon[sl]))
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            scalingFac = scaleFac(mag[sl,np.newaxis], gcDistEvent[:,np.newaxis],
+                                  depth[sl,np.newaxis], trainMag[np.newaxis,:],
+                                  gcDist, trainDepth[np.newaxis,:])
+            weights = 1.0/P
+            numerator = np.sum(np.where(mask, weights*trainPredictor*scalingFac, 0.0), axis=1)
+            denominator = np.sum(np.where(mask, weights, 0.0), axis=1)
+            predicted_peak_amplitude[sl] = numerator / denominator
+
+    bad = np.isnan(predicted_peak_amplitude) | (predicted_peak_amplitude <= 0.0)
+    predicted_peak_amplitude[bad] = 1e-9
+
+    # Results (compatible with seismon client)
+    Rfamp = predicted_peak_amplitude*1e-6
+    LocklossTag = (Rfamp > locklossMotionThresh).astype(int)
+    # Set standard deviations (currently set to 0)
+    Rfamp_sigma = np.zeros(numQueries)
+    LocklossTag_sigma = np.zeros(numQueries)
+
+    return(predicted_peak_amplitude,LocklossTag,Rfamp_sigma,LocklossTag_sigma)
+
     
 ############################# --------------------------- #############################
 
@@ -129,6 +497,8 @@ def run_earthquakes(params,segment):
         [start,end] gps
     """
 
+    use_predictd(params)
+
     gpsStart = segment[0]
     gpsEnd = segment[1]
 
@@ -340,6 +710,8 @@ def run_earthquakes_info(params,segment):
         [start,end] gps
     """
 
+    use_predictd(params)
+
     gpsStart = segment[0]
     gpsEnd = segment[1]
 
@@ -368,19 +740,13 @@ def run_earthquakes_info(params,segment):
             epics_dicts[ifoShort]["amp"] = 0
             epics_dicts[ifoShort]["mult"] = 0
 
-    csvFile = os.path.join(scriptpath,"countries.csv")
-    abbreviations, latitudes, longitudes, countries = [], [], [], []
-    with open(csvFile,'r',encoding='utf-8') as f:
-        reader=csv.reader(f,delimiter='\t')
-        for abb,lat,lon,country in reader:
-            abbreviations.append(abb)
-            latitudes.append(float(lat))
-            longitudes.append(float(lon))
-            countries.append(country)
-    latitudes, longitudes = np.array(latitudes), np.array(longitudes)
+    countriesTable = load_countries(os.path.join(scriptpath,"countries.csv"))
+    eventCountries = nearest_country(countriesTable,
+                                     [attributeDic["Latitude"] for attributeDic in attributeDics],
+                                     [attributeDic["Longitude"] for attributeDic in attributeDics])
 
     params["path_temp"] = "%s_temp"%params["path"]
-    for attributeDic in attributeDics:
+    for attributeDic, country in zip(attributeDics,eventCountries):
         if attributeDic["eventID"] == "None":
             eventID = "%.0f"%attributeDic['GPS']
             eventName = ''.join(["iris",str(eventID)])
@@ -410,21 +776,12 @@ def run_earthquakes_info(params,segment):
                 locationstr = ", ".join(filter(None,locationstr.split(", ")))
                 locationstr = locationstr.replace(", ",",").replace(" ","_")
                 if locationstr == "":
-                    distances = distance_latlon(attributeDic["Latitude"],attributeDic["Longitude"],latitudes, longitudes)
-                    idx = np.argmin(distances)
-                    country = countries[idx]
                     locationstr = "Offshore of %s"%country
                     locationstr = locationstr.replace(", ",",").replace(" ","_")
             else:
-                distances = distance_latlon(attributeDic["Latitude"],attributeDic["Longitude"],latitudes, longitudes)
-                idx = np.argmin(distances)
-                country = countries[idx]
                 locationstr = "Offshore of %s"%country
                 locationstr = locationstr.replace(", ",",").replace(" ","_")
         else:
-            distances = distance_latlon(attributeDic["Latitude"],attributeDic["Longitude"],latitudes, longitudes)
-            idx = np.argmin(distances)
-            country = countries[idx]
             locationstr = "%s"%country
             locationstr = locationstr.replace(", ",",").replace(" ","_")
 
@@ -512,6 +869,59 @@ def run_earthquakes_info(params,segment):
             plot.save(plotName)
             plt.close()
 
+def find_coincident_events(gps,window):
+    """@indexes of events preceded (in list order) by an event closer in time.
+
+    Returns, in increasing order, every j for which some i < j has
+    |gps[i] - gps[j]| < window.  The events are sorted once and the
+    smallest index inside each event's time window comes from a
+    sparse-table range minimum, so this is O(n log n).
+
+    @param gps
+        event GPS times
+    @param window
+        coincidence window [s]
+    """
+
+    gps = np.asarray(gps, dtype=np.float64)
+    num = len(gps)
+    if num == 0 or not window > 0:
+        return np.array([], dtype=np.int64)
+
+    order = np.argsort(gps, kind='stable')
+    gpsSorted = gps[order]
+
+    # [lo, hi) brackets the sorted events within the window of each event;
+    # step the edges with the same difference test as the pairwise loop
+    lo = np.searchsorted(gpsSorted, gps - window, side='right')
+    hi = np.searchsorted(gpsSorted, gps + window, side='left')
+    while True:
+        grow = (lo > 0) & (np.absolute(gps - gpsSorted[np.maximum(lo-1,0)]) < window)
+        shrink = (lo < num) & ~(np.absolute(gps - gpsSorted[np.minimum(lo,num-1)]) < window)
+        if not (np.any(grow) or np.any(shrink)):
+            break
+        lo = lo - grow + shrink
+    while True:
+        grow = (hi < num) & (np.absolute(gps - gpsSorted[np.minimum(hi,num-1)]) < window)
+        shrink = (hi > 0) & ~(np.absolute(gps - gpsSorted[np.maximum(hi-1,0)]) < window)
+        if not (np.any(grow) or np.any(shrink)):
+            break
+        hi = hi + grow - shrink
+
+    table = [order]
+    while 2**len(table) <= num:
+        step = 2**(len(table)-1)
+        table.append(np.minimum(table[-1][:-step], table[-1][step:]))
+
+    levels = np.frexp(hi - lo)[1] - 1
+    firstIndex = np.empty(num, dtype=order.dtype)
+    for level in np.unique(levels):
+        mask = levels == level
+        firstIndex[mask] = np.minimum(table[level][lo[mask]],
+                                      table[level][hi[mask]-2**level])
+
+    return np.nonzero(firstIndex < np.arange(num))[0]
+
 def run_earthquakes_analysis(params,segment):
     """@run earthquakes analysis.
 
@@ -531,19 +941,9 @@ def run_earthquakes_analysis(params,segment):
     attributeDics = seismon.utils.read_eqmons(earthquakesXMLFile)
 
     minDiff = 10*60
-    coincident = []
-    for i in range(len(attributeDics)):
-        attributeDic1 = attributeDics[i]
-        for j in range(len(attributeDics)):
-            if j <= i:
-                continue
-            attributeDic2 = attributeDics[j]
-            gpsDiff = attributeDic1["GPS"] - attributeDic2["GPS"]
-            if np.absolute(gpsDiff) < minDiff:
-                coincident.append(j)
-    coincident = list(set(coincident))
+    coincident = find_coincident_events([attributeDic["GPS"] for attributeDic in attributeDics],minDiff)
     print("%d coincident earthquakes"%len(coincident))
-    indexes = list(set(range(len(attributeDics))) - set(coincident))
+    indexes = np.setdiff1d(np.arange(len(attributeDics)),coincident)
     attributeDicsKeep = []
     for index in indexes:
         attributeDicsKeep.append(attributeDics[index])
@@ -791,8 +1191,7 @@ def loadPredictions(params,segment):
     gpsEnd = segment[1]
 
     predictionDirectory = params["dirPath"] + "/Text_Files/Prediction/"
-    files = glob.glob(os.path.join(predictionDirectory,"*.txt"))
-    files = sorted(files)
+    files = seismon.textarchive.list_files(predictionDirectory)
 
     ttStart = []
     ttEnd = []
@@ -813,7 +1212,7 @@ def loadPredictions(params,segment):
         ttStart.append(thisTTStart)
         ttEnd.append(thisTTEnd)
 
-        data_out = np.loadtxt(file)
+        data_out = seismon.textarchive.loadtxt(file)
         thisAmp = data_out
 
         amp.append(thisAmp)
@@ -917,10 +1316,10 @@ def loadEarthquakeChannels(params,attributeDic):
         earthquakesDirectory = params["dirPath"] + "/Text_Files/Earthquakes/" + channel.station_underscore + "/" + str(params["fftDuration"])
         earthquakesFile = os.path.join(earthquakesDirectory,"%s.txt"%(attributeDic["eventName"]))
 
-        if not os.path.isfile(earthquakesFile):
+        if not seismon.textarchive.isfile(earthquakesFile):
             continue
 
-        data_out = np.loadtxt(earthquakesFile)
+        data_out = seismon.textarchive.loadtxt(earthquakesFile)
         ttMax.append(data_out[0])
         ttDiff.append(data_out[1])
         distance.append(data_out[2])
@@ -985,10 +1384,10 @@ def loadChannelEarthquakesPowerLaw(params,channel,attributeDics):
         EQpowerlawDirectory = params["dirPath"] + "/Text_Files/EQPowerlaw/" + channel.station_underscore + "/" + str(params["fftDuration"])
         EQPowerLawFile = os.path.join(EQpowerlawDirectory,"%s.txt"%(attributeDic["eventName"]))
 
-        if not os.path.isfile(EQPowerLawFile):
+        if not seismon.textarchive.isfile(EQPowerLawFile):
             continue
 
-        data_out = np.loadtxt(EQPowerLawFile)
+        data_out = seismon.textarchive.loadtxt(EQPowerLawFile)
         index.append(data_out[0])
         amp.append(data_out[1])
         distance.append(traveltimes["Distances"][0])
@@ -1072,7 +1471,7 @@ def loadChannelEarthquakes(params,channel,attributeDics):
         earthquakesDirectory = params["dirPath"] + "/Text_Files/Earthquakes/" + channel.station_underscore + "/" + str(params["fftDuration"])
         earthquakesFile = os.path.join(earthquakesDirectory,"%s.txt"%(attributeDic["eventName"]))
 
-        if not os.path.isfile(earthquakesFile):
+        if not seismon.textarchive.isfile(earthquakesFile):
             continue
 
         thisArrival = np.min([max(traveltimes["Rtwotimes"]),max(traveltimes["RthreePointFivetimes"]),max(traveltimes["Rfivetimes"]),max(traveltimes["Stimes"]),max(traveltimes["Ptimes"])])
@@ -1081,7 +1480,7 @@ def loadChannelEarthquakes(params,channel,attributeDics):
         arrival_floor = np.floor(thisArrival / 100.0) * 100.0
         departure_ceil = np.ceil(thisDeparture / 100.0) * 100.0
 
-        data_out = np.loadtxt(earthquakesFile)
+        data_out = seismon.textarchive.loadtxt(earthquakesFile)
         ttMax.append(data_out[0])
         ttDiff.append(data_out[1])
         distance.append(data_out[2])
@@ -1176,6 +1575,79 @@ def loadChannelEarthquakes(params,channel,attributeDics):
 
     return data
 
+def psd_band_indexes(freq,ff_ave):
+    """@the bins of each PSD band, as [start, end) index ranges.
+
+    A band holds the frequencies between its edges, both included, so a
+    bin on an edge belongs to both bands.
+
+    @param freq
+        frequencies (ascending)
+    @param ff_ave
+        band edges
+    """
+
+    edges = np.asarray(ff_ave, dtype=np.float64)
+    return (np.searchsorted(freq,edges[:-1],side="left"),
+            np.searchsorted(freq,edges[1:],side="right"))
+
+def psd_band_means(freq,spectra,ff_ave):
+    """@the mean of each PSD segment over each band, (n_segments, n_bands).
+
+    Empty bands are NaN.
+
+    @param freq
+        frequencies (ascending)
+    @param spectra
+        (n_segments, n_freq) PSDs
+    @param ff_ave
+        band edges
+    """
+
+    spectra = np.asarray(spectra, dtype=np.float64)
+    start, end = psd_band_indexes(np.asarray(freq),ff_ave)
+    # sums over [start, end) are the even reduceat slices; a zero column
+    # lets end reach the last bin
+    padded = np.concatenate((spectra,np.zeros((len(spectra),1))),axis=1)
+    sums = np.add.reduceat(padded,np.column_stack((start,end)).ravel(),axis=1)[:,::2]
+    counts = end - start
+    with np.errstate(invalid="ignore",divide="ignore"):
+        return np.where(counts > 0,sums/counts,np.nan)
+
+def psd_band_amplitudes(freq,spectra,ff_ave):
+    """@the band amplitude loadChannelPSD reports for each PSD segment.
+
+    Walking the bands in order, and the bins of each band in frequency
+    order, loadChannelPSD has always kept the running band mean at the
+    second bin of the walk.  That is the mean of the first two bins of
+    the first non-empty band if it holds two or more, otherwise the first
+    bin of the next one, picked from the psd_band_indexes ranges, so only
+    those columns of the (n_segments, n_freq) matrix are read.
+
+    @param freq
+        frequencies (ascending)
+    @param spectra
+        (n_segments, n_freq) PSDs
+    @param ff_ave
+        band edges
+    """
+
+    freq = np.asarray(freq)
+    spectra = np.asarray(spectra)
+    if len(spectra) == 0:
+        return np.zeros(0)
+
+    start, end = psd_band_indexes(freq,ff_ave)
+    bands = np.nonzero(end > start)[0]
+    if len(bands) == 0 or (end[bands[0]] - start[bands[0]] < 2 and len(bands) < 2):
+        raise IndexError("fewer than two frequency bins in the PSD bands")
+
+    first = start[bands[0]]
+    if end[bands[0]] - first >= 2:
+        # np.mean of two values: their sum over two
+        return (spectra[:,first] + spectra[:,first+1]) / 2
+    return spectra[:,start[bands[1]]].copy()
+
 def loadChannelPSD(params,channel,segment):
     """@load channel PSDs.
 
@@ -1193,47 +1665,10 @@ def loadChannelPSD(params,channel,segment):
     # Break up entire frequency band into 6 segments
     ff_ave = [1/float(128), 1/float(64),  0.1, 1, 3, 5, 10]
 
-    psdDirectory = params["dirPath"] + "/Text_Files/PSD/" + channel.station_underscore + "/" + str(params["fftDuration"])
-
-    files = glob.glob(os.path.join(psdDirectory,"*.txt"))
-    files = sorted(files)
-
-    ttStart = []
-    ttEnd = []
-    amp = []
-
-    for file in files:
-
-        fileSplit = file.split("/")
-        txtFile = fileSplit[-1].replace(".txt","")
-        txtFileSplit = txtFile.split("-")
-        thisTTStart = int(txtFileSplit[0])
-        thisTTEnd = int(txtFileSplit[1])
-
-        if (thisTTStart < gpsStart) or (thisTTEnd > gpsEnd):
-            continue
+    store = seismon.psdstore.psd_store(params,channel)
+    ttStart, ttEnd, freq, spectra = store.read_segments(gpsStart,gpsEnd)
 
-        ttStart.append(thisTTStart)
-        ttEnd.append(thisTTEnd)
-
-        data_out = np.loadtxt(file)
-        thisSpectra_out = data_out[:,1]
-        thisFreq_out = data_out[:,0]
-
-        freqAmps = []
-        for i in range(len(ff_ave)-1):
-            newSpectraNow = []
-            for j in range(len(thisFreq_out)):
-                if ff_ave[i] <= thisFreq_out[j] and thisFreq_out[j] <= ff_ave[i+1]:
-                    newSpectraNow.append(thisSpectra_out[j])
-                    freqAmps.append(np.mean(newSpectraNow))
-
-        thisAmp = freqAmps[1]
-        amp.append(thisAmp)
-
-    ttStart = np.array(ttStart)
-    ttEnd = np.array(ttEnd)
-    amp = np.array(amp)
+    amp = psd_band_amplitudes(freq,spectra,ff_ave)
 
     data = {}
     data["ttStart"] = ttStart
@@ -1258,8 +1693,7 @@ def loadChannelTimeseries(params,channel,segment):
 
     timeseriesDirectory = params["dirPath"] + "/Text_Files/Timeseries/" + channel.station_underscore + "/" + str(params["fftDuration"])
 
-    files = glob.glob(os.path.join(timeseriesDirectory,"*.txt"))
-    files = sorted(files)
+    files = seismon.textarchive.list_files(timeseriesDirectory)
 
     ttStart = []
     ttEnd = []
@@ -1280,7 +1714,7 @@ def loadChannelTimeseries(params,channel,segment):
         ttStart.append(thisTTStart)
         ttEnd.append(thisTTEnd)
 
-        data_out = np.loadtxt(file)
+        data_out = seismon.textarchive.loadtxt(file)
 
         thisttMax = data_out[1,0]
         thisAmp = data_out[1,1]
@@ -1321,16 +1755,16 @@ def loadChannelTrips(params,channel):
             data[platform][stage]["gps"] = []
             data[platform][stage]["velocity"] = []
 
-            files = glob.glob(os.path.join(stageDirectory,"*.txt"))
+            files = seismon.textarchive.list_files(stageDirectory)
             for file in files:
-                data_out = np.loadtxt(file)
+                data_out = seismon.textarchive.loadtxt(file)
                 data[platform][stage]["gps"].append(data_out[0])
                 data[platform][stage]["velocity"].append(data_out[1])
 
     return data
 
 def write_info(file,attributeDics):
-    """@write eqmon file
+    """@write eqmon file (and its binary sidecar, see seismon.utils.read_eqmons)
 
     @param file
         eqmon file
@@ -1355,6 +1789,12 @@ def write_info(file,attributeDics):
     tree = etree.ElementTree(baseroot)
     tree.write(file, pretty_print=True, xml_declaration=True)
 
+    try:
+        seismon.utils.write_eqmons_sidecar(file,attributeDics)
+    except (TypeError, ValueError) as e:
+        # the xml stays the reference; read_eqmons ignores an older sidecar
+        print("No eqmon sidecar for %s: %s"%(file,e))
+
 def write_array(array):
     """@create string of array values
 
@@ -1400,6 +1840,141 @@ def parse_xml(element):
 
     return dic
 
+# Clark-notation tags for the streaming QuakeML / EQXML readers
+_BED = "{http://quakeml.org/xmlns/bed/1.2}"
+_QUAKEML_EVENT = _BED + "event"
+_QUAKEML_PATHS = {
+    "time": [_BED+"origin", _BED+"time", _BED+"value"],
+    "latitude": [_BED+"origin", _BED+"latitude", _BED+"value"],
+    "longitude": [_BED+"origin", _BED+"longitude", _BED+"value"],
+    "depth": [_BED+"origin", _BED+"depth", _BED+"value"],
+    "evaluationMode": [_BED+"origin", _BED+"evaluationMode"],
+    "mag": [_BED+"magnitude", _BED+"mag", _BED+"value"],
+    "type": [_BED+"type"],
+    "creationTime": [_BED+"creationInfo", _BED+"creationTime"],
+    "agencyID": [_BED+"creationInfo", _BED+"agencyID"],
+    "version": [_BED+"creationInfo", _BED+"version"],
+}
+_QUAKEML_CHILDREN = {"origin": [_BED+"origin"], "magnitude": [_BED+"magnitude"],
+                     "creationInfo": [_BED+"creationInfo"]}
+
+_EQXML = "{http://www.usgs.gov/ansseqmsg}"
+_EQXML_EVENT = _EQXML + "Event"
+_EQXML_HEADER = {_EQXML+"Sent": "Sent", _EQXML+"Source": "Source"}
+_EQXML_PATHS = {
+    "EventID": [_EQXML+"EventID"],
+    "Version": [_EQXML+"Version"],
+    "Type": [_EQXML+"Type"],
+    "Latitude": [_EQXML+"Origin", _EQXML+"Latitude"],
+    "Longitude": [_EQXML+"Origin", _EQXML+"Longitude"],
+    "Depth": [_EQXML+"Origin", _EQXML+"Depth"],
+    "Time": [_EQXML+"Origin", _EQXML+"Time"],
+    "Status": [_EQXML+"Origin", _EQXML+"Status"],
+    "Region": [_EQXML+"Origin", _EQXML+"Region"],
+    "Magnitude": [_EQXML+"Origin", _EQXML+"Magnitude", _EQXML+"Value"],
+}
+_EQXML_CHILDREN = {"Origin": [_EQXML+"Origin"],
+                   "Magnitude": [_EQXML+"Origin", _EQXML+"Magnitude"]}
+
+def _xml_tree(paths,children):
+    """@nest {key: [tag, ...]} paths into a tag tree for _xml_fields.
+
+    Leaves hold the field key; the None entry of a node names it in the
+    "has" list when the element is present.
+    """
+
+    tree = {}
+    for key, path in paths.items():
+        node = tree
+        for tag in path[:-1]:
+            node = node.setdefault(tag, {})
+        node[path[-1]] = key
+    for key, path in children.items():
+        node = tree
+        for tag in path:
+            node = node.setdefault(tag, {})
+        node[None] = key
+    return tree
+
+_QUAKEML_TREE = _xml_tree(_QUAKEML_PATHS,_QUAKEML_CHILDREN)
+_EQXML_TREE = _xml_tree(_EQXML_PATHS,_EQXML_CHILDREN)
+
+def _xml_fields(element,tree,fields,has):
+    """@fill fields from one pass over each level of the element.
+
+    Where a tag repeats the last child wins, as in parse_xml.
+    """
+
+    children = {}
+    for child in element:
+        if child.tag in tree:
+            children[child.tag] = child
+    for tag, child in children.items():
+        node = tree[tag]
+        if isinstance(node, dict):
+            if None in node:
+                has.append(node[None])
+            _xml_fields(child,node,fields,has)
+        else:
+            fields[node] = str(child.text)
+
+def _xml_release(element):
+    """@free a processed element and everything parsed before it.
+    """
+
+    element.clear()
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+def iterparse_quakeml(file):
+    """@stream the events of a QuakeML file.
+
+    Only the fields seismon uses are extracted (as text, None if absent)
+    and every event is freed once read, so memory stays flat on large
+    multi-event catalogues.  The key "has" lists which of origin,
+    magnitude and creationInfo the event carries.
+
+    @param file
+        quakeml file
+    """
+
+    for action, element in etree.iterparse(file, events=("end",), tag=_QUAKEML_EVENT):
+        event = dict.fromkeys(_QUAKEML_PATHS)
+        event["has"] = []
+        _xml_fields(element,_QUAKEML_TREE,event,event["has"])
+        _xml_release(element)
+        yield event
+
+def iterparse_eqxml(file):
+    """@stream the events of an EQXML message.
+
+    Each event also carries the message-level Sent and Source.  Fields
+    are text, None if absent; "has" lists whether Origin and Magnitude
+    are present.
+
+    @param file
+        eqxml file
+    """
+
+    header = {"Sent": None, "Source": None}
+    tags = [_EQXML_EVENT] + list(_EQXML_HEADER.keys())
+    for action, element in etree.iterparse(file, events=("end",), tag=tags):
+        parent = element.getparent()
+        if parent is None or parent.getparent() is not None:
+            continue
+        if element.tag in _EQXML_HEADER:
+            header[_EQXML_HEADER[element.tag]] = str(element.text)
+            continue
+
+        event = dict.fromkeys(_EQXML_PATHS)
+        event.update(header)
+        event["has"] = []
+        _xml_fields(element,_EQXML_TREE,event,event["has"])
+        _xml_release(element)
+        yield event
+
 def cmtread(event, pred=True):
     """@read cmt event.
 
@@ -1428,7 +2003,7 @@ def cmtread(event, pred=True):
     if thistime < 300000000:
         attributeDic['GPS'] = thistime
     else:
-        attributeDic['GPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+        attributeDic['GPS'] = seismon.gpstime.utc_to_gps(dt)
         #attributeDic['GPS'] = float(lal.gpstime.utc_to_gps(dt))
 
     attributeDic['UTC'] = float(dt.strftime("%s"))
@@ -1451,7 +2026,7 @@ def cmtread(event, pred=True):
 
     SentTime = time.gmtime()
     dt = datetime.utcfromtimestamp(calendar.timegm(SentTime))
-    attributeDic['SentGPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+    attributeDic['SentGPS'] = seismon.gpstime.utc_to_gps(dt)
     #attributeDic['SentGPS'] = float(lal.gpstime.utc_to_gps(dt))
     attributeDic['SentUTC'] = time.time()
     attributeDic['Sent'] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", SentTime)
@@ -1460,7 +2035,7 @@ def cmtread(event, pred=True):
     tm = time.struct_time(time.gmtime())
     dt = datetime.utcfromtimestamp(calendar.timegm(tm))
 
-    attributeDic['WrittenGPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+    attributeDic['WrittenGPS'] = seismon.gpstime.utc_to_gps(dt)
     #attributeDic['WrittenGPS'] = float(lal.gpstime.utc_to_gps(dt))
     attributeDic['WrittenUTC'] = float(time.time())
 
@@ -1534,12 +2109,12 @@ def read_product(file,eventName):
     try:
         dt = datetime.strptime(timeString, "%Y-%m-%d %H:%M:%S.%f")
         tm = time.struct_time(dt.timetuple())
-        attributeDic['GPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+        attributeDic['GPS'] = seismon.gpstime.utc_to_gps(dt)
         attributeDic['UTC'] = float(dt.strftime("%s"))
     except:
         dt = datetime.strptime(timeString, "%Y-%m-%d %H:%M:%S")
         tm = time.struct_time(dt.timetuple())
-        attributeDic['GPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+        attributeDic['GPS'] = seismon.gpstime.utc_to_gps(dt)
         attributeDic['UTC'] = float(dt.strftime("%s"))
 
     if "creationInfo" in dic["eventParameters"]["event"]:
@@ -1549,18 +2124,18 @@ def read_product(file,eventName):
         try:
             dt = datetime.strptime(timeString, "%Y-%m-%d %H:%M:%S.%f")
             tm = time.struct_time(dt.timetuple())
-            attributeDic['SentGPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+            attributeDic['SentGPS'] = seismon.gpstime.utc_to_gps(dt)
             attributeDic['SentUTC'] = float(dt.strftime("%s"))
         except:
             dt = datetime.strptime(timeString, "%Y-%m-%d %H:%M:%S")
             tm = time.struct_time(dt.timetuple())
-            attributeDic['SentGPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+            attributeDic['SentGPS'] = seismon.gpstime.utc_to_gps(dt)
             attributeDic['SentUTC'] = float(dt.strftime("%s"))
     else:
         tm = time.struct_time(time.gmtime())
         dt = datetime.utcfromtimestamp(calendar.timegm(tm))
 
-        attributeDic['SentGPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+        attributeDic['SentGPS'] = seismon.gpstime.utc_to_gps(dt)
         attributeDic['SentUTC'] = float(time.time())
 
     if "magnitude" in dic["eventParameters"]["event"]:
@@ -1590,103 +2165,110 @@ def read_product(file,eventName):
 
     return attributeDic
 
-def read_eqxml(file,eventName):
+def read_eqxml(file,eventName,traveltimes=True):
     """@read eqxml file.
 
     @param file
         eqxml file
     @param eventName
         name of earthquake event
+    @param traveltimes
+        also calculate the travel times
     """
 
-    tree = etree.parse(file)
-    root = tree.getroot()
-    dic = parse_xml(root)
+    # the last event wins, as it did when the whole tree went through parse_xml
+    event = None
+    for event in iterparse_eqxml(file):
+        pass
 
     attributeDic = {}
 
-    if not "Origin" in dic["Event"] or not "Magnitude" in dic["Event"]["Origin"]:
+    if event is None or not "Origin" in event["has"] or not "Magnitude" in event["has"]:
         return attributeDic
 
-    attributeDic["Longitude"] = float(dic["Event"]["Origin"]["Longitude"])
-    attributeDic["Latitude"] = float(dic["Event"]["Origin"]["Latitude"])
-    attributeDic["Depth"] = float(dic["Event"]["Origin"]["Depth"])
-    attributeDic["eventID"] = dic["Event"]["EventID"]
+    attributeDic["Longitude"] = float(event["Longitude"])
+    attributeDic["Latitude"] = float(event["Latitude"])
+    attributeDic["Depth"] = float(event["Depth"])
+    attributeDic["eventID"] = event["EventID"]
     attributeDic["eventName"] = eventName
-    attributeDic["Magnitude"] = float(dic["Event"]["Origin"]["Magnitude"]["Value"])
+    attributeDic["Magnitude"] = float(event["Magnitude"])
     attributeDic["MomentMagnitude"] = (attributeDic["Magnitude"] - 9.1)/1.5
 
-    if "Region" in dic["Event"]["Origin"]:
-        attributeDic["Region"] = dic["Event"]["Origin"]["Region"]
+    if event["Region"] is not None:
+        attributeDic["Region"] = event["Region"]
     else:
         attributeDic["Region"] = "N/A"
 
-    attributeDic["Time"] = dic["Event"]["Origin"]["Time"]
+    attributeDic["Time"] = event["Time"]
     timeString = attributeDic["Time"].replace("T"," ").replace("Z","")
     dt = datetime.strptime(timeString, "%Y-%m-%d %H:%M:%S.%f")
     tm = time.struct_time(dt.timetuple())
 
-    attributeDic['GPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+    attributeDic['GPS'] = seismon.gpstime.utc_to_gps(dt)
     #attributeDic['GPS'] = float(lal.gpstime.utc_to_gps(dt))
     attributeDic['UTC'] = float(dt.strftime("%s"))
 
-    attributeDic["Sent"] = dic["Sent"]
+    attributeDic["Sent"] = event["Sent"]
     timeString = attributeDic["Sent"].replace("T"," ").replace("Z","")
     dt = datetime.strptime(timeString, "%Y-%m-%d %H:%M:%S.%f")
     tm = time.struct_time(dt.timetuple())
-    attributeDic['SentGPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+    attributeDic['SentGPS'] = seismon.gpstime.utc_to_gps(dt)
     #attributeDic['SentGPS'] = float(lal.gpstime.utc_to_gps(dt))
     attributeDic['SentUTC'] = float(dt.strftime("%s"))
 
-    attributeDic["DataSource"] = dic["Source"]
-    attributeDic["Version"] = dic["Event"]["Version"]
+    attributeDic["DataSource"] = event["Source"]
+    attributeDic["Version"] = event["Version"]
 
-    if "Type" in dic["Event"]:
-        attributeDic["Type"] = dic["Event"]["Type"]
+    if event["Type"] is not None:
+        attributeDic["Type"] = event["Type"]
     else:
         attributeDic["Type"] = "N/A"  
 
-    if dic["Event"]["Origin"]["Status"] == "Automatic":
+    if event["Status"] == "Automatic":
         attributeDic["Review"] = "Automatic"
     else:
         attributeDic["Review"] = "Manual"
 
-    attributeDic = calculate_traveltimes(attributeDic)
+    if traveltimes:
+        attributeDic = calculate_traveltimes(attributeDic)
     tm = time.struct_time(time.gmtime())
     dt = datetime.utcfromtimestamp(calendar.timegm(tm))
 
-    attributeDic['WrittenGPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+    attributeDic['WrittenGPS'] = seismon.gpstime.utc_to_gps(dt)
     #attributeDic['WrittenGPS'] = float(lal.gpstime.utc_to_gps(dt))
     attributeDic['WrittenUTC'] = float(time.time())
 
     return attributeDic
 
-def read_quakeml(file,eventName):
+def read_quakeml(file,eventName,traveltimes=True):
     """@read quakeml file.
 
     @param file
         quakeml file
     @param eventName
         name of earthquake event
+    @param traveltimes
+        also calculate the travel times
     """
 
-    tree = etree.parse(file)
-    root = tree.getroot()
-    dic = parse_xml(root)
+    # the last event wins, as it did when the whole tree went through parse_xml
+    event = None
+    for event in iterparse_quakeml(file):
+        pass
 
     attributeDic = {}
 
-    if "origin" not in dic["eventParameters"]["event"]:
+    if event is None or "origin" not in event["has"]:
         return attributeDic
-    if "type" not in dic["eventParameters"]["event"]:
-        dic["eventParameters"]["event"]["type"] = "None"
+    if event["type"] is None:
+        event["type"] = "None"
 
-    attributeDic["Longitude"] = float(dic["eventParameters"]["event"]["origin"]["longitude"]["value"])
-    attributeDic["Latitude"] = float(dic["eventParameters"]["event"]["origin"]["latitude"]["value"])
+    attributeDic["Longitude"] = float(event["longitude"])
+    attributeDic["Latitude"] = float(event["latitude"])
     
     # (modified by NM, 02/10.21)  depth info seem to be missing in some cases
     try:
-        attributeDic["Depth"] = float(dic["eventParameters"]["event"]["origin"]["depth"]["value"]) / 1000
+        attributeDic["Depth"] = float(event["depth"]) / 1000
     except:
         attributeDic["Depth"] = float(0)
 
@@ -1694,49 +2276,54 @@ def read_quakeml(file,eventName):
     attributeDic["eventID"] = eventName
     attributeDic["eventName"] = eventName
 
-    if "magnitude" in dic["eventParameters"]["event"]:
-        attributeDic["Magnitude"] = float(dic["eventParameters"]["event"]["magnitude"]["mag"]["value"])
+    if "magnitude" in event["has"]:
+        attributeDic["Magnitude"] = float(event["mag"])
     else:
         attributeDic["Magnitude"] = 0
     attributeDic["MomentMagnitude"] = (attributeDic["Magnitude"] - 9.1)/1.5
 
-    attributeDic["Time"] = dic["eventParameters"]["event"]["origin"]["time"]["value"]
+    attributeDic["Time"] = event["time"]
     timeString = attributeDic["Time"].replace("T"," ").replace("Z","")
     dt = datetime.strptime(timeString, "%Y-%m-%d %H:%M:%S.%f")
     tm = time.struct_time(dt.timetuple())
-    attributeDic['GPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+    attributeDic['GPS'] = seismon.gpstime.utc_to_gps(dt)
     #attributeDic['GPS'] = float(lal.gpstime.utc_to_gps(dt))
     attributeDic['UTC'] = float(dt.strftime("%s"))
 
     try:
-        attributeDic["Sent"] = dic["eventParameters"]["event"]["creationInfo"]["creationTime"]
+        if event["creationTime"] is None:
+            raise KeyError("creationTime")
+        attributeDic["Sent"] = event["creationTime"]
         timeString = attributeDic["Sent"].replace("T"," ").replace("Z","")
         dt = datetime.strptime(timeString, "%Y-%m-%d %H:%M:%S.%f")
         tm = time.struct_time(dt.timetuple())
-        attributeDic['SentGPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+        attributeDic['SentGPS'] = seismon.gpstime.utc_to_gps(dt)
         #attributeDic['SentGPS'] = float(lal.gpstime.utc_to_gps(dt))
         attributeDic['SentUTC'] = float(dt.strftime("%s"))
     except:
-        attributeDic['SentGPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+        attributeDic['SentGPS'] = seismon.gpstime.utc_to_gps(dt)
         attributeDic['SentUTC'] = float(time.time())
 
-    attributeDic["DataSource"] = dic["eventParameters"]["event"]["creationInfo"]["agencyID"]
-    #attributeDic["Version"] = float(dic["eventParameters"]["event"]["creationInfo"]["version"])
-    attributeDic["Type"] = dic["eventParameters"]["event"]["type"]
+    if event["agencyID"] is None:
+        raise KeyError("agencyID")
+    attributeDic["DataSource"] = event["agencyID"]
+    #attributeDic["Version"] = float(event["version"])
+    attributeDic["Type"] = event["type"]
 
-    if "evalulationMode" in dic["eventParameters"]["event"]:
-        if dic["eventParameters"]["event"]["origin"]["evaluationMode"] == "automatic":
+    if "evalulationMode" in event:
+        if event["evaluationMode"] == "automatic":
             attributeDic["Review"] = "Automatic"
         else:
             attributeDic["Review"] = "Manual"
     else:
         attributeDic["Review"] = "Unknown"
 
-    attributeDic = calculate_traveltimes(attributeDic)
+    if traveltimes:
+        attributeDic = calculate_traveltimes(attributeDic)
     tm = time.struct_time(time.gmtime())
     dt = datetime.utcfromtimestamp(calendar.timegm(tm))
 
-    attributeDic['WrittenGPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+    attributeDic['WrittenGPS'] = seismon.gpstime.utc_to_gps(dt)
     #attributeDic['WrittenGPS'] = float(lal.gpstime.utc_to_gps(dt))
     attributeDic['WrittenUTC'] = float(time.time())
 
@@ -1775,52 +2362,15 @@ def read_eqmon(params,file):
 def jsonread(event):
     """@read json event.
 
+    The fields are mapped as for a GeoJSON catalogue row
+    (seismon.geojson.catalogue_attributeDic).
+
     @param event
         json event
     """
 
-    attributeDic = {}
-    attributeDic["Longitude"] = event["geometry"]["coordinates"][0]
-    attributeDic["Latitude"] = event["geometry"]["coordinates"][1]
-    attributeDic["Depth"] = event["geometry"]["coordinates"][2]
-    attributeDic["eventID"] = event["properties"]["code"]
-    attributeDic["eventName"] = event["properties"]["ids"].split(",")[1]
-    attributeDic["Magnitude"] = event["properties"]["mag"]
-
-    attributeDic["MomentMagnitude"] = (attributeDic["Magnitude"] - 9.1)/1.5
-    attributeDic["UTC"] = float(event["properties"]["time"]) / 1000.0
-    attributeDic["DataSource"] = event["properties"]["sources"].replace(",","")
-    attributeDic["Version"] = 1.0
-    attributeDic["Type"] = 1.0
-    attributeDic['Region'] = event["properties"]["place"]
-
-    if event["properties"]["status"] == "AUTOMATIC":
-        attributeDic["Review"] = "Automatic"
-    else:
-        attributeDic["Review"] = "Manual"
-
-    Time = time.gmtime(attributeDic["UTC"])
-    dt = datetime.utcfromtimestamp(calendar.timegm(Time))
-
-    attributeDic['GPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
-    #attributeDic['GPS'] = float(lal.gpstime.utc_to_gps(dt))
-    SentTime = time.gmtime()
-    dt = datetime.utcfromtimestamp(calendar.timegm(SentTime))
-    attributeDic['SentGPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
-    #attributeDic['SentGPS'] = float(lal.gpstime.utc_to_gps(dt))
-    attributeDic['SentUTC'] = time.time()
-
-    attributeDic['Time'] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", Time)
-    attributeDic['Sent'] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", SentTime)
-
-    attributeDic = calculate_traveltimes(attributeDic)
-    tm = time.struct_time(time.gmtime())
-    dt = datetime.utcfromtimestamp(calendar.timegm(tm))
-    attributeDic['WrittenGPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
-    #attributeDic['WrittenGPS'] = float(lal.gpstime.utc_to_gps(dt))
-    attributeDic['WrittenUTC'] = float(time.time())
-
-    return attributeDic
+    catalogue = seismon.geojson.geojson_columns([event])
+    return seismon.geojson.catalogue_attributeDic(catalogue,0)
 
 def irisread(event,pred=True):
     """@read iris event.
@@ -1850,7 +2400,7 @@ def irisread(event,pred=True):
     if thistime < 300000000:
         attributeDic['GPS'] = thistime
     else:
-        attributeDic['GPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+        attributeDic['GPS'] = seismon.gpstime.utc_to_gps(dt)
         #attributeDic['GPS'] = float(lal.gpstime.utc_to_gps(dt))
 
     attributeDic['UTC'] = float(dt.strftime("%s"))
@@ -1873,7 +2423,7 @@ def irisread(event,pred=True):
 
     SentTime = time.gmtime()
     dt = datetime.utcfromtimestamp(calendar.timegm(SentTime))
-    attributeDic['SentGPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+    attributeDic['SentGPS'] = seismon.gpstime.utc_to_gps(dt)
     #attributeDic['SentGPS'] = float(lal.gpstime.utc_to_gps(dt))
     attributeDic['SentUTC'] = time.time()
     attributeDic['Sent'] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", SentTime)
@@ -1882,7 +2432,7 @@ def irisread(event,pred=True):
     tm = time.struct_time(time.gmtime())
     dt = datetime.utcfromtimestamp(calendar.timegm(tm))
 
-    attributeDic['WrittenGPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+    attributeDic['WrittenGPS'] = seismon.gpstime.utc_to_gps(dt)
     #attributeDic['WrittenGPS'] = float(lal.gpstime.utc_to_gps(dt))
     attributeDic['WrittenUTC'] = float(time.time())
 
@@ -1920,7 +2470,7 @@ def databaseread(event):
     attributeDic["MomentMagnitude"] = (attributeDic["Magnitude"] - 9.1)/1.5
     tm = time.struct_time(dt.timetuple())
 
-    attributeDic['GPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+    attributeDic['GPS'] = seismon.gpstime.utc_to_gps(dt)
     #attributeDic['GPS'] = float(lal.gpstime.utc_to_gps(tm))
     attributeDic['UTC'] = float(dt.strftime("%s"))
     attributeDic["DataSource"] = "DB"
@@ -1930,7 +2480,7 @@ def databaseread(event):
     attributeDic["Review"] = "Manual"
 
     SentTime = time.gmtime()
-    attributeDic['SentGPS'] = astropy.time.Time(SentTime, format='datetime', scale='utc').gps
+    attributeDic['SentGPS'] = seismon.gpstime.utc_to_gps(datetime.utcfromtimestamp(calendar.timegm(SentTime)))
     #attributeDic['SentGPS'] = float(lal.gpstime.utc_to_gps(SentTime))
     attributeDic['SentUTC'] = time.time()
 
@@ -1939,7 +2489,7 @@ def databaseread(event):
 
     attributeDic = calculate_traveltimes(attributeDic)
     tm = time.struct_time(time.gmtime())
-    attributeDic['WrittenGPS'] = astropy.time.Time(tm, format='datetime', scale='utc').gps
+    attributeDic['WrittenGPS'] = seismon.gpstime.utc_to_gps(datetime.utcfromtimestamp(calendar.timegm(tm)))
     #attributeDic['WrittenGPS'] = float(lal.gpstime.utc_to_gps(tm))
     attributeDic['WrittenUTC'] = float(time.time())
 
@@ -1949,8 +2499,8 @@ def fakeeventread(params):
 
     attributeDic = {}
 
-    attributeDic['GPS'] = astropy.time.Time(params["gps"], format='gps', scale='utc').gps
-    timeString = astropy.time.Time(params["gps"], format='gps', scale='utc').isot
+    attributeDic['GPS'] = np.float64(params["gps"])
+    timeString = seismon.gpstime.gps_to_isot(params["gps"])
 
     dt = datetime.strptime(timeString, "%Y-%m-%dT%H:%M:%S.%f")
     tm = time.struct_time(dt.timetuple())
@@ -1979,7 +2529,7 @@ def fakeeventread(params):
     SentTime = time.gmtime()
     dt = datetime.utcfromtimestamp(calendar.timegm(SentTime))
 
-    attributeDic['SentGPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+    attributeDic['SentGPS'] = seismon.gpstime.utc_to_gps(dt)
     #attributeDic['SentGPS'] = float(lal.gpstime.utc_to_gps(dt))
     attributeDic['SentUTC'] = time.time()
     attributeDic['Sent'] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", SentTime)
@@ -1988,7 +2538,7 @@ def fakeeventread(params):
     tm = time.struct_time(time.gmtime())
     dt = datetime.utcfromtimestamp(calendar.timegm(tm))
 
-    attributeDic['WrittenGPS'] = astropy.time.Time(dt, format='datetime', scale='utc').gps
+    attributeDic['WrittenGPS'] = seismon.gpstime.utc_to_gps(dt)
     #attributeDic['WrittenGPS'] = float(lal.gpstime.utc_to_gps(dt))
     attributeDic['WrittenUTC'] = float(time.time())
 
@@ -2038,11 +2588,34 @@ def calculate_traveltimes_velocitymap(attributeDic):
 
     return attributeDic
 
-def calculate_traveltimes(attributeDic,pred=True): 
+# whether calculate_traveltimes asks seismon_predictd first, and on which
+# socket (None is predictd.default_socket_file()); see use_predictd
+PREDICTD = {"client": False, "socketFile": None}
+
+def use_predictd(params):
+    """@make calculate_traveltimes ask a running seismon_predictd first if
+    params["doPredictd"] is set (on params["predictdSocket"], if given)
+
+    @param params
+        seismon params dictionary
+    """
+
+    PREDICTD["client"] = params.get("doPredictd",False)
+    PREDICTD["socketFile"] = params.get("predictdSocket",None)
+
+def calculate_traveltimes(attributeDic,pred=True,client=None,socketFile=None):
     """@calculate travel times of earthquake
 
     @param attributeDic
         earthquake stucture
+    @param pred
+        also make the amplitude predictions
+    @param client
+        ask a running seismon_predictd first, computing locally if it
+        cannot be reached or fails (default: as set by use_predictd)
+    @param socketFile
+        seismon_predictd socket (default: as set by use_predictd, else
+        predictd.default_socket_file())
     """
 
     if not "traveltimes" in attributeDic:
@@ -2051,6 +2624,25 @@ def calculate_traveltimes(attributeDic,pred=True):
     if not "Latitude" in attributeDic and not "Longitude" in attributeDic:
         return attributeDic
 
+    if client is None:
+        client = PREDICTD["client"]
+    if socketFile is None:
+        socketFile = PREDICTD["socketFile"]
+
+    if client:
+        import seismon.predictd
+        event = {key: value for key, value in attributeDic.items()
+                 if not key == "traveltimes"}
+        try:
+            traveltimes = seismon.predictd.request(
+                {"method": "traveltimes", "event": event, "pred": pred},
+                socketFile=socketFile)
+            attributeDic["traveltimes"].update(traveltimes)
+            return attributeDic
+        except Exception as e:
+            # unreachable, failing or answering nonsense: compute here
+            print("seismon_predictd failed (%s: %s)... calculating locally"%(type(e).__name__,e))
+
     attributeDic = ifotraveltimes_lookup(attributeDic, "Arbitrary", 0.0, 0.0, pred=pred)
     #attributeDic = ifotraveltimes(attributeDic, "Arbitrary", 0.0, 0.0)
     #attributeDic = ifotraveltimes(attributeDic, "LHO", 46.6475, -119.5986)
@@ -2115,6 +2707,69 @@ def do_kdtree(combined_x_y_arrays,points):
     dist, indexes = mytree.query(points)
     return indexes
 
+# process-wide cache of velocity maps and their trees, keyed by file path
+_velocity_map_cache = {}
+
+def load_velocity_map(velocityFile,treeCache=None):
+    """@load a Rayleigh velocity map and its cKDTree (once per process).
+
+    The map is re-read only if the file's mtime or size changes.  With
+    treeCache set, the parsed map and tree are also pickled there under
+    the sha1 of the map file, so later processes skip the text parse and
+    the tree build.
+
+    @param velocityFile
+        velocity map file (lat, lon, size, dv [%] per pixel)
+    @param treeCache
+        optional directory for pickled trees
+    """
+
+    stat = os.stat(velocityFile)
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _velocity_map_cache.get(velocityFile)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with open(velocityFile,'rb') as f:
+        sha1 = hashlib.sha1(f.read()).hexdigest()
+
+    velocityMap = None
+    if treeCache is not None:
+        pickleFile = os.path.join(treeCache,"velocitymap_%s.pkl"%sha1)
+        if os.path.isfile(pickleFile):
+            with open(pickleFile,'rb') as f:
+                velocityMap = pickle.load(f)
+
+    if velocityMap is None:
+        velocity_map = np.loadtxt(velocityFile)
+        velocityMap = {}
+        velocityMap["velocity_map"] = velocity_map
+        velocityMap["tree"] = scipy.spatial.cKDTree(
+            np.column_stack((velocity_map[:,0],velocity_map[:,1])))
+        velocityMap["sha1"] = sha1
+        if treeCache is not None:
+            try:
+                with open(pickleFile,'wb') as f:
+                    pickle.dump(velocityMap,f,protocol=pickle.HIGHEST_PROTOCOL)
+            except OSError:
+                print("Could not write %s..."%pickleFile)
+
+    _velocity_map_cache[velocityFile] = (key, velocityMap)
+    return velocityMap
+
+def velocity_map_indexes(velocityMap,lats,lons):
+    """@nearest velocity map pixel for every path point, in one query.
+
+    @param velocityMap
+        velocity map from load_velocity_map
+    @param lats, lons
+        path sample points
+    """
+
+    dist, indexes = velocityMap["tree"].query(np.column_stack((np.ravel(lats),np.ravel(lons))))
+    return indexes
+
 def ampRf(M,r,h,Rf0,Rfs,cd,rs):
     #def ampRf(M,r,h,Rf0,Rfs,Q0,Qs,cd,ch,rs):
     # Rf amplitude estimate
@@ -2172,74 +2827,37 @@ def ifotraveltimes_lookup(attributeDic,ifo,ifolat,ifolon,pred=True):
     else:
         trainFile = os.path.join(scriptpath,'LHO_processed_USGS_global_EQ_catalogue.csv')
 
-    N = 10
-    randstr = ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(N))
-    testFile = "/tmp/test_%s.csv"%randstr
-    predictionFile = "/tmp/prediction_%s.csv"%randstr
-
     if ifo == "Arbitrary":
         #degrees = np.linspace(1,180,180)
         degrees = np.linspace(1,180,18)
         distances = degrees*(np.pi/180)*6370000
         fwd = 0
         back = 0
-
-        M = attributeDic["Magnitude"]*np.ones(distances.shape)
-        lat = attributeDic["Latitude"]*np.ones(distances.shape)
-        lon = attributeDic["Longitude"]*np.ones(distances.shape)
-
-        if attributeDic["Depth"] >= 2.0:
-            depth = attributeDic["Depth"]
-        else:
-            depth = 2.0
-
-        h = depth*np.ones(distances.shape)
-        az = fwd*np.ones(distances.shape)
-
-        Rfamp, Lockloss, Rfamp_sigma, Lockloss_sigma = -1*np.ones(distances.shape), -1*np.ones(distances.shape), -1*np.ones(distances.shape), -1*np.ones(distances.shape)
-
-        for ii in range(len(distances)):
-            (Rfamp[ii], Lockloss[ii],Rfamp_sigma[ii],Lockloss_sigma[ii]) = makePredictionsV3(
-                trainFile,testFile,predictionFile, 
-                attributeDic["Magnitude"],
-                attributeDic["Latitude"],attributeDic["Longitude"],
-                distances[ii],depth,az[ii],
-                siteLat=ifolat, siteLon=ifolon,
-                thresh=0.1,predictor='peak_data_um_mean_subtracted',
-                locklossMotionThresh=10*1e-6)
-
     else:
         distance,fwd,back = gps2dist_azimuth(attributeDic["Latitude"],attributeDic["Longitude"],ifolat,ifolon)
         distances = np.linspace(0,distance,100)
         degrees = (distances/6370000)*(180/np.pi)
 
-        if attributeDic["Depth"] >= 2.0:
-            depth = attributeDic["Depth"]
-        else:
-            depth = 2.0
+    if attributeDic["Depth"] >= 2.0:
+        depth = attributeDic["Depth"]
+    else:
+        depth = 2.0
 
-        Rfamp, Lockloss, Rfamp_sigma, Lockloss_sigma = -1*np.ones(distances.shape), -1*np.ones(distances.shape), -1*np.ones(distances.shape), -1*np.ones(distances.shape)
+    # feature matrix for every grid point, predicted in a single call
+    M = attributeDic["Magnitude"]*np.ones(distances.shape)
+    lat = attributeDic["Latitude"]*np.ones(distances.shape)
+    lon = attributeDic["Longitude"]*np.ones(distances.shape)
+    h = depth*np.ones(distances.shape)
 
-        for ii in range(len(distances)):
-            (Rfamp[ii], Lockloss[ii],Rfamp_sigma[ii],Lockloss_sigma[ii]) = makePredictionsV3(
-                trainFile,testFile,predictionFile,
-                attributeDic["Magnitude"],
-                attributeDic["Latitude"],attributeDic["Longitude"],
-                distances[ii],depth,az[ii],
-                siteLat=ifolat, siteLon=ifolon,
-                thresh=0.1,predictor='peak_data_um_mean_subtracted',
-                locklossMotionThresh=10*1e-6)
-
-    if os.path.isfile(testFile):
-        os.remove(testFile)
-    if os.path.isfile(predictionFile):
-        os.remove(predictionFile)
+    (Rfamp, Lockloss, Rfamp_sigma, Lockloss_sigma) = makePredictionsGrid(
+        trainFile,M,lat,lon,h,
+        siteLat=ifolat, siteLon=ifolon,
+        thresh=0.1,predictor='peak_data_um_mean_subtracted',
+        locklossMotionThresh=10*1e-6)
 
     Pamp = 1e-6
     Samp = 1e-5
 
-    lats = []
-    lons = []
     Ptimes = []
     Stimes = []
     Rtwotimes = []
@@ -2252,20 +2870,17 @@ def ifotraveltimes_lookup(attributeDic,ifo,ifolat,ifolon,pred=True):
     else:
         depth = 2.0
 
-    pfile = os.path.join(scriptpath,'p.dat')
-    sfile = os.path.join(scriptpath,'s.dat')
-    parrivals = np.loadtxt(pfile)
-    sarrivals = np.loadtxt(sfile)
-    depths = np.linspace(1,100,100)
-    index = np.argmin(np.abs(depths-depth))
-    parrivals = parrivals[:,index]
-    sarrivals = sarrivals[:,index]
+    # nearest tabulated depth; table rows are paired with the grid points
+    # in order, as when the columns were sliced out of p.dat / s.dat
+    table = seismon.traveltimes.load_p_and_s(scriptpath)
+    index = np.argmin(np.abs(table["depths"]-depth))
+    rows = table["degrees"][:len(distances)]
+    parrivals, sarrivals = seismon.traveltimes.p_and_s_times(table, table["depths"][index], rows)
 
-    for distance, degree, parrival, sarrival in zip(distances, degrees,parrivals,sarrivals):
-        lon, lat, baz = shoot(attributeDic["Longitude"], attributeDic["Latitude"], fwd, distance/1000)
-        lats.append(lat)
-        lons.append(lon)
+    lons, lats, bazs = shoot_array(attributeDic["Longitude"], attributeDic["Latitude"], fwd, distances/1000)
+    lons, lats = list(lons), list(lats)
 
+    for distance, degree, parrival, sarrival in zip(distances, degrees,parrivals,sarrivals):
         Ptime = attributeDic["GPS"]+parrival
         Stime = attributeDic["GPS"]+sarrival
         Rtwotime = attributeDic["GPS"]+distance/2000.0
@@ -2337,37 +2952,20 @@ def ifotraveltimes_velocitymap(attributeDic,ifo,ifolat,ifolon):
     fc = 10**(2.3-attributeDic["Magnitude"]/2)
     index = np.argmin(np.absolute(frequencies - fc))
 
-    lats = []
-    lons = []
-    Rvelocitytimes = []
-    velocities = []
-
     velocityFile = '/home/mcoughlin/Seismon/velocity_maps/GR025_1_GDM52.pix'
-    velocity_map = np.loadtxt(velocityFile)
+    velocityMap = load_velocity_map(velocityFile)
+    velocity_map = velocityMap["velocity_map"]
     base_velocity = 3.59738 
 
-    for distance, degree in zip(distances, degrees):
-
-        lon, lat, baz = shoot(attributeDic["Longitude"], attributeDic["Latitude"], fwd, distance/1000)
-        lats.append(lat)
-        lons.append(lon)
-
-    combined_x_y_arrays = np.dstack([velocity_map[:,0],velocity_map[:,1]])[0]
-    points_list = np.dstack([lats, lons])
-
-    indexes = do_kdtree(combined_x_y_arrays,points_list)[0]
-
-    time = attributeDic["GPS"]
+    lons, lats, bazs = shoot_array(attributeDic["Longitude"], attributeDic["Latitude"], fwd, distances/1000)
 
-    for distance, degree, index in zip(distances, degrees,indexes):
+    indexes = velocity_map_indexes(velocityMap,lats,lons)
 
-        velocity = 1000 * (1 + 0.01*velocity_map[index,3])*base_velocity
-
-        time_delta = distance_delta / velocity
-        time = time + time_delta
-
-        Rvelocitytimes.append(time)
-        velocities.append(velocity/1000)
+    velocity = 1000 * (1 + 0.01*velocity_map[indexes,3])*base_velocity
+    # accumulate from the event time in path order, as the loop did
+    time_delta = distance_delta / velocity
+    Rvelocitytimes = list(np.cumsum(np.concatenate(([attributeDic["GPS"]],time_delta)))[1:])
+    velocities = list(velocity/1000)
 
     attributeDic["traveltimes"][ifo]["Rvelocitymaptimes"] = Rvelocitytimes
     attributeDic["traveltimes"][ifo]["Rvelocitymapvelocities"] = velocities
@@ -2389,22 +2987,16 @@ def ifotraveltimes(attributeDic,ifo,ifolat,ifolon):
 
     try:
         from obspy.core.util.geodetics import gps2DistAzimuth
-        from obspy.taup import TauPyModel
     except:
         print("Enable ObsPy if traveltimes information desired...\n")
         return attributeDic
 
+    seismonpath = os.path.dirname(seismon.__file__)
+    scriptpath = os.path.join(seismonpath,'input')
     if ifo == "LLO":
-        trainFile = os.path.join(scriptpath,'L1O1O2_GPR_earthquakes.txt')
-    elif ifo == "Virgo":
-        trainFile = os.path.join(scriptpath,'V1O1O2_GPR_earthquakes.txt')
+        trainFile = os.path.join(scriptpath,'LLO_processed_USGS_global_EQ_catalogue.csv')
     else:
-        trainFile = os.path.join(scriptpath,'H1O1O2_GPR_earthquakes.txt')
-
-    N = 10
-    randstr = ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(N))
-    testFile = "/tmp/test_%s.csv"%randstr
-    predictionFile = "/tmp/prediction_%s.csv"%randstr
+        trainFile = os.path.join(scriptpath,'LHO_processed_USGS_global_EQ_catalogue.csv')
 
     if ifo == "Arbitrary":
         #degrees = np.linspace(1,180,180)
@@ -2420,8 +3012,8 @@ def ifotraveltimes(attributeDic,ifo,ifolat,ifolon):
         az = fwd*np.ones(distances.shape)
 
         try:
-            (Rfamp, Lockloss, Rfamp_sigma, Lockloss_sigma) = makePredictions(trainFile,testFile,predictionFile,M,lat,lon,distances,h,az)
-            Lockloss = Lockloss - 1
+            (Rfamp, Lockloss, Rfamp_sigma, Lockloss_sigma) = makePredictionsGrid(
+                trainFile,M,lat,lon,h,siteLat=ifolat,siteLon=ifolon)
         except:
             Rfamp = -1*np.ones(distances.shape)
             Lockloss = -1*np.ones(distances.shape)
@@ -2440,24 +3032,17 @@ def ifotraveltimes(attributeDic,ifo,ifolat,ifolon):
         az = fwd*np.ones(distances.shape)
 
         try:
-            (Rfamp, Lockloss,Rfamp_sigma, Lockloss_sigma) = makePredictions(trainFile,testFile,predictionFile,M,lat,lon,distances,h,az)
-            Lockloss = Lockloss - 1
+            (Rfamp, Lockloss, Rfamp_sigma, Lockloss_sigma) = makePredictionsGrid(
+                trainFile,M,lat,lon,h,siteLat=ifolat,siteLon=ifolon)
         except:
             Rfamp = -1*np.ones(distances.shape)
             Lockloss = -1*np.ones(distances.shape)
             Rfamp_sigma = -1*np.ones(distances.shape)
             Lockloss_sigma = -1*np.ones(distances.shape)
 
-    if os.path.isfile(testFile):
-        os.remove(testFile)
-    if os.path.isfile(predictionFile):
-        os.remove(predictionFile)
-
     Pamp = 1e-6
     Samp = 1e-5
 
-    lats = []
-    lons = []
     Ptimes = []
     Stimes = []
     #Rtimes = []
@@ -2470,37 +3055,26 @@ def ifotraveltimes(attributeDic,ifo,ifolat,ifolon):
     # Rmag = T * 10^(Ms - 3.3 - 1.66*log_10(dist))
     T = 20
 
-    model = TauPyModel(model="iasp91")
-
-    for distance, degree in zip(distances, degrees):
-
-        lon, lat, baz = shoot(attributeDic["Longitude"], attributeDic["Latitude"], fwd, distance/1000)
-        lats.append(lat)
-        lons.append(lon)
+    if attributeDic["Depth"] >= 2.0:
+        depth = attributeDic["Depth"]
+    else:
+        depth = 2.0
 
-        if attributeDic["Depth"] >= 2.0:
-            depth = attributeDic["Depth"]
-        else:
-            depth = 2.0
+    # tabulated TauP first-P / first-S times (see seismon_traveltime_table)
+    table = seismon.traveltimes.load_table()
+    parrivals, sarrivals = seismon.traveltimes.interpolate(table, depth, degrees)
 
-        #tt = getTravelTimes(delta=degree, depth=depth)
+    lons, lats, bazs = shoot_array(attributeDic["Longitude"], attributeDic["Latitude"], fwd, distances/1000)
+    lons, lats = list(lons), list(lats)
 
-        #arrivals = model.get_travel_times(source_depth_in_km=depth,
-        #                          distance_in_degree=degree,phase_list=('P','S'))
-        arrivals = model.get_travel_times(source_depth_in_km=depth,distance_in_degree=degree)
-        #tt.append({'phase_name': 'R', 'dT/dD': 0, 'take-off angle': 0, 'time': distance/3500, 'd2T/dD2': 0, 'dT/dh': 0})
-        #tt.append({'phase_name': 'Rtwo', 'dT/dD': 0, 'take-off angle': 0, 'time': distance/2000, 'd2T/dD2': 0, 'dT/dh': 0})
-        #tt.append({'phase_name': 'RthreePointFive', 'dT/dD': 0, 'take-off angle': 0, 'time': distance/3500, 'd2T/dD2': 0, 'dT/dh': 0})
-        #tt.append({'phase_name': 'Rfive', 'dT/dD': 0, 'take-off angle': 0, 'time': distance/5000, 'd2T/dD2': 0, 'dT/dh': 0})
+    for distance, parrival, sarrival in zip(distances, parrivals, sarrivals):
 
         Ptime = -1
         Stime = -1
-        Rtime = -1
-        for phase in arrivals:
-            if Ptime == -1 and phase.name.lower()[0] == "p":
-                Ptime = attributeDic["GPS"]+phase.time
-            if Stime == -1 and phase.name.lower()[0] == "s":
-                Stime = attributeDic["GPS"]+phase.time
+        if not np.isnan(parrival):
+            Ptime = attributeDic["GPS"]+parrival
+        if not np.isnan(sarrival):
+            Stime = attributeDic["GPS"]+sarrival
         Rtwotime = attributeDic["GPS"]+distance/2000.0
         RthreePointFivetime = attributeDic["GPS"]+distance/3500.0
         Rfivetime = attributeDic["GPS"]+distance/5000.0
@@ -2553,6 +3127,90 @@ def distance_latlon(lat1,lon1,lat2,lon2):
 
     return distance
 
+_countries_cache = {}
+
+def load_countries(csvFile):
+    """@load the country centroid table and its cKDTree (once per process).
+
+    The table is re-read only if the file's mtime or size changes.  The
+    tree holds the centroids as unit vectors, so chord distance ranks
+    them in the same order as great-circle distance.
+
+    @param csvFile
+        tab separated abbreviation, latitude, longitude, country
+    """
+
+    stat = os.stat(csvFile)
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _countries_cache.get(csvFile)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    abbreviations, latitudes, longitudes, countries = [], [], [], []
+    with open(csvFile,'r',encoding='utf-8') as f:
+        reader=csv.reader(f,delimiter='\t')
+        for abb,lat,lon,country in reader:
+            abbreviations.append(abb)
+            latitudes.append(float(lat))
+            longitudes.append(float(lon))
+            countries.append(country)
+
+    countriesTable = {}
+    countriesTable["abbreviations"] = abbreviations
+    countriesTable["latitudes"] = np.array(latitudes)
+    countriesTable["longitudes"] = np.array(longitudes)
+    countriesTable["countries"] = countries
+    countriesTable["tree"] = scipy.spatial.cKDTree(
+        unit_vectors(countriesTable["latitudes"],countriesTable["longitudes"]))
+
+    _countries_cache[csvFile] = (key, countriesTable)
+    return countriesTable
+
+def unit_vectors(lats,lons):
+    """@points on the unit sphere for latitudes and longitudes [deg].
+    """
+
+    lats, lons = np.radians(lats), np.radians(lons)
+    return np.column_stack((np.cos(lats)*np.cos(lons),
+                            np.cos(lats)*np.sin(lons),
+                            np.sin(lats)))
+
+def nearest_country(countriesTable,lats,lons,candidates=4):
+    """@nearest country centroid for one or many events.
+
+    The tree proposes the closest few centroids and distance_latlon picks
+    among them, so the labels (ties included) match an argmin of
+    distance_latlon over the whole table.  Returns a name for scalar
+    input and a list of names otherwise.
+
+    @param countriesTable
+        table from load_countries
+    @param lats, lons
+        event latitudes and longitudes [deg]
+    @param candidates
+        number of centroids compared exactly per event
+    """
+
+    scalar = np.ndim(lats) == 0
+    lats = np.atleast_1d(np.asarray(lats,dtype=np.float64))
+    lons = np.atleast_1d(np.asarray(lons,dtype=np.float64))
+    if len(lats) == 0:
+        return []
+
+    candidates = min(candidates,len(countriesTable["countries"]))
+    dist, idxs = countriesTable["tree"].query(unit_vectors(lats,lons),k=candidates)
+    idxs = np.sort(idxs.reshape(len(lats),candidates),axis=1)
+    distances = distance_latlon(lats[:,None],lons[:,None],
+                                countriesTable["latitudes"][idxs],
+                                countriesTable["longitudes"][idxs])
+    idxs = idxs[np.arange(len(lats)),np.argmin(distances,axis=1)]
+
+    countries = [countriesTable["countries"][idx] for idx in idxs]
+    if scalar:
+        return countries[0]
+    return countries
+
 def ifotraveltimes_loc(attributeDic,ifo,ifolat,ifolon,pred=True):
     """@calculate travel times of earthquake
 
@@ -2606,14 +3264,9 @@ def ifotraveltimes_loc(attributeDic,ifo,ifolat,ifolon,pred=True):
     else:
         trainFile = os.path.join(scriptpath,'LHO_processed_USGS_global_EQ_catalogue.csv')
 
-    N = 10
-    randstr = ''.join(random.choice(string.ascii_uppercase + string.digits) for _ in range(N))
-    testFile = "/tmp/test_%s.csv"%randstr
-    predictionFile = "/tmp/prediction_%s.csv"%randstr
-
     Rfamp, Lockloss, Rfamp_sigma, Lockloss_sigma = -1, -1, -1, -1
-    (Rfamp, Lockloss,Rfamp_sigma,Lockloss_sigma) = makePredictionsV3(
-                trainFile,testFile,predictionFile,
+    (Rfamp, Lockloss,Rfamp_sigma,Lockloss_sigma) = makePredictions(
+                trainFile,
                 attributeDic["Magnitude"],
                 attributeDic["Latitude"],attributeDic["Longitude"],
                 distance,attributeDic["Depth"],fwd,
@@ -2621,11 +3274,6 @@ def ifotraveltimes_loc(attributeDic,ifo,ifolat,ifolon,pred=True):
                 thresh=0.1,predictor='peak_data_um_mean_subtracted',
                 locklossMotionThresh=10*1e-6)
    
-    if os.path.isfile(testFile):
-        os.remove(testFile)
-    if os.path.isfile(predictionFile):
-        os.remove(predictionFile)
-
     traveltimes = {}
     traveltimes["Latitudes"] = ifolat
     traveltimes["Longitudes"] = ifolon
@@ -2696,9 +3344,158 @@ def great_circle_distance(latlong_a, latlong_b):
     
     return d
 
+MANIFEST_FILE = "manifest.sqlite"
+
+def event_file_gps(file):
+    """@GPS time retrieve_earthquakes keys an event file on.
+
+    This is the last dash-separated field of the name, i.e. the SentGPS
+    for private files written with doMultipleEvents.
+
+    @param file
+        eqmon json file
+    """
+
+    return float(os.path.basename(file).replace(".json","").split("-")[-1])
+
+def _manifest_connect(eventfilesLocation):
+    """@open (and create if needed) the manifest of an event file directory.
+
+    @param eventfilesLocation
+        directory holding the eqmon json files of one type
+    """
+
+    connection = sqlite3.connect(os.path.join(eventfilesLocation,MANIFEST_FILE),timeout=60.0)
+    # keep the journal file between transactions, so recording an event
+    # file does not also create and delete a journal next to it
+    connection.execute("PRAGMA journal_mode=PERSIST")
+    connection.execute("CREATE TABLE IF NOT EXISTS events "
+                       "(name TEXT PRIMARY KEY, gps REAL, magnitude REAL)")
+    connection.execute("CREATE INDEX IF NOT EXISTS events_gps ON events (gps)")
+    columns = [row[1] for row in connection.execute("PRAGMA table_info(events)")]
+    if not "mtime_ns" in columns:
+        connection.execute("ALTER TABLE events ADD COLUMN mtime_ns INTEGER")
+    return connection
+
+def _manifest_row(file,magnitude):
+    return (os.path.basename(file),event_file_gps(file),magnitude,
+            os.stat(file).st_mtime_ns)
+
+def manifest_add(file,attributeDic):
+    """@record a freshly written event file in its directory's manifest.
+
+    @param file
+        eqmon json file
+    @param attributeDic
+        the event written to it
+    """
+
+    connection = _manifest_connect(os.path.dirname(file))
+    with connection:
+        connection.execute("INSERT OR REPLACE INTO events VALUES (?,?,?,?)",
+                           _manifest_row(file,float(attributeDic["Magnitude"])))
+    connection.close()
+
+def rebuild_manifest(eventfilesLocation,full=False):
+    """@bring the manifest of an event file directory up to date with the files.
+
+    Files are read only if the manifest does not know them at their
+    current mtime (all of them with full), and rows of files that are
+    gone are dropped.  Returns the number of files indexed.
+
+    @param eventfilesLocation
+        directory holding the eqmon json files of one type
+    @param full
+        re-read every file
+    """
+
+    connection = _manifest_connect(eventfilesLocation)
+    known = {}
+    if not full:
+        known = dict(connection.execute("SELECT name, mtime_ns FROM events").fetchall())
+
+    rows = []
+    names = set()
+    for file in glob.glob(os.path.join(eventfilesLocation,"*.json")):
+        name = os.path.basename(file)
+        try:
+            if known.get(name) != os.stat(file).st_mtime_ns:
+                with open(file) as json_file:
+                    attributeDic = json.load(json_file)
+                rows.append(_manifest_row(file,attributeDic.get("Magnitude")))
+            names.add(name)
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            print("Skipping %s, not a complete event file"%file)
+
+    with connection:
+        if full:
+            connection.execute("DELETE FROM events")
+        else:
+            connection.executemany("DELETE FROM events WHERE name = ?",
+                                   [(name,) for name in set(known) - names])
+        connection.executemany("INSERT OR REPLACE INTO events VALUES (?,?,?,?)",rows)
+    connection.close()
+    return len(names)
+
+def query_manifest(eventfilesLocation,gpsStart,gpsEnd,minMag):
+    """@event files in a GPS window at or above a magnitude, in GPS order.
+
+    Returns None if the directory has no manifest.  The manifest is only
+    read.  Files in the window that it does not know (copied in, or whose
+    writer died before manifest_add) are returned whatever their
+    magnitude, so the caller has to check it; rows of files that are gone
+    are left out.  A file rewritten in place without manifest_add keeps
+    its old magnitude until rebuild_manifest (bin/seismon_event_manifest)
+    is run.
+
+    @param eventfilesLocation
+        directory holding the eqmon json files of one type
+    @param gpsStart, gpsEnd
+        window on event_file_gps (inclusive)
+    @param minMag
+        minimum magnitude
+    """
+
+    manifestFile = os.path.join(eventfilesLocation,MANIFEST_FILE)
+    if not os.path.isfile(manifestFile):
+        return None
+
+    # names only, no stat per file
+    inWindow = {}
+    with os.scandir(eventfilesLocation) as entries:
+        for entry in entries:
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                gps = event_file_gps(entry.name)
+            except ValueError:
+                continue
+            if gpsStart <= gps <= gpsEnd:
+                inWindow[entry.name] = gps
+
+    connection = sqlite3.connect("file:%s?mode=ro"%urllib.request.pathname2url(manifestFile),
+                                 uri=True,timeout=60.0)
+    try:
+        rows = connection.execute("SELECT name, magnitude FROM events "
+                                  "WHERE gps >= ? AND gps <= ?",
+                                  (gpsStart,gpsEnd)).fetchall()
+    finally:
+        connection.close()
+
+    names = set(inWindow) - set(row[0] for row in rows)
+    names.update(row[0] for row in rows
+                 if row[0] in inWindow and row[1] is not None and row[1] >= minMag)
+    return [os.path.join(eventfilesLocation,name)
+            for name in sorted(names,key=lambda name: inWindow[name])]
+
 def retrieve_earthquakes(params,gpsStart,gpsEnd):
     """@retrieve earthquakes information.
 
+    Directories with a manifest are resolved through it; the others are
+    globbed.
+
     @param params
         seismon params dictionary
     """
@@ -2708,16 +3505,20 @@ def retrieve_earthquakes(params,gpsStart,gpsEnd):
     for eventfilesType in eventfilesTypes:
 
         eventfilesLocation = os.path.join(params["eventfilesLocation"],eventfilesType)
-        files = glob.glob(os.path.join(eventfilesLocation,"*.json"))
+        files = query_manifest(eventfilesLocation,gpsStart-3600,gpsEnd,
+                               params["earthquakesMinMag"])
+        if files is None:
+            files = glob.glob(os.path.join(eventfilesLocation,"*.json"))
 
         for numFile in range(len(files)):
 
             file = files[numFile]
 
-            fileSplit = file.replace(".json","").split("-")
-            gps = float(fileSplit[-1])
+            gps = event_file_gps(file)
             if (gps < gpsStart - 3600) or (gps > gpsEnd):
                 continue
+            if not os.path.isfile(file):
+                continue
 
             attributeDic = read_eqmon(params,file)
 
@@ -2741,14 +3542,9 @@ def equi(m, centerlon, centerlat, radius):
 
     glon1 = centerlon
     glat1 = centerlat
-    X = []
-    Y = []
-    for azimuth in range(0, 360):
-        glon2, glat2, baz = shoot(glon1, glat1, azimuth, radius)
-        X.append(glon2)
-        Y.append(glat2)
-    X.append(X[0])
-    Y.append(Y[0])
+    X, Y, baz = shoot_array(glon1, glat1, np.arange(0, 360), radius)
+    X = np.append(X, X[0])
+    Y = np.append(Y, Y[0])
 
     #m.plot(X,Y,**kwargs) #Should work, but doesn't...
     X,Y = m(X,Y)
@@ -2830,3 +3626,92 @@ def shoot(lon, lat, azimuth, maxdist=None):
     baz *= 180./np.pi
 
     return (glon2, glat2, baz)
+
+def shoot_array(lon, lat, azimuth, maxdist):
+    """@vectorized Shooter Function
+    Same geodesic forward problem as shoot, but for arrays of start
+    points, azimuths and distances (broadcast against each other).
+    All elements are iterated together; each element stops updating
+    once it has converged.
+
+    @param lon
+        longitude
+    @param lat
+        latitude
+    @param azimuth
+        azimuth
+    @param maxdist
+        distance [km]
+
+    """
+    lon, lat, azimuth, maxdist = np.broadcast_arrays(
+        *[np.asarray(x, dtype=np.float64) for x in (lon, lat, azimuth, maxdist)])
+
+    glat1 = lat * np.pi / 180.
+    glon1 = lon * np.pi / 180.
+    s = maxdist / 1.852
+    faz = azimuth * np.pi / 180.
+
+    EPS= 0.00000000005
+    if np.any((np.abs(np.cos(glat1))<EPS) & ~(np.abs(np.sin(faz))<EPS)):
+        print("Only N-S courses are meaningful, starting at a pole!")
+
+    a=6378.13/1.852
+    f=1/298.257223563
+    r = 1 - f
+    tu = r * np.tan(glat1)
+    sf = np.sin(faz)
+    cf = np.cos(faz)
+    b = np.where(cf==0, 0., 2. * np.arctan2(tu, cf))
+
+    cu = 1. / np.sqrt(1 + tu * tu)
+    su = tu * cu
+    sa = cu * sf
+    c2a = 1 - sa * sa
+    x = 1. + np.sqrt(1. + c2a * (1. / (r * r) - 1.))
+    x = (x - 2.) / x
+    c = 1. - x
+    c = (x * x / 4. + 1.) / c
+    d = (0.375 * x * x - 1.) * x
+    tu = s / (r * a * c)
+    y = tu.copy()
+
+    sy = np.zeros(y.shape)
+    cy = np.zeros(y.shape)
+    cz = np.zeros(y.shape)
+    e = np.zeros(y.shape)
+    active = np.ones(y.shape, dtype=bool)
+    while np.any(active):
+        ya = y[active]
+        ba = b[active]
+        da = d[active]
+
+        sy[active] = np.sin(ya)
+        cy[active] = np.cos(ya)
+        cz[active] = np.cos(ba + ya)
+        e[active] = 2. * cz[active] * cz[active] - 1.
+        xa = e[active] * cy[active]
+        yn = e[active] + e[active] - 1.
+        yn = (((sy[active] * sy[active] * 4. - 3.) * yn * cz[active] * da / 6. + xa) *
+              da / 4. - cz[active]) * sy[active] * da + tu[active]
+
+        y[active] = yn
+        active[active] = np.abs(yn - ya) > EPS
+
+    b = cu * cy * cf - su * sy
+    c = r * np.sqrt(sa * sa + b * b)
+    d = su * cy + cu * sy * cf
+    glat2 = (np.arctan2(d, c) + np.pi) % (2*np.pi) - np.pi
+    c = cu * cy - su * sy * cf
+    x = np.arctan2(sy * sf, c)
+    c = ((-3. * c2a + 4.) * f + 4.) * c2a * f / 16.
+    d = ((e * cy * c + cz) * sy * c + y) * sa
+    glon2 = ((glon1 + x - (1. - c) * d * f + np.pi) % (2*np.pi)) - np.pi
+
+    baz = (np.arctan2(sa, b) + np.pi) % (2 * np.pi)
+
+    glon2 *= 180./np.pi
+    glat2 *= 180./np.pi
+    baz *= 180./np.pi
+
+    return (glon2, glat2, baz)
@@ -0,0 +1,133 @@
+#!/usr/bin/python
+
+"""Product-version deduplication.
+
+USGS re-issues a product every time the solution for an event is
+updated.  The registry remembers, per event, the update (Sent) time and a
+hash of the fields the predictions depend on for the latest revision it
+let through, so later revisions that change none of them (and stale
+revisions arriving out of order) are skipped in O(1).  A registry is a
+plain dictionary and can be kept on disk as JSON between runs.
+"""
+
+import os, json, hashlib, numbers
+
+import seismon.backfill
+
+# origin, depth and magnitude: everything the predictions are built from
+PREDICTION_KEYS = ["Time", "Latitude", "Longitude", "Depth", "Magnitude"]
+
+def new_registry():
+    """@empty registry.
+    """
+
+    return {"events": {}, "processed": 0, "skipped": 0}
+
+def load_registry(registryFile):
+    """@registry saved by save_registry (empty if there is none).
+
+    The counters start from zero for every load.
+
+    @param registryFile
+        json file
+    """
+
+    registry = new_registry()
+    if os.path.isfile(registryFile):
+        with open(registryFile) as f:
+            registry["events"] = json.load(f)
+    return registry
+
+def save_registry(registry,registryFile):
+    """@write the registry atomically (see seismon.backfill.atomic_write).
+
+    @param registry
+        registry dictionary
+    @param registryFile
+        json file
+    """
+
+    with seismon.backfill.atomic_write(registryFile) as f:
+        json.dump(registry["events"], f)
+
+def product_hash(attributeDic,keys=PREDICTION_KEYS):
+    """@hash of the fields of a product the predictions depend on.
+
+    @param attributeDic
+        parsed product
+    @param keys
+        fields to hash
+    """
+
+    values = []
+    for key in keys:
+        value = attributeDic.get(key)
+        if isinstance(value, numbers.Real):
+            # numpy and python numbers hash alike
+            value = float(value)
+        values.append(repr(value))
+    return hashlib.sha1("\0".join(values).encode('utf-8')).hexdigest()
+
+def check_product(registry,attributeDic,keys=PREDICTION_KEYS):
+    """@True if a product needs processing; records it if so.
+
+    A product is skipped if its event was already processed from a
+    revision sent later, or from one with the same hash.
+
+    @param registry
+        registry dictionary
+    @param attributeDic
+        parsed product (eventName identifies the event, SentGPS the revision)
+    @param keys
+        fields to hash
+    """
+
+    eventName = attributeDic["eventName"]
+    updated = float(attributeDic.get("SentGPS", 0.0))
+    digest = product_hash(attributeDic,keys=keys)
+
+    entry = registry["events"].get(eventName)
+    if entry is not None and (updated < entry["updated"] or digest == entry["hash"]):
+        entry["updated"] = max(entry["updated"], updated)
+        registry["skipped"] += 1
+        return False
+
+    registry["events"][eventName] = {"updated": updated, "hash": digest}
+    registry["processed"] += 1
+    return True
+
+def subset_registry(registry,eventNames):
+    """@registry holding only the entries of some events, with fresh counters.
+
+    Used to hand a worker process just the part of the registry it needs.
+
+    @param registry
+        registry dictionary
+    @param eventNames
+        events to copy
+    """
+
+    subset = new_registry()
+    for eventName in eventNames:
+        if eventName in registry["events"]:
+            subset["events"][eventName] = dict(registry["events"][eventName])
+    return subset
+
+def merge_registry(registry,other):
+    """@fold a registry returned by a worker back into the main one.
+
+    Entries from other win unless the main registry already holds a later
+    revision of the same event; the counters are added.
+
+    @param registry
+        registry dictionary (updated in place)
+    @param other
+        registry to merge in
+    """
+
+    for eventName, entry in other["events"].items():
+        current = registry["events"].get(eventName)
+        if current is None or entry["updated"] >= current["updated"]:
+            registry["events"][eventName] = entry
+    registry["processed"] += other["processed"]
+    registry["skipped"] += other["skipped"]
@@ -0,0 +1,217 @@
+#!/usr/bin/python
+
+"""Bulk USGS GeoJSON catalogue loading.
+
+read_geojson parses a FeatureCollection (or a directory of them) into a
+catalogue of numpy columns, one entry per feature, instead of building an
+attributeDic per event.  Features are decoded one at a time by the json
+module's C scanner and reduced to a row straight away, so the full
+document tree never exists in memory.  Times are converted to GPS for
+the whole column at once.  iter_attributeDics turns rows back into the
+attributeDics jsonread produces, one at a time and only for the rows
+asked for, so travel times are computed only for events that survive
+the columnar cuts.
+"""
+
+import os, glob, time, calendar, json
+from datetime import datetime
+
+import numpy as np
+
+import seismon.eqmon, seismon.gpstime
+
+_WHITESPACE = json.decoder.WHITESPACE
+_DECODER = json.JSONDecoder()
+
+def _expect(text,index,char):
+    if text[index:index+1] != char:
+        raise json.JSONDecodeError("Expecting '%s'"%char, text, index)
+
+def iter_features(text):
+    """@yield the features of a GeoJSON FeatureCollection one by one.
+
+    Members other than "features" are skipped without being kept.
+
+    @param text
+        FeatureCollection document
+    """
+
+    skip = lambda index: _WHITESPACE.match(text,index).end()
+
+    index = skip(0)
+    _expect(text,index,"{")
+    index = skip(index+1)
+    while text[index:index+1] != "}":
+        key, index = _DECODER.raw_decode(text,index)
+        index = skip(index)
+        _expect(text,index,":")
+        index = skip(index+1)
+
+        if key == "features":
+            _expect(text,index,"[")
+            index = skip(index+1)
+            while text[index:index+1] != "]":
+                feature, index = _DECODER.raw_decode(text,index)
+                yield feature
+                index = skip(index)
+                if text[index:index+1] == ",":
+                    index = skip(index+1)
+                else:
+                    _expect(text,index,"]")
+            index = index+1
+        else:
+            value, index = _DECODER.raw_decode(text,index)
+
+        index = skip(index)
+        if text[index:index+1] == ",":
+            index = skip(index+1)
+        else:
+            _expect(text,index,"}")
+
+def _feature_row(feature):
+    """@the fields of one feature the catalogue keeps.
+    """
+
+    properties = feature["properties"]
+    coordinates = feature["geometry"]["coordinates"]
+    return (properties["time"], coordinates[0], coordinates[1], coordinates[2],
+            properties["mag"], properties["ids"].split(",")[1], properties["code"],
+            properties["sources"], properties["place"], properties["status"])
+
+def _row_columns(rows):
+    """@catalogue columns for a list of _feature_row rows.
+    """
+
+    if len(rows) == 0:
+        columns = [[] for ii in range(10)]
+    else:
+        columns = list(zip(*rows))
+
+    millis = np.array(columns[0], dtype=np.int64)
+
+    catalogue = {}
+    catalogue["time"] = millis / 1000.0
+    # jsonread goes through time.gmtime, which drops the milliseconds
+    catalogue["gps"] = seismon.gpstime.utc_to_gps(
+        (millis // 1000).astype('datetime64[s]'))
+    catalogue["lon"] = np.array(columns[1], dtype=np.float64)
+    catalogue["lat"] = np.array(columns[2], dtype=np.float64)
+    catalogue["depth"] = np.array(columns[3], dtype=np.float64)
+    catalogue["mag"] = np.array(columns[4], dtype=np.float64)
+    for key, column in zip(["id","code","sources","place","status"],columns[5:]):
+        catalogue[key] = np.empty(len(column), dtype=object)
+        catalogue[key][:] = column
+    return catalogue
+
+def geojson_columns(features):
+    """@catalogue columns for GeoJSON features.
+
+    Numeric columns are float64 (missing values are NaN): time (UTC
+    seconds), gps, lat, lon, depth and mag.  id holds the event names
+    jsonread uses; code, sources, place and status are kept for the
+    attributeDics.
+
+    @param features
+        iterable of parsed GeoJSON features
+    """
+
+    return _row_columns([_feature_row(feature) for feature in features])
+
+def read_geojson(path):
+    """@load a USGS GeoJSON FeatureCollection, or every *.json / *.geojson
+    file in a directory, as a catalogue of columns (see geojson_columns).
+
+    @param path
+        GeoJSON file or directory
+    """
+
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path,"*.json")) +
+                       glob.glob(os.path.join(path,"*.geojson")))
+    else:
+        files = [path]
+
+    rows = []
+    for file in files:
+        with open(file,encoding='utf-8') as f:
+            text = f.read()
+        rows.extend(_feature_row(feature) for feature in iter_features(text))
+        del text
+
+    return _row_columns(rows)
+
+def catalogue_size(catalogue):
+    """@number of events in a catalogue.
+    """
+
+    return len(catalogue["gps"])
+
+def catalogue_attributeDic(catalogue,index,traveltimes=True):
+    """@the attributeDic of one catalogue row.
+
+    This is the one mapping of GeoJSON fields to attributeDic entries;
+    eqmon.jsonread goes through it for single features.
+
+    @param catalogue
+        catalogue from read_geojson
+    @param index
+        row
+    @param traveltimes
+        also calculate the travel times
+    """
+
+    attributeDic = {}
+    attributeDic["Longitude"] = float(catalogue["lon"][index])
+    attributeDic["Latitude"] = float(catalogue["lat"][index])
+    attributeDic["Depth"] = float(catalogue["depth"][index])
+    attributeDic["eventID"] = catalogue["code"][index]
+    attributeDic["eventName"] = catalogue["id"][index]
+    attributeDic["Magnitude"] = float(catalogue["mag"][index])
+
+    attributeDic["MomentMagnitude"] = (attributeDic["Magnitude"] - 9.1)/1.5
+    attributeDic["UTC"] = float(catalogue["time"][index])
+    attributeDic["DataSource"] = catalogue["sources"][index].replace(",","")
+    attributeDic["Version"] = 1.0
+    attributeDic["Type"] = 1.0
+    attributeDic['Region'] = catalogue["place"][index]
+
+    if catalogue["status"][index] == "AUTOMATIC":
+        attributeDic["Review"] = "Automatic"
+    else:
+        attributeDic["Review"] = "Manual"
+
+    Time = time.gmtime(attributeDic["UTC"])
+
+    attributeDic['GPS'] = catalogue["gps"][index]
+    SentTime = time.gmtime()
+    dt = datetime.utcfromtimestamp(calendar.timegm(SentTime))
+    attributeDic['SentGPS'] = seismon.gpstime.utc_to_gps(dt)
+    attributeDic['SentUTC'] = time.time()
+
+    attributeDic['Time'] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", Time)
+    attributeDic['Sent'] = time.strftime("%Y-%m-%dT%H:%M:%S.000Z", SentTime)
+
+    if traveltimes:
+        attributeDic = seismon.eqmon.calculate_traveltimes(attributeDic)
+    tm = time.struct_time(time.gmtime())
+    dt = datetime.utcfromtimestamp(calendar.timegm(tm))
+    attributeDic['WrittenGPS'] = seismon.gpstime.utc_to_gps(dt)
+    attributeDic['WrittenUTC'] = float(time.time())
+
+    return attributeDic
+
+def iter_attributeDics(catalogue,indexes=None,traveltimes=True):
+    """@yield attributeDics for catalogue rows, built only when asked for.
+
+    @param catalogue
+        catalogue from read_geojson
+    @param indexes
+        rows to yield (all by default), e.g. np.nonzero of a cut
+    @param traveltimes
+        also calculate the travel times
+    """
+
+    if indexes is None:
+        indexes = range(catalogue_size(catalogue))
+    for index in indexes:
+        yield catalogue_attributeDic(catalogue,index,traveltimes=traveltimes)
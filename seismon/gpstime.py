@@ -0,0 +1,99 @@
+#!/usr/bin/python
+
+"""UTC <-> GPS time conversion.
+
+GPS time counts SI seconds since 1980-01-06T00:00:00 UTC without leap
+seconds, so it is UTC plus the number of leap seconds inserted since
+then.  The leap seconds are embedded below; conversions are plain numpy
+arithmetic on datetime64 values and work on scalars or whole arrays.
+"""
+
+from datetime import datetime, timezone
+
+import numpy as np
+
+GPS_EPOCH = np.datetime64('1980-01-06T00:00:00', 'us')
+
+# UTC instants (start of day) at which a leap second had just been
+# inserted after GPS_EPOCH; extend when IERS announces a new one
+LEAP_SECONDS = np.array([
+    '1981-07-01', '1982-07-01', '1983-07-01', '1985-07-01', '1988-01-01',
+    '1990-01-01', '1991-01-01', '1992-07-01', '1993-07-01', '1994-07-01',
+    '1996-01-01', '1997-07-01', '1999-01-01', '2006-01-01', '2009-01-01',
+    '2012-07-01', '2015-07-01', '2017-01-01',
+], dtype='datetime64[us]')
+
+# the same instants in GPS seconds
+_LEAP_GPS = (LEAP_SECONDS - GPS_EPOCH) / np.timedelta64(1, 's') + \
+    np.arange(1, len(LEAP_SECONDS)+1)
+
+def to_datetime64(utc):
+    """@UTC times as datetime64[us].
+
+    Accepts datetime objects (naive ones are taken as UTC, aware ones
+    are converted to it), datetime64 values and ISO strings (with "T" or
+    " " between date and time and an optional trailing "Z"), or arrays /
+    lists of any of them.
+
+    @param utc
+        UTC time(s)
+    """
+
+    if isinstance(utc, datetime):
+        if utc.tzinfo is not None:
+            utc = utc.astimezone(timezone.utc).replace(tzinfo=None)
+        return np.datetime64(utc, 'us')
+
+    utc = np.asarray(utc)
+    if utc.dtype.kind in 'US':
+        utc = np.char.replace(np.char.rstrip(utc.astype('U'), 'Z'), ' ', 'T')
+    elif utc.dtype.kind == 'O':
+        return np.array([to_datetime64(x) for x in utc.ravel()],
+                        dtype='datetime64[us]').reshape(utc.shape)
+    return utc.astype('datetime64[us]')
+
+def utc_to_gps(utc):
+    """@GPS seconds for UTC time(s).
+
+    Returns a float64 (array for array input).
+
+    @param utc
+        UTC time(s), see to_datetime64
+    """
+
+    utc = to_datetime64(utc)
+    leaps = np.searchsorted(LEAP_SECONDS, utc, side='right')
+    gps = (utc - GPS_EPOCH) / np.timedelta64(1, 's') + leaps
+    if np.ndim(gps) == 0:
+        return np.float64(gps)
+    return gps
+
+def gps_to_utc(gps):
+    """@UTC datetime64[us] for GPS seconds.
+
+    The inserted leap second itself (23:59:60) cannot be represented by
+    datetime64 and maps onto the first second of the following day.
+
+    @param gps
+        GPS time(s) [s]
+    """
+
+    gps = np.asarray(gps, dtype=np.float64)
+    leaps = np.searchsorted(_LEAP_GPS, gps, side='right')
+    offset = np.round((gps - leaps) * 1e6).astype(np.int64)
+    return GPS_EPOCH + offset.astype('timedelta64[us]')
+
+def gps_to_isot(gps):
+    """@ISO UTC string(s) with millisecond precision for GPS seconds.
+
+    Matches astropy.time.Time(gps, format='gps').isot.
+
+    @param gps
+        GPS time(s) [s]
+    """
+
+    utc = gps_to_utc(np.round(np.asarray(gps, dtype=np.float64), 3))
+    isot = np.datetime_as_string(utc, unit='ms')
+    if np.ndim(isot) == 0:
+        return str(isot)
+    return isot
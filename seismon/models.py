@@ -31,10 +31,9 @@ from sqlalchemy import create_engine
 #from arrow.arrow import Arrow
 
 from obspy.geodetics.base import gps2dist_azimuth
-from obspy.taup import TauPyModel
 
 import seismon
-from seismon import (eqmon, utils)
+from seismon import (eqmon, utils, traveltimes, pdlwatch, eventregistry)
 from seismon.config import app
 
 from flask_login.mixins import UserMixin
@@ -505,23 +504,17 @@ def compute_traveltimes(earthquake, ifo):
     Dist = distance/1000
     degree = (distance/6370000)*(180/np.pi)
 
-    model = TauPyModel(model="iasp91")
-
     Rtwotime = eqtime+TimeDelta(distance/2000.0 * u.s)
     RthreePointFivetime = eqtime+TimeDelta(distance/3500.0 * u.s)
     Rfivetime = eqtime+TimeDelta(distance/5000.0 * u.s)
 
     try:
-        arrivals = model.get_travel_times(source_depth_in_km=depth,
-                                          distance_in_degree=degree)
-
-        Ptime = -1
-        Stime = -1
-        for phase in arrivals:
-            if Ptime == -1 and phase.name.lower()[0] == "p":
-                Ptime = eqtime+TimeDelta(phase.time * u.s)
-            if Stime == -1 and phase.name.lower()[0] == "s":
-                Stime = eqtime+TimeDelta(phase.time * u.s)
+        ptime, stime = traveltimes.interpolate(traveltimes.load_table(),
+                                               depth, degree)
+        if np.isnan(ptime) or np.isnan(stime):
+            raise ValueError('No tabulated P or S arrival')
+        Ptime = eqtime+TimeDelta(float(ptime) * u.s)
+        Stime = eqtime+TimeDelta(float(stime) * u.s)
     except:
         Ptime, Stime = Rtwotime, Rtwotime 
 
@@ -563,12 +556,12 @@ def compute_amplitudes(earthquake, ifo):
         if trainData.empty:
             print('trainData DataFrame is empty! Update EQ Catalogue Database !!!')
             print('Reverting back to CSV based data fetching.')
-            trainData = pd.read_csv(trainFile)
+            trainData = eqmon.load_catalogue(trainFile,sidecar=True)
 
     except Exception as Excep: 
         print(Excep)
         print('Error occured. Could not connect to database. Reverting back to CSV based data fetching.')
-        trainData = pd.read_csv(trainFile)
+        trainData = eqmon.load_catalogue(trainFile,sidecar=True)
 
 
     thresh=0.1 #used to limit the geographical extend (latitude & longitude) to search around the current event
@@ -601,77 +594,59 @@ def ingest_ifos():
                               lon=ifos[det]["Longitude"]))
     DBSession().commit()
 
-def ingest_earthquakes(config, lookback, repeat=False):
+def ingest_earthquakes(config, lookback, repeat=False, registry=None):
 
 # convert lookback to TimeDelta
     lookbackTD = TimeDelta(lookback,format='jd')
 
-    folders = glob.glob(os.path.join(config["pdlcient"]["directory"],"*"))
-    for folder in folders:
-        folderSplit = folder.split("/")
-        eventName = folderSplit[len(folderSplit) - 1]
-        dataFolder = os.path.join(folder, eventName[0:2])
-        timeFolders = glob.glob(os.path.join(dataFolder,"*"))
-        timeFolders = sorted(timeFolders)
+    for eventName, timeFolder in pdlwatch.product_folders(config["pdlcient"]["directory"]):
 
-        if timeFolders == []:
+        if not pdlwatch.claim_product(timeFolder, repeat=repeat):
             continue
 
-        for timeFolder in timeFolders:
-            
-            attributeDic = []
-            eqxmlfile = os.path.join(timeFolder,"eqxml.xml")
-            quakemlfile = os.path.join(timeFolder,"quakeml.xml")
-
-            if not repeat:
-                if os.path.isfile(os.path.join(timeFolder,"eqxml.txt")):
-                    continue
-
-            f = open(os.path.join(timeFolder,"eqxml.txt"),"w")
-            f.write("Done")
-            f.close()
-
-            if os.path.isfile(eqxmlfile):
-                attributeDic = eqmon.read_eqxml(eqxmlfile,eventName)
-            elif os.path.isfile(quakemlfile):
-                attributeDic = eqmon.read_quakeml(quakemlfile,eventName)
+        # the database only keeps origin and magnitude, no travel times
+        attributeDic = pdlwatch.read_product_folder(timeFolder, eventName,
+                                                    traveltimes=False)
+        if attributeDic is None:
+            continue
 
-            if attributeDic == []:
-                continue
+        if registry is not None and not eventregistry.check_product(registry, attributeDic):
+            continue
 
-            if (not "GPS" in attributeDic) or (not "Magnitude" in attributeDic):
-                continue
+        ingest_earthquake(attributeDic, lookbackTD)
 
-            date = Time(attributeDic["Time"], format='isot', scale='utc')
+    if registry is not None:
+        print('Products processed: %d, skipped as unchanged: %d' % (registry["processed"], registry["skipped"]))
 
-            #(modified by NM on 03/10/21 to skip >> KeyError: 'Sent' )
-            try:
-                sent = Time(attributeDic["Sent"], format='isot', scale='utc')
-            except:
-                sent = Time(attributeDic["Time"], format='isot', scale='utc')
 
+def ingest_earthquake(attributeDic, lookbackTD):
 
+    date = Time(attributeDic["Time"], format='isot', scale='utc')
 
-            if Time.now() - date > lookbackTD: continue
+    #(modified by NM on 03/10/21 to skip >> KeyError: 'Sent' )
+    try:
+        sent = Time(attributeDic["Sent"], format='isot', scale='utc')
+    except:
+        sent = Time(attributeDic["Time"], format='isot', scale='utc')
 
-            eqs = Earthquake.query.filter_by(event_id=attributeDic["eventName"]).all()
-            if len(eqs) > 0: continue
+    if Time.now() - date > lookbackTD: return
 
-            DBSession().merge(Earthquake(depth=attributeDic["Depth"],
-                                         lat=attributeDic["Latitude"],
-                                         lon=attributeDic["Longitude"],
-                                         event_id=attributeDic["eventName"],
-                                         magnitude=attributeDic["Magnitude"],
-                                         date=date.datetime,
-                                         sent=sent.datetime))
+    eqs = Earthquake.query.filter_by(event_id=attributeDic["eventName"]).all()
+    if len(eqs) > 0: return
 
+    DBSession().merge(Earthquake(depth=attributeDic["Depth"],
+                                 lat=attributeDic["Latitude"],
+                                 lon=attributeDic["Longitude"],
+                                 event_id=attributeDic["eventName"],
+                                 magnitude=attributeDic["Magnitude"],
+                                 date=date.datetime,
+                                 sent=sent.datetime))
 
-                                         
-            print('Ingested event: %s' % attributeDic["eventName"])
-            DBSession().commit()
+    print('Ingested event: %s' % attributeDic["eventName"])
+    DBSession().commit()
 
 
-def run_seismon(purge=False, init_db=False):
+def run_seismon(purge=False, init_db=False, registry=None):
 
     if purge:
         sys_command = "find %s/* -type d -mtime +7 -exec rm -rf {} \;" % config["pdlcient"]["directory"]
@@ -685,9 +660,14 @@ def run_seismon(purge=False, init_db=False):
         dataframe2database = os.path.join(testpath,'test_upload_pandas_table_to_database.py')
         os.system('python {}'.format(dataframe2database))
 
-        ingest_earthquakes(config, args.lookback, repeat=True)
+        ingest_earthquakes(config, args.lookback, repeat=True, registry=registry)
     else:
-        ingest_earthquakes(config, args.lookback)
+        ingest_earthquakes(config, args.lookback, registry=registry)
+
+    run_predictions()
+
+
+def run_predictions():
 
     ifos = Ifo.query.all()
     eqs = Earthquake.query.all()
@@ -750,6 +730,8 @@ if __name__ == "__main__":
     parser.add_argument('-C', '--config', default='input/config.yaml')
     parser.add_argument('-l', '--lookback', default=7, help='lookback in days')
     parser.add_argument("-d", "--debug", action="store_true", default=False)
+    parser.add_argument("-w", "--watch", action="store_true", default=False,
+                        help='ingest new products as PDL writes them (inotify)')
 
     args = parser.parse_args()
 
@@ -776,14 +758,44 @@ if __name__ == "__main__":
             print(f' - {m}')
         ingest_ifos()
 
+    registry = eventregistry.new_registry()
+
     if args.debug:
-        run_seismon(purge=args.purge, init_db=args.init_db)
+        run_seismon(purge=args.purge, init_db=args.init_db, registry=registry)
         exit(0)
 
+    if args.watch:
+        import queue, threading
+
+        run_seismon(purge=args.purge, init_db=args.init_db, registry=registry)
+
+        productQueue = queue.Queue()
+        ingestThread = threading.Thread(target=pdlwatch.ingest_products,
+                         args=(config["pdlcient"]["directory"], productQueue),
+                         # the database keeps origin and magnitude only
+                         kwargs={"registry": registry, "traveltimes": False},
+                         daemon=True)
+        ingestThread.start()
+        lookbackTD = TimeDelta(args.lookback,format='jd')
+
+        print('Waiting for earthquakes to analyze!')
+        while True:
+            try:
+                attributeDic = productQueue.get(timeout=60)
+            except queue.Empty:
+                if not ingestThread.is_alive():
+                    print('PDL ingestion stopped... exiting')
+                    exit(1)
+                continue
+            ingest_earthquake(attributeDic, lookbackTD)
+            while not productQueue.empty():
+                ingest_earthquake(productQueue.get(), lookbackTD)
+            run_predictions()
+
     while True:
         #try:
         print('Looking for some earthquakes to analyze!')
-        run_seismon(purge=args.purge, init_db=args.init_db)
+        run_seismon(purge=args.purge, init_db=args.init_db, registry=registry)
         #except:
         #    pass
         time.sleep(15)
@@ -0,0 +1,324 @@
+#!/usr/bin/python
+
+"""Event-driven PDL product ingestion.
+
+The PDL client writes every product as
+
+    <directory>/<eventName>/<eventName[0:2]>/<timeFolder>/eqxml.xml
+
+(or quakeml.xml).  watch_products follows that tree with Linux inotify
+and yields a product folder as soon as its product file is closed after
+writing or moved into place.  Where inotify is not available, or a watch
+cannot be added (e.g. at the inotify watch limit), it falls back to
+globbing the tree every few seconds.  ingest_products parses the new
+products and puts them on a queue for prediction, marking each folder
+handled with an eqxml.txt file as the glob-based ingestion does; a
+product that fails to parse is reported and marked handled, so one bad
+product does not end the ingestion.
+"""
+
+import os, glob, time, errno, select, struct, ctypes, ctypes.util
+
+from lxml import etree
+
+import seismon.eqmon, seismon.eventregistry
+
+PRODUCT_FILES = ["eqxml.xml", "quakeml.xml"]
+MARKER_FILE = "eqxml.txt"
+
+# <eventName>/<source>/<timeFolder> below the PDL directory
+_DEPTH = 3
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+_EVENT = struct.Struct("iIII")
+
+def product_folders(directory):
+    """@(eventName, timeFolder) of every product below a PDL directory.
+
+    Folders are listed per event in sorted order, and only if they hold
+    a product file.
+
+    @param directory
+        PDL output directory
+    """
+
+    products = []
+    for folder in sorted(glob.glob(os.path.join(directory,"*"))):
+        eventName = os.path.basename(folder)
+        dataFolder = os.path.join(folder, eventName[0:2])
+        for timeFolder in sorted(glob.glob(os.path.join(dataFolder,"*"))):
+            if any(os.path.isfile(os.path.join(timeFolder,productFile)) for productFile in PRODUCT_FILES):
+                products.append((eventName, timeFolder))
+    return products
+
+def claim_product(timeFolder,repeat=False):
+    """@mark a product folder handled; False if it already was.
+
+    @param timeFolder
+        product folder
+    @param repeat
+        reclaim folders that are already marked
+    """
+
+    markerFile = os.path.join(timeFolder,MARKER_FILE)
+    if not repeat and os.path.isfile(markerFile):
+        return False
+
+    f = open(markerFile,"w")
+    f.write("Done")
+    f.close()
+    return True
+
+def read_product_folder(timeFolder,eventName,traveltimes=True):
+    """@parse the product in a folder, preferring EQXML over QuakeML.
+
+    Returns None if there is no usable product.
+
+    @param timeFolder
+        product folder
+    @param eventName
+        PDL event name
+    @param traveltimes
+        also calculate the travel times
+    """
+
+    attributeDic = []
+    eqxmlfile = os.path.join(timeFolder,"eqxml.xml")
+    quakemlfile = os.path.join(timeFolder,"quakeml.xml")
+
+    if os.path.isfile(eqxmlfile):
+        attributeDic = seismon.eqmon.read_eqxml(eqxmlfile,eventName,traveltimes=traveltimes)
+    elif os.path.isfile(quakemlfile):
+        attributeDic = seismon.eqmon.read_quakeml(quakemlfile,eventName,traveltimes=traveltimes)
+
+    if attributeDic == []:
+        return None
+    if (not "GPS" in attributeDic) or (not "Magnitude" in attributeDic):
+        return None
+    return attributeDic
+
+class Inotify(object):
+    """@minimal ctypes binding to the Linux inotify API.
+    """
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code))
+
+    def add_watch(self,path,mask):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            code = ctypes.get_errno()
+            raise OSError(code, os.strerror(code), path)
+        return wd
+
+    def read(self,timeout=None):
+        """@(wd, mask, name) of the pending events, waiting up to timeout [s].
+        """
+
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return []
+        try:
+            buf = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+
+        events = []
+        offset = 0
+        while offset < len(buf):
+            wd, mask, cookie, length = _EVENT.unpack_from(buf, offset)
+            offset += _EVENT.size
+            name = buf[offset:offset+length].rstrip(b"\0")
+            offset += length
+            events.append((wd, mask, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+def _watch_inotify(directory,stop,interval):
+    """@product folders from inotify events (see watch_products).
+    """
+
+    inotify = Inotify()
+    watches = {}
+
+    def add_tree(path,depth):
+        # watch first, then list, so nothing created in between is missed
+        try:
+            if depth < _DEPTH:
+                wd = inotify.add_watch(path, IN_CREATE | IN_MOVED_TO | IN_ONLYDIR)
+            else:
+                wd = inotify.add_watch(path, IN_CLOSE_WRITE | IN_MOVED_TO | IN_ONLYDIR)
+        except OSError as e:
+            if e.errno in [errno.ENOENT, errno.ENOTDIR]:
+                return []
+            raise
+        watches[wd] = (path, depth)
+
+        found = []
+        if depth < _DEPTH:
+            for name in sorted(os.listdir(path)):
+                if os.path.isdir(os.path.join(path,name)):
+                    found.extend(add_tree(os.path.join(path,name),depth+1))
+        elif any(os.path.isfile(os.path.join(path,productFile)) for productFile in PRODUCT_FILES):
+            found.append(path)
+        return found
+
+    def folder_product(timeFolder):
+        eventFolder = os.path.dirname(os.path.dirname(timeFolder))
+        return (os.path.basename(eventFolder), timeFolder)
+
+    try:
+        for timeFolder in add_tree(directory,0):
+            yield folder_product(timeFolder)
+
+        while stop is None or not stop.is_set():
+            for wd, mask, name in inotify.read(interval):
+                if mask & IN_Q_OVERFLOW:
+                    for product in product_folders(directory):
+                        yield product
+                    continue
+                if mask & IN_IGNORED:
+                    watches.pop(wd, None)
+                    continue
+                if not wd in watches:
+                    continue
+
+                path, depth = watches[wd]
+                if depth < _DEPTH:
+                    if mask & IN_ISDIR:
+                        for timeFolder in add_tree(os.path.join(path,name),depth+1):
+                            yield folder_product(timeFolder)
+                elif name in PRODUCT_FILES:
+                    yield folder_product(path)
+    finally:
+        inotify.close()
+
+def _watch_glob(directory,stop,poll):
+    """@product folders from globbing every poll seconds (see watch_products).
+    """
+
+    seen = set()
+    while True:
+        for product in product_folders(directory):
+            if not product[1] in seen:
+                seen.add(product[1])
+                yield product
+        if stop is None:
+            time.sleep(poll)
+        elif stop.wait(poll):
+            return
+
+def watch_products(directory,stop=None,useInotify=True,interval=0.5,poll=15.0):
+    """@yield (eventName, timeFolder) for every product, existing and new.
+
+    Products already on disk come first; after that a folder is yielded
+    whenever one of its product files is written.  A folder may be
+    yielded more than once (e.g. for both its EQXML and QuakeML), so
+    consumers should claim_product it.
+
+    @param directory
+        PDL output directory
+    @param stop
+        optional threading.Event ending the watch
+    @param useInotify
+        use inotify when available (otherwise always glob)
+    @param interval
+        how often the inotify loop checks stop [s]
+    @param poll
+        glob fallback period [s]
+    """
+
+    if useInotify:
+        try:
+            Inotify().close()
+        except (OSError, AttributeError):
+            useInotify = False
+
+    if useInotify:
+        return _watch_inotify_or_glob(directory,stop,interval,poll)
+    return _watch_glob(directory,stop,poll)
+
+def _watch_inotify_or_glob(directory,stop,interval,poll):
+    """@product folders from inotify, globbing from the first failure on
+    (see watch_products).
+    """
+
+    try:
+        for product in _watch_inotify(directory,stop,interval):
+            yield product
+        return
+    except OSError as e:
+        print("inotify watch of %s failed (%s)... globbing every %.0f s"%(directory,e,poll))
+    # products already claimed are skipped by the consumer
+    for product in _watch_glob(directory,stop,poll):
+        yield product
+
+def ingest_products(directory,productQueue,stop=None,repeat=False,useInotify=True,poll=15.0,registry=None,traveltimes=True):
+    """@parse new products and queue them for prediction until stopped.
+
+    Each queued item is the attributeDic of one product.  With a registry
+    (see seismon.eventregistry), revisions that change nothing the
+    predictions depend on are marked handled but not queued, and their
+    travel times are never calculated.
+
+    @param directory
+        PDL output directory
+    @param productQueue
+        queue.Queue receiving the parsed products
+    @param stop
+        optional threading.Event ending the ingestion
+    @param repeat
+        reprocess folders that are already marked
+    @param useInotify
+        use inotify when available (otherwise glob)
+    @param poll
+        glob fallback period [s]
+    @param registry
+        optional product-version registry
+    @param traveltimes
+        calculate the travel times of the queued products
+    """
+
+    for eventName, timeFolder in watch_products(directory,stop=stop,useInotify=useInotify,poll=poll):
+        if not repeat and os.path.isfile(os.path.join(timeFolder,MARKER_FILE)):
+            continue
+        try:
+            attributeDic = read_product_folder(timeFolder,eventName,
+                                               traveltimes=traveltimes and registry is None)
+        except etree.XMLSyntaxError as e:
+            # caught mid-write; the close-write event brings it back
+            print("Skipping %s for now: %s"%(timeFolder,e))
+            continue
+        except Exception as e:
+            print("Skipping %s: %s: %s"%(timeFolder,type(e).__name__,e))
+            claim_product(timeFolder,repeat=True)
+            continue
+        claim_product(timeFolder,repeat=True)
+        if attributeDic is None:
+            continue
+        try:
+            if registry is not None:
+                if not seismon.eventregistry.check_product(registry,attributeDic):
+                    continue
+                if traveltimes:
+                    attributeDic = seismon.eqmon.calculate_traveltimes(attributeDic)
+        except Exception as e:
+            print("Skipping %s: %s: %s"%(timeFolder,type(e).__name__,e))
+            continue
+        productQueue.put(attributeDic)
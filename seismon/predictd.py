@@ -0,0 +1,223 @@
+#!/usr/bin/python
+
+"""Long-lived prediction daemon.
+
+seismon_predictd keeps the training catalogues, their neighbour indexes
+and the travel-time tables resident and answers requests over a Unix
+domain socket.  The protocol is JSON lines: every request is one JSON
+object on one line, e.g.
+
+    {"method": "traveltimes", "event": {"Latitude": ..., ...}}
+    {"method": "loc", "event": {...}, "ifos": ["LHO", "LLO"]}
+
+and every response is one line, {"ok": true, "result": ...} or
+{"ok": false, "error": "..."}.  Numpy arrays survive the round trip.
+
+The socket lives in a directory only its user can enter ($XDG_RUNTIME_DIR,
+else ~/.cache/seismon) and is itself readable by its user only; clients
+refuse a socket owned by anyone else.
+"""
+
+import os, stat, json, socket, socketserver
+
+import numpy as np
+
+import seismon
+import seismon.eqmon, seismon.traveltimes
+
+def socket_directory():
+    """@per-user directory holding the default socket.
+    """
+
+    runtimeDir = os.getenv("XDG_RUNTIME_DIR", None)
+    if runtimeDir:
+        return runtimeDir
+    return os.path.join(os.path.expanduser("~"),".cache","seismon")
+
+def default_socket_file():
+    """@default socket path (per user), overridden by SEISMON_PREDICTD_SOCKET.
+    """
+
+    socketFile = os.getenv("SEISMON_PREDICTD_SOCKET", None)
+    if socketFile is None:
+        socketFile = os.path.join(socket_directory(),"seismon_predictd.sock")
+    return socketFile
+
+def check_owner(path):
+    """@raise OSError unless path belongs to this user.
+
+    @param path
+        socket or directory
+    """
+
+    owner = os.stat(path).st_uid
+    if owner != os.getuid():
+        raise OSError("%s is owned by uid %d, not %d"%(path,owner,os.getuid()))
+
+def _encode(obj):
+    """@json default hook keeping numpy arrays and scalars.
+    """
+
+    if isinstance(obj, np.ndarray):
+        return {"__ndarray__": obj.tolist(), "dtype": obj.dtype.str}
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError("%s is not JSON serializable"%type(obj).__name__)
+
+def _decode(obj):
+    """@json object hook restoring numpy arrays.
+    """
+
+    if "__ndarray__" in obj:
+        return np.array(obj["__ndarray__"], dtype=obj["dtype"])
+    return obj
+
+def dumps(message):
+    """@one JSON line for a message.
+
+    @param message
+        request or response dictionary
+    """
+
+    return (json.dumps(message, default=_encode) + "\n").encode('utf-8')
+
+def loads(line):
+    """@message from one JSON line.
+
+    @param line
+        bytes read from the socket
+    """
+
+    return json.loads(line.decode('utf-8'), object_hook=_decode)
+
+def warm():
+    """@load everything the predictions need into this process.
+    """
+
+    seismonpath = os.path.dirname(seismon.__file__)
+    scriptpath = os.path.join(seismonpath,'input')
+    for name in ['LHO','LLO']:
+        trainFile = os.path.join(scriptpath,'%s_processed_USGS_global_EQ_catalogue.csv'%name)
+        seismon.eqmon.load_catalogue(trainFile,sidecar=True)
+        seismon.eqmon.load_catalogue_index(trainFile)
+    seismon.traveltimes.load_table()
+    seismon.traveltimes.load_p_and_s(scriptpath)
+    # the fallback where the table is not trusted
+    seismon.traveltimes.taup_model()
+    # and one request of each kind, so nothing is left to build lazily
+    handle({"method": "loc", "ifos": ['LHO','LLO'],
+            "event": {"Latitude": 0.0, "Longitude": 0.0, "Depth": 10.0,
+                      "Magnitude": 6.0, "GPS": 1e9}})
+
+def handle(request):
+    """@answer one request.
+
+    @param request
+        decoded request dictionary
+    """
+
+    method = request.get("method")
+    if method == "ping":
+        return "pong"
+
+    attributeDic = dict(request["event"])
+    attributeDic["traveltimes"] = {}
+    pred = request.get("pred",True)
+    if method == "traveltimes":
+        attributeDic = seismon.eqmon.calculate_traveltimes(attributeDic,pred=pred,client=False)
+        return attributeDic["traveltimes"]
+    elif method == "loc":
+        attributeDic = seismon.eqmon.calculate_traveltimes(attributeDic,pred=pred,client=False)
+        for ifo in request["ifos"]:
+            attributeDic = seismon.eqmon.eqmon_loc(attributeDic,ifo,pred=pred)
+        return attributeDic["traveltimes"]
+    else:
+        raise ValueError("Unknown method %s"%method)
+
+class PredictdHandler(socketserver.StreamRequestHandler):
+    """@serve JSON-line requests until the client hangs up.
+    """
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                response = {"ok": True, "result": handle(loads(line))}
+            except Exception as e:
+                response = {"ok": False, "error": "%s: %s"%(type(e).__name__,e)}
+            self.wfile.write(dumps(response))
+            self.wfile.flush()
+
+class PredictdServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        # no other user may connect, wherever the socket is
+        umask = os.umask(0o177)
+        try:
+            socketserver.UnixStreamServer.server_bind(self)
+        finally:
+            os.umask(umask)
+
+def serve(socketFile=None):
+    """@warm the caches and serve predictions until interrupted.
+
+    @param socketFile
+        Unix socket path (defaults to default_socket_file())
+    """
+
+    if socketFile is None:
+        socketFile = default_socket_file()
+    socketDirectory = os.path.dirname(os.path.abspath(socketFile))
+    if not os.path.isdir(socketDirectory):
+        os.makedirs(socketDirectory, mode=0o700)
+    check_owner(socketDirectory)
+    if os.stat(socketDirectory).st_mode & stat.S_IWOTH and \
+        not os.stat(socketDirectory).st_mode & stat.S_ISVTX:
+        raise OSError("%s is writable by every user"%socketDirectory)
+    if os.path.exists(socketFile):
+        check_owner(socketFile)
+        os.remove(socketFile)
+
+    warm()
+    server = PredictdServer(socketFile, PredictdHandler)
+    print("seismon_predictd listening on %s"%socketFile)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        if os.path.exists(socketFile):
+            os.remove(socketFile)
+
+def request(message,socketFile=None,timeout=10.0):
+    """@send one request to the daemon and return its result.
+
+    Raises OSError if the daemon is not reachable or its socket belongs
+    to another user, and RuntimeError if it reports a failure.
+
+    @param message
+        request dictionary
+    @param socketFile
+        Unix socket path (defaults to default_socket_file())
+    @param timeout
+        socket timeout [s]
+    """
+
+    if socketFile is None:
+        socketFile = default_socket_file()
+
+    check_owner(socketFile)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socketFile)
+        sock.sendall(dumps(message))
+        with sock.makefile('rb') as f:
+            line = f.readline()
+
+    if not line:
+        raise OSError("seismon_predictd closed the connection")
+    response = loads(line)
+    if not response["ok"]:
+        raise RuntimeError(response["error"])
+    return response["result"]
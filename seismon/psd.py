@@ -6,7 +6,7 @@ import numpy as np
 import scipy.signal, scipy.stats
 from scipy import optimize
 import seismon.NLNM, seismon.html
-import seismon.eqmon, seismon.utils
+import seismon.eqmon, seismon.utils, seismon.psdstore, seismon.psdrollup, seismon.textarchive
 from matplotlib import cm
 
 try:
@@ -44,9 +44,6 @@ def save_data(params,channel,gpsStart,gpsEnd,data,attributeDics):
 
     ifo = seismon.utils.getIfo(params)
 
-    psdDirectory = params["dirPath"] + "/Text_Files/PSD/" + channel.station_underscore + "/" + str(params["fftDuration"])
-    seismon.utils.mkdir(psdDirectory)
-
     powerlawDirectory = params["dirPath"] + "/Text_Files/Powerlaw/" + channel.station_underscore + "/" + str(params["fftDuration"])
     seismon.utils.mkdir(powerlawDirectory)
 
@@ -73,11 +70,11 @@ def save_data(params,channel,gpsStart,gpsEnd,data,attributeDics):
 
     freq = np.array(data["dataASD"].frequencies)
 
-    psdFile = os.path.join(psdDirectory,"%d-%d.txt"%(gpsStart,gpsEnd))
-    f = open(psdFile,"wb")
-    for i in range(len(freq)):
-        f.write("%e %e\n"%(freq[i],data["dataASD"][i].value))
-    f.close()
+    store = seismon.psdstore.psd_store(params,channel)
+    store.write(gpsStart,gpsEnd,freq,np.array(data["dataASD"].value))
+    if params.get("doPSDRollups",False):
+        seismon.psdrollup.update_rollups(params["dirPath"],channel.station_underscore,params["fftDuration"],
+            [gpsStart],freq,[np.array(data["dataASD"].value)])
 
     freq = np.array(data["dataFFT"].frequencies)
 
@@ -112,18 +109,8 @@ def save_data(params,channel,gpsStart,gpsEnd,data,attributeDics):
     freq = np.array(specgram.frequencies)
     times = np.array(specgram.times)
 
-    spectrogramFile = os.path.join(spectrogramDirectory,"%d-%d.txt"%(gpsStart,gpsEnd))
-    f = open(spectrogramFile,"wb")
-    f.write("-1")
-    for jj in range(len(times)):
-        f.write(" %.10f "%times[jj])
-    f.write("\n")
-    for ii in range(len(freq)):
-        f.write("%.10f"%freq[ii])
-        for jj in range(len(times)):
-                f.write(" %e "%(specgram[jj,ii].value))
-        f.write("\n")
-    f.close()
+    seismon.psdstore.write_spectrogram(spectrogramDirectory,gpsStart,gpsEnd,times,freq,
+        np.asarray(specgram.value),spectrogramFormat=params.get("spectrogramFormat","text"))
 
     if params["doPowerLawFit"]:
         xdata = freq
@@ -678,10 +665,10 @@ def spectra(params, channel, segment):
             earthquakesDirectory = params["dirPath"] + "/Text_Files/Earthquakes/" + channel.station_underscore + "/" + str(params["fftDuration"])
             earthquakesFile = os.path.join(earthquakesDirectory,"%s.txt"%(attributeDic["eventName"]))
  
-            if not os.path.isfile(earthquakesFile):
+            if not seismon.textarchive.isfile(earthquakesFile):
                 continue
 
-            data_out = np.loadtxt(earthquakesFile)
+            data_out = seismon.textarchive.loadtxt(earthquakesFile)
             ttMax = data_out[0]
             kwargs = {"linestyle":"-","color":"k"}
             #plot.add_line([ttMax,ttMax],ylim,label="Max amplitude",**kwargs)
@@ -1040,35 +1027,52 @@ def analysis(params, channel):
         seismon channel structure
     """
 
-    psdDirectory = params["dirPath"] + "/Text_Files/PSD/" + channel.station_underscore + "/" + str(params["fftDuration"])
-    files = glob.glob(os.path.join(psdDirectory,"*.txt"))
-
-    files = sorted(files)
+    store = seismon.psdstore.psd_store(params,channel)
 
+    count = None
     if not params["doFreqAnalysis"]:
-        if len(files) > 1000:
-            files = files[:1000]
-
-    #files = files[-10:]
+        count = 1000
+
+    rollup = None
+    if params.get("doPSDRollups",False):
+        # the span of the segments the spectra would cover, unless asked
+        # for a fixed span; only the index of the store is read for it
+        ttStart, ttEnd = store.segments()
+        ttStart, ttEnd = ttStart[:count], ttEnd[:count]
+        rollupStart, rollupEnd = params["gpsStart"], params["gpsEnd"]
+        if len(ttStart) > 0:
+            rollupStart, rollupEnd = ttStart[0], ttEnd[-1]
+        if params.get("psdRollupDuration") is not None:
+            rollupStart, rollupEnd = params["gpsEnd"]-params["psdRollupDuration"], params["gpsEnd"]
+        rollup = seismon.psdrollup.read_rollups(params["dirPath"],channel.station_underscore,params["fftDuration"],
+            rollupStart,rollupEnd)
+
+    # with rollups the percentiles and band significances need only the
+    # segment at gpsStart; the spectrogram behind the plots and the
+    # frequency analysis still needs the segments themselves
+    needSpecgram = rollup is None or params["doPlots"] or params["doFreqAnalysis"]
+    if needSpecgram:
+        ttStart, ttEnd, psdFreq, psdSpectra = store.read_segments(count=count)
+    else:
+        ttStart, ttEnd, psdFreq, psdSpectra = store.read_segments(gpsStart=params["gpsStart"],count=1)
+    if rollup is not None and len(ttStart) > 0 and not seismon.psdrollup.same_grid(rollup,psdFreq):
+        print("PSD rollups do not match the PSD frequencies... using the spectra\n")
+        rollup = None
+        if not needSpecgram:
+            needSpecgram = True
+            ttStart, ttEnd, psdFreq, psdSpectra = store.read_segments(count=count)
 
     tts = []
     spectra = []
 
-    for file in files:
-
-        fileSplit = file.split("/")
-        txtFile = fileSplit[-1].replace(".txt","")
-        txtFileSplit = txtFile.split("-")
-        thisTTStart = int(txtFileSplit[0])
-        thisTTEnd = int(txtFileSplit[1])
-        tt = thisTTStart
+    for tt, spectrum in zip(ttStart.tolist(),psdSpectra):
 
         if tt in tts:
             continue
 
         tts.append(tt)
 
-        spectra_out = gwpy.frequencyseries.Spectrum.read(file,format='dat')
+        spectra_out = gwpy.frequencyseries.Spectrum(spectrum,frequencies=psdFreq)
         spectra_out.unit = 'counts/Hz^(1/2)'
         spectra.append(spectra_out)
 
@@ -1083,28 +1087,41 @@ def analysis(params, channel):
         print("data only zeroes... continuing\n")
         return
 
-    dt = tts[1] - tts[0]
-    epoch = gwpy.time.Time(tts[0], format='gps')
-    specgram = gwpy.spectrogram.Spectrogram.from_spectra(*spectra, dt=dt,epoch=epoch)
+    freq = np.array(psdFreq)
 
-    freq = np.array(specgram.frequencies)
-
-    # Define bins for the spectral variation histogram
-    kwargs = {'log':True,'nbins':500,'norm':True}
-    #kwargs = {'log':True,'nbins':500}
-    specvar = gwpy.frequencyseries.hist.SpectralVariance.from_spectrogram(specgram,**kwargs) 
-    bins = specvar.bins[:-1]
-    specvar = specvar * 100
+    specgram = None
+    if needSpecgram:
+        dt = tts[1] - tts[0]
+        epoch = gwpy.time.Time(tts[0], format='gps')
+        specgram = gwpy.spectrogram.Spectrogram.from_spectra(*spectra, dt=dt,epoch=epoch)
 
     if params["doFreqAnalysis"]:
         freq_analysis(params,channel,ttStart,freq,specgram)
 
-    # Calculate percentiles
-    spectral_variation_1per = specvar.percentile(1)
-    spectral_variation_10per = specvar.percentile(10)
-    spectral_variation_50per = specvar.percentile(50)
-    spectral_variation_90per = specvar.percentile(90)
-    spectral_variation_99per = specvar.percentile(99)
+    if rollup is not None:
+        # merged hourly and daily rollups instead of the raw spectra
+        bins, specvarValues = seismon.psdrollup.spectral_variance(rollup)
+        bins = bins[:-1]
+        spectral_variation_1per, spectral_variation_10per, spectral_variation_50per, \
+            spectral_variation_90per, spectral_variation_99per = \
+            [gwpy.frequencyseries.Spectrum(values,frequencies=freq) for values in
+             seismon.psdrollup.percentiles(rollup,[1,10,50,90,99])]
+        fractionBelow = seismon.psdrollup.fraction_below(rollup,spectraNow.value)
+    else:
+        # Define bins for the spectral variation histogram
+        kwargs = {'log':True,'nbins':500,'norm':True}
+        #kwargs = {'log':True,'nbins':500}
+        specvar = gwpy.frequencyseries.hist.SpectralVariance.from_spectrogram(specgram,**kwargs) 
+        bins = specvar.bins[:-1]
+        specvar = specvar * 100
+        specvarValues = specvar.value
+
+        # Calculate percentiles
+        spectral_variation_1per = specvar.percentile(1)
+        spectral_variation_10per = specvar.percentile(10)
+        spectral_variation_50per = specvar.percentile(50)
+        spectral_variation_90per = specvar.percentile(90)
+        spectral_variation_99per = specvar.percentile(99)
 
     textDirectory = params["path"] + "/" + channel.station_underscore
     seismon.utils.mkdir(textDirectory)
@@ -1131,6 +1148,8 @@ def analysis(params, channel):
             if ff_ave[i] <= freq[j] and freq[j] <= ff_ave[i+1]:
                 newFreq.append(freq[j])
                 newSpectraNow.append(spectraNow.value[j])
+                if specgram is None:
+                    continue
                 if newSpectra == []:
                     newSpectra = specgram.value[:,j]
                 else:                 
@@ -1140,13 +1159,21 @@ def analysis(params, channel):
         if len(newSpectra.shape) > 1:
             newSpectra = np.mean(newSpectra, axis = 0)
         try:
-            sig, bgcolor = seismon.utils.html_bgcolor(np.mean(newSpectraNow),newSpectra)
+            if rollup is not None:
+                band = (ff_ave[i] <= freq) & (freq <= ff_ave[i+1])
+                sig = np.mean(fractionBelow[band])
+                bgcolor = seismon.utils.html_bgcolor_sig(sig)
+            else:
+                sig, bgcolor = seismon.utils.html_bgcolor(np.mean(newSpectraNow),newSpectra)
         except:
             sig = 0
             bgcolor = 'nan'
 
         f.write("%e %e %e %e %s\n"%(ff_ave[i],ff_ave[i+1],np.mean(newSpectraNow),sig,bgcolor))
 
+        if specgram is None:
+            continue
+
         key = "%s-%s"%(ff_ave[i],ff_ave[i+1])
 
         dt = tts[-1] - tts[-2]
@@ -1255,7 +1282,7 @@ def analysis(params, channel):
         ax = plt.subplot(111)
         #im = plt.pcolor(X,Y,np.transpose(spectral_variation_norm), cmap=plt.cm.jet)
 
-        im = plt.pcolor(X,Y,np.transpose(specvar.value), cmap=plt.cm.jet)
+        im = plt.pcolor(X,Y,np.transpose(specvarValues), cmap=plt.cm.jet)
         ax.set_xscale('log')
         ax.set_yscale('log')
         plt.semilogx(freq,spectraNow, 'k', label='Current')
@@ -1306,13 +1333,13 @@ def channel_summary(params, segment):
     data = {}
     for channel in params["channels"]:
 
-        psdDirectory = params["dirPath"] + "/Text_Files/PSD/" + channel.station_underscore + "/" + str(params["fftDuration"])
-        file = os.path.join(psdDirectory,"%d-%d.txt"%(gpsStart,gpsEnd))
+        store = seismon.psdstore.psd_store(params,channel)
+        psd = store.read(gpsStart,gpsEnd)
 
-        if not os.path.isfile(file):
+        if psd is None:
             continue
 
-        spectra_out = gwpy.frequencyseries.Spectrum.read(file,format='dat')
+        spectra_out = gwpy.frequencyseries.Spectrum(psd[1],frequencies=psd[0])
         spectra_out.unit = 'counts/Hz^(1/2)'
 
         if np.sum(spectra_out.value) == 0.0:
@@ -1327,7 +1354,7 @@ def channel_summary(params, segment):
             seismon.utils.mkdir(powerlawDirectory)
 
             powerlawFile = os.path.join(powerlawDirectory,"%d-%d.txt"%(gpsStart,gpsEnd))
-            data_out = np.loadtxt(powerlawFile)
+            data_out = seismon.textarchive.loadtxt(powerlawFile)
             data[channel.station_underscore]["powerlaw"] = data_out
 
     if data == {}:
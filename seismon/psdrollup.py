@@ -0,0 +1,439 @@
+#!/usr/bin/python
+
+"""Hourly and daily PSD rollups.
+
+A rollup summarises every PSD segment of a channel and FFT duration that
+starts in one hour (or one day): per frequency, a histogram of
+log10(amplitude) over fixed bins, and the number of segments and the sum
+and sum of squares of the amplitudes.  Rollups over the same bins and
+frequencies merge by adding, so the spectral variance, percentiles, mean
+and standard deviation over any range of whole hours come from merging
+the daily rollups of the days inside it and the hourly rollups of the
+hours at its edges, instead of from rereading every raw spectrum.
+
+Rollups are kept as compressed .npz files in
+
+    Text_Files/PSDRollup/<station>/<fftDuration>/<resolution>/<start>-<end>.npz
+
+and updated (under a file lock) as each segment is saved.  A rollup
+records the segments it holds, so saving a segment again does not count
+it twice.  Amplitudes below the bins (including zeros), above them and
+NaN are counted per frequency on their own ("underflow", "overflow" and
+"nan") and left out of the histogram, the percentiles and the spectral
+variance; NaN is also left out of the mean and standard deviation.
+Rollups written before these counts existed clipped such amplitudes into
+the first or last bin.
+
+Segments on another frequency grid than a period's rollup (after a
+change of sample rate or FFT settings) are skipped with a warning, and
+read_rollups merges the rollups on the grid of the latest period only.
+"""
+
+import os, fcntl, contextlib
+
+import numpy as np
+
+import seismon.utils, seismon.backfill, seismon.psdstore
+
+RESOLUTIONS = {"hour": 3600, "day": 86400}
+
+# log10 amplitude bin edges; rollups only merge over the same edges
+BIN_EDGES = np.linspace(-16.0, 4.0, 1001)
+
+def rollup_directory(dirPath,station,fftDuration,resolution):
+    """@directory holding the rollups of a channel at one resolution
+
+    @param dirPath
+        seismon output directory
+    @param station
+        channel station_underscore
+    @param fftDuration
+        FFT duration
+    @param resolution
+        "hour" or "day"
+    """
+
+    return os.path.join(dirPath,"Text_Files","PSDRollup",station,str(fftDuration),resolution)
+
+def rollup_filename(directory,resolution,period):
+    """@rollup file of one period
+
+    @param directory
+        rollup directory
+    @param resolution
+        "hour" or "day"
+    @param period
+        gps // period length
+    """
+
+    length = RESOLUTIONS[resolution]
+    return os.path.join(directory,"%d-%d.npz"%(period*length,(period+1)*length))
+
+def empty_rollup(gpsStart,gpsEnd,freq,edges=BIN_EDGES):
+    """@rollup holding no segments
+
+    @param gpsStart
+        start gps of the period
+    @param gpsEnd
+        end gps of the period
+    @param freq
+        frequencies
+    @param edges
+        log10 amplitude bin edges
+    """
+
+    freq = np.asarray(freq,dtype=np.float64)
+    rollup = {}
+    rollup["gpsStart"] = gpsStart
+    rollup["gpsEnd"] = gpsEnd
+    rollup["freq"] = freq
+    rollup["edges"] = np.asarray(edges,dtype=np.float64)
+    rollup["hist"] = np.zeros((len(freq),len(edges)-1),dtype=np.int64)
+    rollup["count"] = 0
+    for key in ["underflow","overflow","nan"]:
+        rollup[key] = np.zeros(len(freq),dtype=np.int64)
+    rollup["sum"] = np.zeros(len(freq))
+    rollup["sum2"] = np.zeros(len(freq))
+    rollup["ttStart"] = np.zeros(0,dtype=np.int64)
+    return rollup
+
+def add_spectra(rollup,ttStart,spectra):
+    """@add segments to a rollup (in place), skipping those it holds
+
+    Returns the number of segments added.
+
+    @param rollup
+        rollup
+    @param ttStart
+        segment start gps
+    @param spectra
+        (n_segments, n_freq) amplitude spectra
+    """
+
+    ttStart = np.asarray(ttStart,dtype=np.int64)
+    spectra = np.asarray(spectra,dtype=np.float64).reshape(len(ttStart),len(rollup["freq"]))
+    ttStart, first = np.unique(ttStart,return_index=True)
+    keep = ~np.isin(ttStart,rollup["ttStart"])
+    ttStart = ttStart[keep]
+    spectra = spectra[first[keep]]
+    if len(ttStart) == 0:
+        return 0
+
+    edges = rollup["edges"]
+    nan = np.isnan(spectra)
+    with np.errstate(divide="ignore",invalid="ignore"):
+        bins = np.searchsorted(edges,np.log10(np.where(nan,1.0,spectra)),side="right") - 1
+    # zeros and negative amplitudes have no logarithm and count as underflow
+    underflow = ~nan & ((bins < 0) | (spectra <= 0))
+    overflow = ~nan & ~underflow & (bins > len(edges)-2)
+    inRange = ~(nan | underflow | overflow)
+    freqIndexes = np.broadcast_to(np.arange(len(rollup["freq"])),bins.shape)
+    np.add.at(rollup["hist"],(freqIndexes[inRange],bins[inRange]),1)
+
+    rollup["count"] += len(ttStart)
+    rollup["underflow"] += np.sum(underflow,axis=0)
+    rollup["overflow"] += np.sum(overflow,axis=0)
+    rollup["nan"] += np.sum(nan,axis=0)
+    finite = np.where(nan,0.0,spectra)
+    rollup["sum"] += np.sum(finite,axis=0)
+    rollup["sum2"] += np.sum(finite**2,axis=0)
+    rollup["ttStart"] = np.sort(np.concatenate((rollup["ttStart"],ttStart)))
+    return len(ttStart)
+
+def merge_rollups(rollups):
+    """@one rollup summarising all the segments of several
+
+    Returns None for an empty list.
+
+    @param rollups
+        rollups over the same frequencies and bins
+    """
+
+    rollups = list(rollups)
+    if len(rollups) == 0:
+        return None
+
+    merged = empty_rollup(min(rollup["gpsStart"] for rollup in rollups),
+                          max(rollup["gpsEnd"] for rollup in rollups),
+                          rollups[0]["freq"],rollups[0]["edges"])
+    ttStart = [merged["ttStart"]]
+    for rollup in rollups:
+        if not np.array_equal(rollup["freq"],merged["freq"]) or not np.array_equal(rollup["edges"],merged["edges"]):
+            raise ValueError("rollups %d-%d and %d-%d have different frequencies or bins"%(
+                merged["gpsStart"],merged["gpsEnd"],rollup["gpsStart"],rollup["gpsEnd"]))
+        merged["hist"] += rollup["hist"]
+        merged["count"] += rollup["count"]
+        for key in ["underflow","overflow","nan"]:
+            merged[key] += rollup[key]
+        merged["sum"] += rollup["sum"]
+        merged["sum2"] += rollup["sum2"]
+        ttStart.append(rollup["ttStart"])
+    merged["ttStart"] = np.sort(np.concatenate(ttStart))
+    return merged
+
+def save_rollup(file,rollup):
+    """@write a rollup file
+
+    @param file
+        rollup file
+    @param rollup
+        rollup
+    """
+
+    rollup = dict(rollup)
+    # only the bins holding any segment are written (the amplitudes of a
+    # channel span a small part of BIN_EDGES), which keeps compressing
+    # the file on every saved segment cheap
+    used = np.nonzero(np.any(rollup["hist"] > 0,axis=0))[0]
+    histStart, histEnd = (used[0], used[-1]+1) if len(used) else (0, 0)
+    # a day holds at most 86400 segments, far below 2**32
+    rollup["hist"] = rollup["hist"][:,histStart:histEnd].astype(np.uint32)
+    rollup["histStart"] = histStart
+    with seismon.backfill.atomic_write(file,"wb") as f:
+        np.savez_compressed(f,**rollup)
+
+def load_rollup(file):
+    """@read a rollup file
+
+    @param file
+        rollup file
+    """
+
+    with np.load(file) as data:
+        rollup = dict((key, data[key]) for key in data.files)
+    for key in ["gpsStart","gpsEnd","count"]:
+        rollup[key] = int(rollup[key])
+    hist = np.zeros((len(rollup["freq"]),len(rollup["edges"])-1),dtype=np.int64)
+    # older rollups hold every bin
+    histStart = int(rollup.pop("histStart",0))
+    hist[:,histStart:histStart+rollup["hist"].shape[1]] = rollup["hist"]
+    rollup["hist"] = hist
+    # older rollups clipped these into the end bins
+    for key in ["underflow","overflow","nan"]:
+        rollup[key] = rollup[key].astype(np.int64) if key in rollup else \
+            np.zeros(len(rollup["freq"]),dtype=np.int64)
+    return rollup
+
+def same_grid(rollup,freq):
+    """@whether a rollup is over the given frequencies
+
+    @param rollup
+        rollup
+    @param freq
+        frequencies
+    """
+
+    freq = np.asarray(freq,dtype=np.float64)
+    # text PSD files keep the frequencies to 7 digits
+    return rollup["freq"].shape == freq.shape and np.allclose(rollup["freq"],freq,rtol=1e-5)
+
+@contextlib.contextmanager
+def _locked(directory):
+    """@an exclusive lock on a rollup directory
+    """
+
+    seismon.utils.mkdir(directory)
+    with open(os.path.join(directory,".lock"),"a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+def update_rollups(dirPath,station,fftDuration,ttStart,freq,spectra):
+    """@add segments to the hourly and daily rollups they start in
+
+    @param dirPath
+        seismon output directory
+    @param station
+        channel station_underscore
+    @param fftDuration
+        FFT duration
+    @param ttStart
+        segment start gps
+    @param freq
+        frequencies
+    @param spectra
+        (n_segments, n_freq) amplitude spectra
+    """
+
+    ttStart = np.asarray(ttStart,dtype=np.int64)
+    spectra = np.asarray(spectra,dtype=np.float64).reshape(len(ttStart),len(freq))
+
+    for resolution, length in RESOLUTIONS.items():
+        directory = rollup_directory(dirPath,station,fftDuration,resolution)
+        periods = ttStart // length
+        with _locked(directory):
+            for period in np.unique(periods):
+                file = rollup_filename(directory,resolution,period)
+                if os.path.isfile(file):
+                    rollup = load_rollup(file)
+                    if not same_grid(rollup,freq):
+                        print("%s is over other frequencies... not adding %d segments to it"%(
+                            file,np.sum(periods == period)))
+                        continue
+                else:
+                    rollup = empty_rollup(int(period)*length,(int(period)+1)*length,freq)
+                keep = periods == period
+                if add_spectra(rollup,ttStart[keep],spectra[keep]) > 0:
+                    save_rollup(file,rollup)
+
+def rebuild_rollups(params,channel,gpsStart=None,gpsEnd=None,batch=1000):
+    """@add the segments already in a channel's PSD store to its rollups
+    (segments the rollups hold are skipped)
+
+    Returns the number of segments read.
+
+    @param params
+        seismon params dictionary
+    @param channel
+        seismon channel structure
+    @param gpsStart
+        optional start gps
+    @param gpsEnd
+        optional end gps
+    @param batch
+        segments per update
+    """
+
+    store = seismon.psdstore.psd_store(params,channel)
+    ttStart, ttEnd = store.segments(gpsStart,gpsEnd)
+    for ii in range(0,len(ttStart),batch):
+        starts, ends, freq, spectra = store.read_segments(ttStart[ii],ttEnd[min(ii+batch,len(ttEnd))-1])
+        update_rollups(params["dirPath"],channel.station_underscore,params["fftDuration"],starts,freq,spectra)
+    return len(ttStart)
+
+def read_rollups(dirPath,station,fftDuration,gpsStart,gpsEnd):
+    """@merged rollup of the segments starting in [gpsStart, gpsEnd],
+    rounded out to whole hours, or None if there are none
+
+    Whole days come from the daily rollups and the hours at either edge
+    from the hourly ones.  Rollups over other frequencies than the
+    latest one are left out (with a warning).
+
+    @param dirPath
+        seismon output directory
+    @param station
+        channel station_underscore
+    @param fftDuration
+        FFT duration
+    @param gpsStart
+        start gps
+    @param gpsEnd
+        end gps
+    """
+
+    hour = RESOLUTIONS["hour"]
+    day = RESOLUTIONS["day"]
+    hourStart = int(gpsStart) // hour
+    hourEnd = -(-int(gpsEnd) // hour)
+    dayStart = -(-hourStart*hour // day)
+    dayEnd = hourEnd*hour // day
+
+    files = []
+    if dayStart < dayEnd:
+        directory = rollup_directory(dirPath,station,fftDuration,"day")
+        files.extend(rollup_filename(directory,"day",period) for period in range(dayStart,dayEnd))
+        hours = list(range(hourStart,dayStart*day//hour)) + list(range(dayEnd*day//hour,hourEnd))
+    else:
+        hours = range(hourStart,hourEnd)
+    directory = rollup_directory(dirPath,station,fftDuration,"hour")
+    files.extend(rollup_filename(directory,"hour",period) for period in hours)
+
+    rollups = [load_rollup(file) for file in files if os.path.isfile(file)]
+    if not rollups:
+        return None
+    latest = max(rollups,key=lambda rollup: rollup["gpsStart"])
+    keep = [rollup for rollup in rollups if same_grid(rollup,latest["freq"])]
+    if len(keep) < len(rollups):
+        print("%d of %d PSD rollups of %s are over other frequencies than the latest... skipping them"%(
+            len(rollups)-len(keep),len(rollups),station))
+    for rollup in keep:
+        rollup["freq"] = latest["freq"]
+    return merge_rollups(keep)
+
+def percentiles(rollup,percents):
+    """@amplitude percentiles per frequency, (len(percents), n_freq)
+
+    As np.percentile, each interpolates between the two segments ranked
+    either side of it, each taken at the geometric centre of its bin, so
+    it is within one bin of the percentile of the raw spectra.  Only the
+    amplitudes inside the bins are ranked; a frequency with none is NaN.
+
+    @param rollup
+        rollup
+    @param percents
+        percentiles, 0-100
+    """
+
+    edges = rollup["edges"]
+    centres = 10**((edges[:-1] + edges[1:])/2.0)
+    cumulative = np.cumsum(rollup["hist"],axis=1)
+    counts = cumulative[:,-1]
+    values = np.zeros((len(percents),len(rollup["freq"])))
+    for ii, percent in enumerate(percents):
+        rank = percent/100.0*np.maximum(counts-1,0)
+        lower = centres[np.argmax(cumulative > np.floor(rank)[:,np.newaxis],axis=1)]
+        upper = centres[np.argmax(cumulative > np.ceil(rank)[:,np.newaxis],axis=1)]
+        values[ii] = np.where(counts > 0,lower + (rank - np.floor(rank))*(upper - lower),np.nan)
+    return values
+
+def spectral_variance(rollup):
+    """@bin edges and per-frequency histogram in percent of the amplitudes
+    inside the bins, cut to the bins holding any segment (the
+    SpectralVariance seismon plots)
+
+    @param rollup
+        rollup
+    """
+
+    used = np.nonzero(np.any(rollup["hist"] > 0,axis=0))[0]
+    if len(used) == 0:
+        return 10**rollup["edges"][:1], np.zeros((len(rollup["freq"]),0))
+    bins = slice(used[0],used[-1]+1)
+    edges = 10**rollup["edges"][used[0]:used[-1]+2]
+    counts = np.maximum(np.sum(rollup["hist"],axis=1),1)
+    return edges, 100.0*rollup["hist"][:,bins]/counts[:,np.newaxis]
+
+def fraction_below(rollup,spectrum):
+    """@fraction of the rolled-up amplitudes below a spectrum, per frequency
+
+    Amplitudes in the same bin as the spectrum count half, those below or
+    above the bins count as below or above it; NaN is left out.  This is
+    the rank html_bgcolor gives a value among the raw spectra, to within
+    one bin.
+
+    @param rollup
+        rollup
+    @param spectrum
+        amplitude spectrum over the rollup frequencies
+    """
+
+    edges = rollup["edges"]
+    hist = rollup["hist"]
+    numBins = len(edges)-1
+    spectrum = np.asarray(spectrum,dtype=np.float64)
+    with np.errstate(divide="ignore",invalid="ignore"):
+        bins = np.searchsorted(edges,np.log10(np.where(spectrum > 0,spectrum,0.0)),side="right") - 1
+    bins = np.clip(bins,-1,numBins)
+    cumulative = np.concatenate((np.zeros((len(hist),1),dtype=np.int64),np.cumsum(hist,axis=1)),axis=1)
+    rows = np.arange(len(hist))
+    below = np.where(bins < 0,0.5*rollup["underflow"],rollup["underflow"] + cumulative[rows,np.maximum(bins,0)])
+    inBin = hist[rows,np.clip(bins,0,numBins-1)]
+    below = below + np.where((bins >= 0) & (bins < numBins),0.5*inBin,0.0)
+    below = below + np.where(bins >= numBins,0.5*rollup["overflow"],0.0)
+    total = rollup["count"] - rollup["nan"]
+    return below/np.maximum(total,1)
+
+def mean_std(rollup):
+    """@mean and standard deviation of the amplitude per frequency
+    (NaN amplitudes left out)
+
+    @param rollup
+        rollup
+    """
+
+    count = np.maximum(rollup["count"] - rollup["nan"],1)
+    mean = rollup["sum"]/count
+    std = np.sqrt(np.maximum(rollup["sum2"]/count - mean**2,0.0))
+    return mean, std
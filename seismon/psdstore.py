@@ -0,0 +1,448 @@
+#!/usr/bin/python
+
+"""Per-segment PSD storage.
+
+Every PSD seismon computes belongs to a channel, an FFT duration and a
+[gpsStart, gpsEnd] segment.  A store holds the PSDs of one channel and
+FFT duration behind the same few calls whatever the backend:
+
+    write(gpsStart, gpsEnd, freq, spectrum)
+    segments(gpsStart=None, gpsEnd=None) -> ttStart, ttEnd
+    read(gpsStart, gpsEnd) -> freq, spectrum (None if missing)
+    read_segments(gpsStart=None, gpsEnd=None, count=None)
+        -> ttStart, ttEnd, freq, spectra (n_segments x n_freq)
+
+TextPSDStore keeps the original layout, one "%e %e" text file per
+segment in Text_Files/PSD/<station>/<fftDuration>/<start>-<end>.txt,
+completed days of which seismon_compact may have packed into archives
+(see seismon.textarchive).
+HDF5PSDStore keeps one file per channel and FFT duration,
+Text_Files/PSD/<station>/<fftDuration>.h5, with a resizable, chunked,
+compressed (n_segments, n_freq) dataset and gpsStart/gpsEnd index
+datasets; writers append under an exclusive file lock and readers take
+a shared one.  psd_store picks the backend from params["psdStorage"].
+
+Segments written on another frequency grid (after a change of sample
+rate or FFT settings) are kept: the HDF5 store holds each further grid
+in its own group, grids/<n>.  read_segments returns the segments on the
+grid of the latest one it selects and skips (with a warning) the rest.
+
+Per-segment spectrograms are written whole, either as the original text
+table or as a binary .npy array with a .json header holding the times
+and frequencies (see write_spectrogram).
+"""
+
+import os, glob, fcntl, contextlib, json
+
+import numpy as np
+
+import seismon.utils, seismon.backfill, seismon.textarchive
+
+try:
+    import h5py
+except:
+    print("h5py import fails... no HDF5 PSD storage.")
+
+STORAGE_TYPES = ["text", "hdf5"]
+SPECTROGRAM_FORMATS = ["text", "binary"]
+
+# segments per HDF5 chunk
+CHUNK_SEGMENTS = 64
+
+def psd_directory(dirPath,station):
+    """@directory holding the PSDs of a channel
+
+    @param dirPath
+        seismon output directory
+    @param station
+        channel station_underscore
+    """
+
+    return dirPath + "/Text_Files/PSD/" + station
+
+def psd_store(params,channel,storage=None):
+    """@PSD store of a channel at params["fftDuration"]
+
+    @param params
+        seismon params dictionary
+    @param channel
+        seismon channel structure
+    @param storage
+        "text" or "hdf5" (default params["psdStorage"], else "text")
+    """
+
+    if storage is None:
+        storage = params.get("psdStorage","text")
+    if storage == "text":
+        return TextPSDStore(params["dirPath"],channel.station_underscore,params["fftDuration"])
+    elif storage == "hdf5":
+        return HDF5PSDStore(params["dirPath"],channel.station_underscore,params["fftDuration"])
+    raise ValueError("PSD storage %s not supported (use one of %s)"%(storage,", ".join(STORAGE_TYPES)))
+
+def _same_grid(freq,other):
+    """@whether two frequency vectors are the same grid
+    """
+
+    return freq.shape == other.shape and np.allclose(freq,other,rtol=1e-5)
+
+def _warn_skipped(numSkipped,numSegments,where):
+    """@warn about segments read_segments skips for being on another
+    frequency grid than the latest
+    """
+
+    if numSkipped > 0:
+        print("%d of %d PSD segments in %s are on another frequency grid than the latest... skipping them"%(
+            numSkipped,numSegments,where))
+
+def _select(ttStart,ttEnd,gpsStart,gpsEnd):
+    """@indexes of the segments inside [gpsStart, gpsEnd], ordered by time
+    """
+
+    keep = np.ones(len(ttStart), dtype=bool)
+    if gpsStart is not None:
+        keep &= ttStart >= gpsStart
+    if gpsEnd is not None:
+        keep &= ttEnd <= gpsEnd
+    indexes = np.nonzero(keep)[0]
+    return indexes[np.lexsort((ttEnd[indexes],ttStart[indexes]))]
+
+class TextPSDStore(object):
+    """@PSDs as one text file per segment (the original layout).
+    """
+
+    def __init__(self,dirPath,station,fftDuration):
+        self.directory = os.path.join(psd_directory(dirPath,station),str(fftDuration))
+
+    def filename(self,gpsStart,gpsEnd):
+        return os.path.join(self.directory,"%d-%d.txt"%(gpsStart,gpsEnd))
+
+    def write(self,gpsStart,gpsEnd,freq,spectrum):
+        seismon.utils.mkdir(self.directory)
+        with seismon.backfill.atomic_write(self.filename(gpsStart,gpsEnd)) as f:
+            for i in range(len(freq)):
+                f.write("%e %e\n"%(freq[i],spectrum[i]))
+
+    def write_segments(self,ttStart,ttEnd,freq,spectra):
+        for start, end, spectrum in zip(ttStart,ttEnd,spectra):
+            self.write(start,end,freq,spectrum)
+
+    def _index(self):
+        ttStart = []
+        ttEnd = []
+        for file in seismon.textarchive.list_files(self.directory):
+            txtFileSplit = os.path.basename(file).replace(".txt","").split("-")
+            ttStart.append(int(txtFileSplit[0]))
+            ttEnd.append(int(txtFileSplit[1]))
+        return np.array(ttStart,dtype=np.int64), np.array(ttEnd,dtype=np.int64)
+
+    def segments(self,gpsStart=None,gpsEnd=None):
+        ttStart, ttEnd = self._index()
+        indexes = _select(ttStart,ttEnd,gpsStart,gpsEnd)
+        return ttStart[indexes], ttEnd[indexes]
+
+    def read(self,gpsStart,gpsEnd):
+        file = self.filename(gpsStart,gpsEnd)
+        if not seismon.textarchive.isfile(file):
+            return None
+        data_out = seismon.textarchive.loadtxt(file,ndmin=2)
+        return data_out[:,0], data_out[:,1]
+
+    def read_segments(self,gpsStart=None,gpsEnd=None,count=None):
+        ttStart, ttEnd = self.segments(gpsStart,gpsEnd)
+        ttStart, ttEnd = ttStart[:count], ttEnd[:count]
+
+        freqs = []
+        spectra = []
+        for start, end in zip(ttStart,ttEnd):
+            data_out = seismon.textarchive.loadtxt(self.filename(start,end),ndmin=2)
+            freqs.append(data_out[:,0])
+            spectra.append(data_out[:,1])
+        if not spectra:
+            return ttStart, ttEnd, np.zeros(0), np.zeros((0,0))
+
+        keep = np.array([ii for ii in range(len(freqs)) if _same_grid(freqs[ii],freqs[-1])],dtype=np.int64)
+        _warn_skipped(len(freqs)-len(keep),len(freqs),self.directory)
+        spectra = np.vstack([spectra[ii] for ii in keep])
+        return ttStart[keep], ttEnd[keep], freqs[-1], spectra
+
+class HDF5PSDStore(object):
+    """@PSDs as rows of one chunked, compressed HDF5 dataset.
+    """
+
+    def __init__(self,dirPath,station,fftDuration):
+        self.filename = os.path.join(psd_directory(dirPath,station),"%s.h5"%str(fftDuration))
+        self.lockFile = self.filename + ".lock"
+
+    @contextlib.contextmanager
+    def _open(self,mode):
+        """@the HDF5 file, under a shared ("r") or exclusive ("a") lock
+        """
+
+        seismon.utils.mkdir(os.path.dirname(self.filename))
+        with open(self.lockFile,"a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH if mode == "r" else fcntl.LOCK_EX)
+            try:
+                with h5py.File(self.filename,mode) as f:
+                    yield f
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def write(self,gpsStart,gpsEnd,freq,spectrum):
+        self.write_segments([gpsStart],[gpsEnd],freq,np.atleast_2d(spectrum))
+
+    def _grids(self,f):
+        """@groups holding the segments of each frequency grid, oldest
+        first (the first grid is kept at the top level of the file)
+        """
+
+        grids = []
+        if "psd" in f:
+            grids.append(f)
+        if "grids" in f:
+            grids.extend(f["grids"][name] for name in sorted(f["grids"],key=int))
+        return grids
+
+    def write_segments(self,ttStart,ttEnd,freq,spectra):
+        """@append segments (replacing any with the same start and end on
+        the same frequency grid)
+        """
+
+        ttStart = np.asarray(ttStart,dtype=np.int64)
+        ttEnd = np.asarray(ttEnd,dtype=np.int64)
+        freq = np.asarray(freq,dtype=np.float64)
+        spectra = np.asarray(spectra,dtype=np.float64).reshape(len(ttStart),len(freq))
+
+        with self._open("a") as f:
+            grids = [grid for grid in self._grids(f) if _same_grid(grid["freq"][:],freq)]
+            # a segment lives on one grid: rows written on the others are
+            # dropped from the index (gpsStart = gpsEnd = -1)
+            segments = set(zip(ttStart.tolist(),ttEnd.tolist()))
+            for grid in self._grids(f):
+                if grids and grid == grids[0]:
+                    continue
+                starts, ends = grid["gpsStart"][:], grid["gpsEnd"][:]
+                for row, segment in enumerate(zip(starts.tolist(),ends.tolist())):
+                    if segment in segments:
+                        grid["gpsStart"][row] = -1
+                        grid["gpsEnd"][row] = -1
+
+            if grids:
+                f = grids[0]
+            else:
+                if "psd" in f:
+                    print("%s: new frequency grid of %d frequencies... keeping its segments apart"%(
+                        self.filename,len(freq)))
+                    group = f.require_group("grids")
+                    f = group.create_group(str(len(group)))
+                f.create_dataset("freq", data=freq)
+                f.create_dataset("psd", shape=(0,len(freq)), maxshape=(None,len(freq)),
+                                 dtype=np.float64, chunks=(CHUNK_SEGMENTS,max(len(freq),1)),
+                                 compression="gzip", shuffle=True)
+                for key in ["gpsStart","gpsEnd"]:
+                    f.create_dataset(key, shape=(0,), maxshape=(None,), dtype=np.int64,
+                                     chunks=(1024,))
+
+            rows = dict(((start,end),row) for row, (start,end) in
+                        enumerate(zip(f["gpsStart"][:].tolist(),f["gpsEnd"][:].tolist())))
+            numRows = f["psd"].shape[0]
+
+            appended = []
+            for ii, (start, end) in enumerate(zip(ttStart.tolist(),ttEnd.tolist())):
+                if (start,end) in rows and rows[(start,end)] < numRows:
+                    f["psd"][rows[(start,end)]] = spectra[ii]
+                elif (start,end) in rows:
+                    appended[rows[(start,end)] - numRows] = ii
+                else:
+                    rows[(start,end)] = numRows + len(appended)
+                    appended.append(ii)
+
+            if appended:
+                for key, values in [("psd",spectra),("gpsStart",ttStart),("gpsEnd",ttEnd)]:
+                    f[key].resize(numRows + len(appended), axis=0)
+                    f[key][numRows:] = values[appended]
+
+    def _index(self,f):
+        """@gpsStart, gpsEnd, grid and row of every segment
+        """
+
+        ttStart, ttEnd, grids, rows = [], [], [], []
+        for ii, grid in enumerate(self._grids(f)):
+            ttStart.append(grid["gpsStart"][:])
+            ttEnd.append(grid["gpsEnd"][:])
+            grids.append(np.full(len(ttStart[-1]),ii,dtype=np.int64))
+            rows.append(np.arange(len(ttStart[-1]),dtype=np.int64))
+        if not ttStart:
+            return tuple(np.zeros(0,dtype=np.int64) for ii in range(4))
+        ttStart, ttEnd, grids, rows = [np.concatenate(x) for x in [ttStart,ttEnd,grids,rows]]
+        keep = ttEnd >= 0
+        return ttStart[keep], ttEnd[keep], grids[keep], rows[keep]
+
+    def segments(self,gpsStart=None,gpsEnd=None):
+        if not os.path.isfile(self.filename):
+            return np.zeros(0,dtype=np.int64), np.zeros(0,dtype=np.int64)
+        with self._open("r") as f:
+            ttStart, ttEnd, grids, rows = self._index(f)
+        indexes = _select(ttStart,ttEnd,gpsStart,gpsEnd)
+        return ttStart[indexes], ttEnd[indexes]
+
+    def read(self,gpsStart,gpsEnd):
+        if not os.path.isfile(self.filename):
+            return None
+        with self._open("r") as f:
+            ttStart, ttEnd, grids, rows = self._index(f)
+            indexes = np.nonzero((ttStart == gpsStart) & (ttEnd == gpsEnd))[0]
+            if len(indexes) == 0:
+                return None
+            grid = self._grids(f)[grids[indexes[0]]]
+            return grid["freq"][:], grid["psd"][rows[indexes[0]]]
+
+    def read_segments(self,gpsStart=None,gpsEnd=None,count=None):
+        if not os.path.isfile(self.filename):
+            return np.zeros(0,dtype=np.int64), np.zeros(0,dtype=np.int64), np.zeros(0), np.zeros((0,0))
+        with self._open("r") as f:
+            ttStart, ttEnd, grids, rows = self._index(f)
+            indexes = _select(ttStart,ttEnd,gpsStart,gpsEnd)[:count]
+            if len(indexes) == 0:
+                return ttStart[indexes], ttEnd[indexes], np.zeros(0), np.zeros((0,0))
+            keep = grids[indexes] == grids[indexes[-1]]
+            _warn_skipped(np.sum(~keep),len(indexes),self.filename)
+            indexes = indexes[keep]
+            grid = self._grids(f)[grids[indexes[-1]]]
+            freq = grid["freq"][:]
+            # one contiguous read (segments are mostly appended in
+            # time order), then pick the rows in memory
+            low, high = rows[indexes].min(), rows[indexes].max() + 1
+            spectra = grid["psd"][low:high][rows[indexes] - low]
+        return ttStart[indexes], ttEnd[indexes], freq, spectra
+
+def text_stores(dirPath):
+    """@(station, fftDuration) of every text PSD store below an output directory
+
+    @param dirPath
+        seismon output directory
+    """
+
+    stores = []
+    for directory in sorted(glob.glob(os.path.join(dirPath,"Text_Files","PSD","*","*"))):
+        if os.path.isdir(directory):
+            stores.append((os.path.basename(os.path.dirname(directory)),os.path.basename(directory)))
+    return stores
+
+def migrate_store(source,destination,batch=1000):
+    """@copy every segment of one PSD store into another
+
+    Returns the number of segments copied.
+
+    @param source
+        store to read
+    @param destination
+        store to write
+    @param batch
+        segments per write
+    """
+
+    ttStart, ttEnd = source.segments()
+    for ii in range(0,len(ttStart),batch):
+        # runs of segments on the same frequency grid
+        runs = []
+        for start, end in zip(ttStart[ii:ii+batch],ttEnd[ii:ii+batch]):
+            freq, spectrum = source.read(start,end)
+            if not runs or not _same_grid(freq,runs[-1][2]):
+                runs.append(([],[],freq,[]))
+            runs[-1][0].append(start)
+            runs[-1][1].append(end)
+            runs[-1][3].append(spectrum)
+        for starts, ends, freq, spectra in runs:
+            destination.write_segments(starts,ends,freq,np.vstack(spectra))
+    return len(ttStart)
+
+def write_spectrogram_text(file,times,freq,values):
+    """@write a spectrogram as the original text table
+
+    The first row is -1 followed by the times, then one row per
+    frequency with the frequency followed by its values over time.
+
+    @param file
+        text file
+    @param times
+        segment times
+    @param freq
+        frequencies
+    @param values
+        (n_times, n_freq) spectrogram values
+    """
+
+    values = np.asarray(values)
+    table = np.column_stack([freq,values.T])
+    with seismon.backfill.atomic_write(file) as f:
+        f.write("-1" + "".join([" %.10f "%tt for tt in times]) + "\n")
+        np.savetxt(f, table, fmt=["%.10f"] + [" %e "]*len(times), delimiter="")
+
+def write_spectrogram_binary(file,times,freq,values):
+    """@write a spectrogram as a .npy array plus a .json header
+
+    The header (times and frequencies) is written last, so a spectrogram
+    is complete once its header exists.
+
+    @param file
+        .npy file (the header goes next to it as .json)
+    @param times
+        segment times
+    @param freq
+        frequencies
+    @param values
+        (n_times, n_freq) spectrogram values
+    """
+
+    values = np.ascontiguousarray(values, dtype=np.float64)
+    with seismon.backfill.atomic_write(file,"wb") as f:
+        np.save(f, values)
+    header = {"times": np.asarray(times,dtype=np.float64).tolist(),
+              "frequencies": np.asarray(freq,dtype=np.float64).tolist()}
+    with seismon.backfill.atomic_write(os.path.splitext(file)[0] + ".json") as f:
+        json.dump(header, f)
+
+def write_spectrogram(directory,gpsStart,gpsEnd,times,freq,values,spectrogramFormat="text"):
+    """@write the spectrogram of a segment, returning the file name
+
+    @param directory
+        spectrogram directory
+    @param gpsStart
+        start gps
+    @param gpsEnd
+        end gps
+    @param times
+        segment times
+    @param freq
+        frequencies
+    @param values
+        (n_times, n_freq) spectrogram values
+    @param spectrogramFormat
+        "text" (<start>-<end>.txt) or "binary" (<start>-<end>.npy + .json)
+    """
+
+    if spectrogramFormat == "text":
+        file = os.path.join(directory,"%d-%d.txt"%(gpsStart,gpsEnd))
+        write_spectrogram_text(file,times,freq,values)
+    elif spectrogramFormat == "binary":
+        file = os.path.join(directory,"%d-%d.npy"%(gpsStart,gpsEnd))
+        write_spectrogram_binary(file,times,freq,values)
+    else:
+        raise ValueError("Spectrogram format %s not supported (use one of %s)"%(spectrogramFormat,", ".join(SPECTROGRAM_FORMATS)))
+    return file
+
+def read_spectrogram(file):
+    """@times, frequencies and (n_times, n_freq) values of a spectrogram file
+
+    @param file
+        .txt or .npy spectrogram file
+    """
+
+    if file.endswith(".npy"):
+        with open(os.path.splitext(file)[0] + ".json") as f:
+            header = json.load(f)
+        values = np.load(file, mmap_mode="r")
+        return np.array(header["times"]), np.array(header["frequencies"]), values
+
+    table = np.loadtxt(file, ndmin=2)
+    return table[0,1:], table[1:,0], table[1:,1:].T
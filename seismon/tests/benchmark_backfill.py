@@ -0,0 +1,94 @@
+# backfill a synthetic local PDL archive (one EQXML product per event
+# folder, read + travel times + json write per product) serially and
+# through the process pool, then time an interrupted run being resumed
+#
+#   python benchmark_backfill.py [--events 200] [--jobs 4]
+
+import os
+import json
+import shutil
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from seismon import eqmon, backfill
+
+parser = ArgumentParser()
+parser.add_argument('--events', default=200, type=int,
+                    help='number of event folders')
+parser.add_argument('--jobs', default=4, type=int,
+                    help='worker processes for the pooled run')
+args = parser.parse_args()
+
+EQXML = """<?xml version="1.0" encoding="UTF-8"?>
+<EQMessage xmlns="http://www.usgs.gov/ansseqmsg"><Source>us</Source><Sent>2019-07-06T04:%02d:00.000Z</Sent><Event><DataSource>us</DataSource><EventID>%08d</EventID><Version>1</Version><Type>Earthquake</Type><Origin><Time>2019-07-06T03:19:53.040Z</Time><Latitude>%.3f</Latitude><Longitude>%.3f</Longitude><Depth>%.1f</Depth><Status>Reviewed</Status><Magnitude><TypeKey>Mww</TypeKey><Value>%.1f</Value></Magnitude></Origin></Event></EQMessage>
+"""
+
+
+class NumpyEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        return json.JSONEncoder.default(self, obj)
+
+
+def event_folder(location, eventName, outputDir):
+    dataFolder = os.path.join(location, eventName, eventName[0:2])
+    numEventsAdded = 0
+    for timeFolder in sorted(os.listdir(dataFolder)):
+        attributeDic = eqmon.read_eqxml(os.path.join(dataFolder, timeFolder, "eqxml.xml"), eventName)
+        filename = os.path.join(outputDir, "%s-%.0f.json" % (eventName, attributeDic["GPS"]))
+        with backfill.atomic_write(filename) as json_file:
+            json.dump(attributeDic, json_file, cls=NumpyEncoder)
+        numEventsAdded = numEventsAdded + 1
+    return numEventsAdded
+
+
+rng = np.random.RandomState(0)
+tmpdir = tempfile.mkdtemp()
+try:
+    location = os.path.join(tmpdir, "pdl")
+    for ii in range(args.events):
+        eventName = "us%08d" % ii
+        timeFolder = os.path.join(location, eventName, eventName[0:2], "1562383193040")
+        os.makedirs(timeFolder)
+        with open(os.path.join(timeFolder, "eqxml.xml"), 'w') as f:
+            f.write(EQXML % (ii % 60, ii, rng.uniform(-60, 60), rng.uniform(-180, 180),
+                             rng.uniform(5, 300), rng.uniform(4, 7)))
+
+    def run(jobs, stateFile=None, callback=None):
+        outputDir = tempfile.mkdtemp(dir=tmpdir)
+        units = [("private:%s" % eventName, (location, eventName, outputDir))
+                 for eventName in sorted(os.listdir(location))]
+        t0 = time.perf_counter()
+        results = backfill.run_units(units, event_folder, jobs=jobs,
+                                     stateFile=stateFile, callback=callback)
+        return time.perf_counter() - t0, sum(results.values())
+
+    serial, numSerial = run(1)
+    pooled, numPooled = run(args.jobs)
+    assert numSerial == numPooled == args.events
+
+    # stop half way, then resume from the state file
+    stateFile = os.path.join(tmpdir, "state.txt")
+    finished = []
+
+    def interrupt(key, result):
+        finished.append(key)
+        if len(finished) == args.events // 2:
+            raise KeyboardInterrupt()
+    try:
+        run(args.jobs, stateFile=stateFile, callback=interrupt)
+    except KeyboardInterrupt:
+        pass
+    resumed, numResumed = run(args.jobs, stateFile=stateFile)
+
+    print("%d event folders, %d CPUs" % (args.events, os.cpu_count()))
+    print("serial         %8.1f ms" % (1e3*serial))
+    print("%2d jobs        %8.1f ms" % (args.jobs, 1e3*pooled))
+    print("speedup        %8.1fx" % (serial/pooled))
+    print("resumed run    %8.1f ms  (%d of %d units left)" % (1e3*resumed, numResumed, args.events))
+finally:
+    shutil.rmtree(tmpdir)
@@ -0,0 +1,51 @@
+# time calculate_traveltimes on a synthetic event with and without the
+# resident training-catalogue cache
+#
+#   python benchmark_catalogue_cache.py [--events N]
+
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+import pandas as pd
+
+from seismon import eqmon
+
+parser = ArgumentParser()
+parser.add_argument('--events', default=20, type=int,
+                    help='number of synthetic events to time')
+args = parser.parse_args()
+
+rng = np.random.RandomState(0)
+
+
+def synthetic_event():
+    return {'Latitude': rng.uniform(-60, 60),
+            'Longitude': rng.uniform(-180, 180),
+            'Depth': rng.uniform(2, 100),
+            'Magnitude': rng.uniform(5, 8),
+            'GPS': 1.2e9}
+
+
+def run(label):
+    times = []
+    for ii in range(args.events):
+        attributeDic = synthetic_event()
+        start = time.perf_counter()
+        eqmon.calculate_traveltimes(attributeDic)
+        times.append(time.perf_counter() - start)
+    times = np.array(times) * 1e3
+    print('%-28s median %8.2f ms   mean %8.2f ms' % (label, np.median(times),
+                                                    np.mean(times)))
+
+
+load_catalogue = eqmon.load_catalogue
+
+# before: parse the csv on every makePredictionsV3 call
+eqmon.load_catalogue = lambda trainFile, sidecar=False: pd.read_csv(trainFile)
+run('calculate_traveltimes (csv)')
+
+# after: parse once, then reuse the resident arrays
+eqmon.load_catalogue = load_catalogue
+eqmon.clear_catalogue_cache()
+run('calculate_traveltimes (cache)')
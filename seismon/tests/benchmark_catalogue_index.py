@@ -0,0 +1,60 @@
+# per-query latency of the catalogue neighbour search: brute-force
+# Mahalanobis cdist versus the whitened cKDTree index
+#
+#   python benchmark_catalogue_index.py [--sizes 10000,100000,1000000]
+
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from seismon import eqmon
+
+parser = ArgumentParser()
+parser.add_argument('--sizes', default='10000,100000,1000000',
+                    help='comma separated synthetic catalogue sizes')
+parser.add_argument('--queries', default=100, type=int,
+                    help='number of queries per catalogue size')
+parser.add_argument('--thresh', default=0.1, type=float,
+                    help='Mahalanobis distance threshold')
+args = parser.parse_args()
+
+rng = np.random.RandomState(0)
+
+
+def brute_force(features, lat, lon, thresh):
+    P = cdist(features, [[lat, lon]], 'mahalanobis').ravel()
+    Val = np.sort(P, axis=0)
+    ID = np.argsort(P, axis=0)
+    Val_idx = np.where(Val <= thresh)[0]
+    return ID[Val_idx], Val[Val_idx]
+
+
+print('%10s %12s %14s %14s %10s' % ('rows', 'build [s]', 'cdist [ms]',
+                                    'kdtree [ms]', 'neighbours'))
+for size in [int(x) for x in args.sizes.split(',')]:
+    features = np.column_stack((rng.uniform(-60, 60, size),
+                                rng.uniform(-180, 180, size)))
+    queries = features[rng.randint(size, size=args.queries)]
+
+    start = time.perf_counter()
+    index = eqmon.build_catalogue_index({'latitude': features[:, 0],
+                                         'longitude': features[:, 1]})
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for lat, lon in queries:
+        brute_force(features, lat, lon, args.thresh)
+    brute = (time.perf_counter() - start) / args.queries
+
+    numNeighbours = 0
+    start = time.perf_counter()
+    for lat, lon in queries:
+        rows, dist = eqmon.catalogue_neighbours(index, lat, lon, args.thresh)
+        numNeighbours += len(rows)
+    tree = (time.perf_counter() - start) / args.queries
+
+    print('%10d %12.3f %14.3f %14.3f %10.0f' % (size, build, brute*1e3,
+                                               tree*1e3,
+                                               numNeighbours/args.queries))
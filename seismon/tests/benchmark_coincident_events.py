@@ -0,0 +1,50 @@
+# coincident event search as run by run_earthquakes_analysis: the
+# pairwise double loop versus eqmon.find_coincident_events
+#
+#   python benchmark_coincident_events.py [--events 10000 100000] [--maxReference 10000]
+
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from seismon import eqmon
+
+parser = ArgumentParser()
+parser.add_argument('--events', default=[10000, 100000], type=int, nargs='+',
+                    help='catalogue sizes')
+parser.add_argument('--maxReference', default=10000, type=int,
+                    help='largest catalogue to run the pairwise loop on')
+args = parser.parse_args()
+
+minDiff = 10*60
+
+
+def coincident_reference(gps):
+    coincident = []
+    for i in range(len(gps)):
+        for j in range(len(gps)):
+            if j <= i:
+                continue
+            gpsDiff = gps[i] - gps[j]
+            if np.absolute(gpsDiff) < minDiff:
+                coincident.append(j)
+    return sorted(set(coincident))
+
+
+rng = np.random.RandomState(0)
+for num in args.events:
+    # about one event per hour, in catalogue (not time) order
+    gps = 1e9 + rng.uniform(0, num*3600.0, num)
+
+    t0 = time.perf_counter()
+    coincident = eqmon.find_coincident_events(gps, minDiff)
+    fast = time.perf_counter() - t0
+    print("%7d events: sorted %9.1f ms  (%d coincident)"%(num, 1e3*fast, len(coincident)))
+
+    if num <= args.maxReference:
+        t0 = time.perf_counter()
+        reference = coincident_reference(list(gps))
+        slow = time.perf_counter() - t0
+        assert reference == list(coincident)
+        print("%7d events: pairwise %7.1f ms  speedup %.0fx"%(num, 1e3*slow, slow/fast))
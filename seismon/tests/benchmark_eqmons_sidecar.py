@@ -0,0 +1,71 @@
+# write and read back earthquakes.xml for a synthetic catalogue through
+# the xml alone and through the binary sidecar
+#
+#   python benchmark_eqmons_sidecar.py [--events 5000] [--sites 4]
+
+import os
+import shutil
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from seismon import eqmon, utils
+
+parser = ArgumentParser()
+parser.add_argument('--events', default=5000, type=int,
+                    help='number of earthquakes')
+parser.add_argument('--sites', default=4, type=int,
+                    help='traveltime sites per earthquake')
+args = parser.parse_args()
+
+CATEGORIES = ["Latitudes", "Longitudes", "Distances", "Degrees", "Ptimes", "Stimes",
+              "Rtwotimes", "RthreePointFivetimes", "Rfivetimes", "Rfamp", "Lockloss",
+              "Rfamp_sigma", "Lockloss_sigma", "Pamp", "Samp"]
+
+rng = np.random.RandomState(0)
+attributeDics = []
+for ii in range(args.events):
+    attributeDic = {"eventName": "us%08d" % ii, "eventID": "%08d" % ii,
+                    "GPS": 1200000000.0 + 600*ii, "SentGPS": 1200000030.0 + 600*ii,
+                    "Latitude": rng.uniform(-60, 60), "Longitude": rng.uniform(-180, 180),
+                    "Depth": rng.uniform(5, 300), "Magnitude": rng.uniform(4, 7),
+                    "Region": "N/A", "DataSource": "us", "Review": "Manual"}
+    attributeDic["traveltimes"] = {}
+    for jj in range(args.sites):
+        attributeDic["traveltimes"]["site%d" % jj] = dict(
+            (category, list(1.2e9 + 1e4*rng.rand(18))) for category in CATEGORIES)
+    attributeDics.append(attributeDic)
+
+tmpdir = tempfile.mkdtemp()
+try:
+    file = os.path.join(tmpdir, "earthquakes.xml")
+    sidecarFile = utils.eqmons_sidecar(file)
+
+    t0 = time.perf_counter()
+    eqmon.write_info(file, attributeDics)
+    write = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    utils.write_eqmons_sidecar(file, attributeDics)
+    writeSidecar = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    sidecar = utils.read_eqmons(file)
+    readSidecar = time.perf_counter() - t0
+    sidecarSize = os.path.getsize(sidecarFile)
+
+    os.remove(sidecarFile)
+    t0 = time.perf_counter()
+    xml = utils.read_eqmons(file)
+    readXML = time.perf_counter() - t0
+    assert sidecar == xml
+
+    print("%d events x %d sites" % (args.events, args.sites))
+    print("file size      xml %8.1f MB   sidecar %8.1f MB" % (os.path.getsize(file)/1e6, sidecarSize/1e6))
+    print("write          xml %8.1f ms   sidecar %8.1f ms" % (1e3*(write - writeSidecar), 1e3*writeSidecar))
+    print("read           xml %8.1f ms   sidecar %8.1f ms" % (1e3*readXML, 1e3*readSidecar))
+    print("read speedup   %8.1fx" % (readXML/readSidecar))
+finally:
+    shutil.rmtree(tmpdir)
@@ -0,0 +1,83 @@
+# latency of retrieve_earthquakes for a one-day window over a large
+# event file directory: globbing every file name versus resolving the
+# window through the sqlite event manifest, both on its own and as the
+# first query after a new event file was written
+#
+#   python benchmark_event_manifest.py [--events 500000] [--repeats 5]
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from seismon import eqmon
+
+parser = ArgumentParser()
+parser.add_argument('--events', default=500000, type=int,
+                    help='number of synthetic event files')
+parser.add_argument('--repeats', default=5, type=int,
+                    help='timed retrievals per method')
+args = parser.parse_args()
+
+TRAVELTIMES = {"LHO": {"Ptimes": [1.0], "Stimes": [2.0], "Rtwotimes": [3.0],
+                       "RthreePointFivetimes": [4.0], "Rfivetimes": [5.0]}}
+
+rng = np.random.RandomState(0)
+gpsStart = 1000000000
+gpss = np.sort(rng.uniform(gpsStart, gpsStart + 20*365*86400, args.events))
+mags = np.round(rng.exponential(0.7, args.events) + 2.5, 1)
+
+tmpdir = tempfile.mkdtemp()
+try:
+    directory = os.path.join(tmpdir, 'private')
+    os.makedirs(directory)
+    t0 = time.perf_counter()
+    for ii, (gps, mag) in enumerate(zip(gpss, mags)):
+        attributeDic = {"eventName": "us%08d" % ii, "GPS": gps,
+                        "Magnitude": mag, "traveltimes": TRAVELTIMES}
+        filename = os.path.join(directory, "us%08d-%.0f.json" % (ii, gps))
+        with open(filename, 'w') as json_file:
+            json.dump(attributeDic, json_file)
+    print("wrote %d files in %.1f s" % (args.events, time.perf_counter() - t0))
+
+    t0 = time.perf_counter()
+    eqmon.rebuild_manifest(directory)
+    print("rebuilt manifest in %.1f s" % (time.perf_counter() - t0))
+
+    window = (gpss[args.events//2], gpss[args.events//2] + 86400)
+    params = {"eventfilesLocation": tmpdir, "eventfilesType": "private",
+              "earthquakesMinMag": 5.0}
+    manifestFile = os.path.join(directory, eqmon.MANIFEST_FILE)
+
+    timings = {}
+    for method in ['glob', 'manifest', 'after write']:
+        if method == 'glob':
+            os.rename(manifestFile, manifestFile + '.off')
+        times = []
+        for ii in range(args.repeats):
+            if method == 'after write':
+                # a new event lands between queries
+                gps = gpsStart - 86400 - ii
+                attributeDic = {"eventName": "new%04d" % ii, "GPS": gps,
+                                "Magnitude": 3.0, "traveltimes": TRAVELTIMES}
+                filename = os.path.join(directory, "new%04d-%.0f.json" % (ii, gps))
+                with open(filename, 'w') as json_file:
+                    json.dump(attributeDic, json_file)
+                eqmon.manifest_add(filename, attributeDic)
+            t0 = time.perf_counter()
+            attributeDics = eqmon.retrieve_earthquakes(params, *window)
+            times.append(time.perf_counter() - t0)
+        if method == 'glob':
+            os.rename(manifestFile + '.off', manifestFile)
+        timings[method] = (np.median(times), len(attributeDics))
+
+    for method, (median, count) in timings.items():
+        print("%-12s %8.1f ms  (%d events)" % (method, 1e3*median, count))
+    print("speedup      %8.1fx" % (timings['glob'][0]/timings['manifest'][0]))
+    print("after write  %8.1fx" % (timings['glob'][0]/timings['after write'][0]))
+finally:
+    shutil.rmtree(tmpdir)
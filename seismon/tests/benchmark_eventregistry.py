@@ -0,0 +1,60 @@
+# replay a synthetic PDL product stream in which every event is re-issued
+# five times (only one revision changes the magnitude) through
+# read_eqxml + travel times, with and without the product registry
+#
+#   python benchmark_eventregistry.py [--events 100]
+
+import os
+import shutil
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from seismon import eqmon, eventregistry
+
+parser = ArgumentParser()
+parser.add_argument('--events', default=100, type=int,
+                    help='number of events (5 revisions each)')
+args = parser.parse_args()
+
+EQXML = """<?xml version="1.0" encoding="UTF-8"?>
+<EQMessage xmlns="http://www.usgs.gov/ansseqmsg"><Source>us</Source><Sent>2019-07-06T%02d:%02d:00.000Z</Sent><Event><DataSource>us</DataSource><EventID>%08d</EventID><Version>%d</Version><Type>Earthquake</Type><Origin><Time>2019-07-06T03:19:53.040Z</Time><Latitude>%.3f</Latitude><Longitude>%.3f</Longitude><Depth>%.1f</Depth><Status>Reviewed</Status><Magnitude><TypeKey>Mww</TypeKey><Value>%.1f</Value></Magnitude></Origin></Event></EQMessage>
+"""
+
+rng = np.random.RandomState(0)
+tmpdir = tempfile.mkdtemp()
+try:
+    stream = []
+    for ii in range(args.events):
+        lat, lon = rng.uniform(-60, 60), rng.uniform(-180, 180)
+        depth, mag = rng.uniform(5, 300), rng.uniform(4, 7)
+        for version in range(5):
+            if version == 2:
+                mag = mag + 0.1
+            file = os.path.join(tmpdir, "us%08d_%d.xml" % (ii, version))
+            with open(file, 'w') as f:
+                f.write(EQXML % (4 + version, ii % 60, ii, version, lat, lon, depth, mag))
+            stream.append(("us%08d" % ii, file))
+
+    t0 = time.perf_counter()
+    for eventName, file in stream:
+        attributeDic = eqmon.read_eqxml(file, eventName)
+    plain = time.perf_counter() - t0
+
+    registry = eventregistry.new_registry()
+    t0 = time.perf_counter()
+    for eventName, file in stream:
+        attributeDic = eqmon.read_eqxml(file, eventName, traveltimes=False)
+        if eventregistry.check_product(registry, attributeDic):
+            attributeDic = eqmon.calculate_traveltimes(attributeDic)
+    deduped = time.perf_counter() - t0
+
+    print("%d products for %d events" % (len(stream), args.events))
+    print("no registry  %8.1f ms  (%d processed)" % (1e3*plain, len(stream)))
+    print("registry     %8.1f ms  (%d processed, %d skipped)" % (
+        1e3*deduped, registry["processed"], registry["skipped"]))
+    print("speedup      %8.1fx" % (plain/deduped))
+finally:
+    shutil.rmtree(tmpdir)
@@ -0,0 +1,99 @@
+# throughput and peak RSS of loading a large USGS GeoJSON catalogue:
+# json.load + jsonread per feature (travel times switched off, so only
+# the parsing is compared) versus the columnar geojson.read_geojson
+#
+#   python benchmark_geojson.py [--features 1000000]
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+parser = ArgumentParser()
+parser.add_argument('--features', default=1000000, type=int,
+                    help='number of features in the generated catalogue')
+parser.add_argument('--mode', default=None, choices=['jsonread', 'columns'],
+                    help='(internal) run one loader and report')
+parser.add_argument('--file', default=None,
+                    help='(internal) catalogue to read')
+args = parser.parse_args()
+
+FEATURE = ('{"type":"Feature","properties":{"mag":%.1f,"place":"%d km N of Somewhere",'
+           '"time":%d,"updated":%d,"tz":null,"status":"%s","tsunami":0,"sig":300,'
+           '"net":"us","code":"%08d","ids":",us%08d,","sources":",us,","types":",origin,",'
+           '"magType":"mb","type":"earthquake"},"geometry":{"type":"Point",'
+           '"coordinates":[%.4f,%.4f,%.2f]},"id":"us%08d"}')
+
+
+def generate(filename, numFeatures):
+    rng = np.random.RandomState(0)
+    millis = np.sort(rng.randint(946684800000, 1577836800000, numFeatures))
+    mags = rng.uniform(2.5, 8.0, numFeatures)
+    lons = rng.uniform(-180, 180, numFeatures)
+    lats = rng.uniform(-80, 80, numFeatures)
+    depths = rng.uniform(0, 600, numFeatures)
+    with open(filename, 'w') as f:
+        f.write('{"type":"FeatureCollection","features":[')
+        for ii in range(numFeatures):
+            if ii > 0:
+                f.write(',')
+            f.write(FEATURE % (mags[ii], ii % 300, millis[ii], millis[ii],
+                               ["reviewed", "AUTOMATIC"][ii % 2], ii, ii,
+                               lons[ii], lats[ii], depths[ii], ii))
+        f.write(']}')
+
+
+def run(mode, filename):
+    from seismon import eqmon, geojson
+
+    start = time.perf_counter()
+    if mode == 'jsonread':
+        eqmon.calculate_traveltimes = lambda attributeDic: attributeDic
+        with open(filename) as f:
+            events = json.load(f)
+        attributeDics = [eqmon.jsonread(event) for event in events["features"]]
+        numFeatures = len(attributeDics)
+    else:
+        catalogue = geojson.read_geojson(filename)
+        numFeatures = geojson.catalogue_size(catalogue)
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print('%d %f %d' % (numFeatures, elapsed, peak))
+
+
+if args.mode is not None:
+    run(args.mode, args.file)
+    sys.exit(0)
+
+tmpdir = tempfile.mkdtemp()
+filename = os.path.join(tmpdir, 'catalogue.json')
+generate(filename, args.features)
+size = os.path.getsize(filename)
+
+# baseline RSS of an interpreter that has imported seismon
+baseline = subprocess.check_output(
+    [sys.executable, '-c', 'import resource, seismon.eqmon, seismon.geojson; '
+     'print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)'],
+    stderr=subprocess.DEVNULL)
+baseline = int(baseline.split()[-1])
+
+print('catalogue: %d features, %.1f MB' % (args.features, size/1e6))
+print('%9s %12s %14s %16s' % ('loader', 'time [s]', 'features/s',
+                              'peak RSS [MB]'))
+for mode in ['jsonread', 'columns']:
+    output = subprocess.check_output(
+        [sys.executable, __file__, '--mode', mode, '--file', filename],
+        stderr=subprocess.DEVNULL)
+    numFeatures, elapsed, peak = output.split()[-3:]
+    print('%9s %12.2f %14.0f %16.1f' % (mode, float(elapsed),
+                                         int(numFeatures)/float(elapsed),
+                                         (int(peak)-baseline)/1024.0))
+
+os.remove(filename)
+os.rmdir(tmpdir)
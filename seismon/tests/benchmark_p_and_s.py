@@ -0,0 +1,52 @@
+# per-event cost of the p.dat / s.dat arrival lookup in
+# ifotraveltimes_lookup: np.loadtxt on every event versus the resident
+# table and its interpolator
+#
+#   python benchmark_p_and_s.py [--events 200]
+
+import os
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from seismon import traveltimes
+
+parser = ArgumentParser()
+parser.add_argument('--events', default=200, type=int,
+                    help='number of random events')
+parser.add_argument('--points', default=100, type=int,
+                    help='distance points per event')
+args = parser.parse_args()
+
+scriptpath = os.path.join(os.path.dirname(traveltimes.__file__), 'input')
+rng = np.random.RandomState(0)
+eventDepths = rng.uniform(2, 100, args.events)
+
+
+def before(depth):
+    parrivals = np.loadtxt(os.path.join(scriptpath, 'p.dat'))
+    sarrivals = np.loadtxt(os.path.join(scriptpath, 's.dat'))
+    depths = np.linspace(1, 100, 100)
+    index = np.argmin(np.abs(depths-depth))
+    return parrivals[:args.points, index], sarrivals[:args.points, index]
+
+
+def after(depth):
+    table = traveltimes.load_p_and_s(scriptpath)
+    index = np.argmin(np.abs(table["depths"]-depth))
+    rows = table["degrees"][:args.points]
+    return traveltimes.p_and_s_times(table, table["depths"][index], rows)
+
+
+start = time.perf_counter()
+traveltimes.load_p_and_s(scriptpath)
+startup = time.perf_counter() - start
+
+for name, function in [('loadtxt', before), ('resident', after)]:
+    start = time.perf_counter()
+    for depth in eventDepths:
+        function(depth)
+    elapsed = (time.perf_counter() - start) / args.events
+    print('%10s %10.3f ms/event' % (name, elapsed*1e3))
+print('%10s %10.3f ms (first load)' % ('startup', startup*1e3))
@@ -0,0 +1,79 @@
+# load test for seismon_predictd: drive synthetic events through the
+# daemon and report p50 / p99 request latency, next to the cost of a
+# fresh python process doing the same prediction
+#
+#   python benchmark_predictd.py [--events 1000] [--method traveltimes]
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from seismon import predictd
+
+parser = ArgumentParser()
+parser.add_argument('--events', default=1000, type=int,
+                    help='number of synthetic events')
+parser.add_argument('--method', default='traveltimes',
+                    choices=['traveltimes', 'loc'],
+                    help='request type')
+args = parser.parse_args()
+
+bindir = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                      '..', '..', 'bin')
+tmpdir = tempfile.mkdtemp()
+socketFile = os.path.join(tmpdir, 'predictd.sock')
+
+rng = np.random.RandomState(0)
+events = [{"Magnitude": rng.uniform(5, 8), "Latitude": rng.uniform(-60, 60),
+           "Longitude": rng.uniform(-180, 180), "Depth": rng.uniform(0, 600),
+           "GPS": 1e9 + ii, "eventID": "synthetic%d" % ii}
+          for ii in range(args.events)]
+
+start = time.perf_counter()
+daemon = subprocess.Popen([sys.executable,
+                           os.path.join(bindir, 'seismon_predictd'),
+                           '-s', socketFile],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+try:
+    while True:
+        try:
+            predictd.request({"method": "ping"}, socketFile)
+            break
+        except OSError:
+            time.sleep(0.05)
+    startup = time.perf_counter() - start
+
+    latencies = []
+    for event in events:
+        message = {"method": args.method, "event": event}
+        if args.method == 'loc':
+            message["ifos"] = ["LHO", "LLO"]
+        start = time.perf_counter()
+        predictd.request(message, socketFile)
+        latencies.append(time.perf_counter() - start)
+finally:
+    daemon.terminate()
+    daemon.wait()
+    shutil.rmtree(tmpdir)
+
+# one cold process doing the same work, for comparison
+script = ("import seismon.eqmon as e\n"
+          "e.calculate_traveltimes(%r)\n" % events[0])
+start = time.perf_counter()
+subprocess.check_call([sys.executable, '-c', script],
+                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+cold = time.perf_counter() - start
+
+latencies = np.array(latencies)*1e3
+print('events                 %10d' % args.events)
+print('daemon startup         %10.1f ms' % (startup*1e3))
+print('latency p50            %10.2f ms' % np.percentile(latencies, 50))
+print('latency p99            %10.2f ms' % np.percentile(latencies, 99))
+print('latency max            %10.2f ms' % latencies.max())
+print('cold process per event %10.1f ms' % (cold*1e3))
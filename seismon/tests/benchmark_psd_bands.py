@@ -0,0 +1,115 @@
+# load the band amplitude of every PSD file of a channel with the
+# original loadChannelPSD (glob, np.loadtxt and a per-bin running mean
+# per file) and with the vectorized one, from the text and HDF5 stores
+#
+#   python benchmark_psd_bands.py [--files 50000] [--legacyFraction 0.02]
+#
+# The original per-file work is timed on the first legacyFraction of the
+# files and scaled up; it is linear in the number of files.
+
+import os
+import glob
+import shutil
+import tempfile
+import time
+from argparse import ArgumentParser
+from collections import namedtuple
+
+import numpy as np
+
+from seismon import eqmon, psdstore
+
+parser = ArgumentParser()
+parser.add_argument('--files', default=50000, type=int,
+                    help='number of PSD files')
+parser.add_argument('--legacyFraction', default=0.02, type=float,
+                    help='fraction of the files the original code is timed on')
+args = parser.parse_args()
+
+FF_AVE = [1/float(128), 1/float(64),  0.1, 1, 3, 5, 10]
+
+
+def legacy_band(thisFreq_out, thisSpectra_out):
+    freqAmps = []
+    for i in range(len(FF_AVE)-1):
+        newSpectraNow = []
+        for j in range(len(thisFreq_out)):
+            if FF_AVE[i] <= thisFreq_out[j] and thisFreq_out[j] <= FF_AVE[i+1]:
+                newSpectraNow.append(thisSpectra_out[j])
+                freqAmps.append(np.mean(newSpectraNow))
+    return freqAmps[1]
+
+
+def legacy_loadChannelPSD(psdDirectory, gpsStart, gpsEnd):
+    files = sorted(glob.glob(os.path.join(psdDirectory, "*.txt")))
+    ttStart = []
+    ttEnd = []
+    amp = []
+    for file in files:
+        txtFileSplit = file.split("/")[-1].replace(".txt", "").split("-")
+        thisTTStart = int(txtFileSplit[0])
+        thisTTEnd = int(txtFileSplit[1])
+        if (thisTTStart < gpsStart) or (thisTTEnd > gpsEnd):
+            continue
+        ttStart.append(thisTTStart)
+        ttEnd.append(thisTTEnd)
+        data_out = np.loadtxt(file)
+        amp.append(legacy_band(data_out[:, 0], data_out[:, 1]))
+    return np.array(ttStart), np.array(ttEnd), np.array(amp)
+
+
+Channel = namedtuple("Channel", ["station_underscore"])
+channel = Channel("H1_ISI-GND_STS_ITMY_Z_DQ")
+
+rng = np.random.RandomState(0)
+freq = np.arange(0, 8 + 1/64., 1/64.)
+ttStart = 1200000000 + 64*np.arange(args.files)
+ttEnd = ttStart + 64
+
+tmpdir = tempfile.mkdtemp()
+try:
+    params = {"dirPath": tmpdir, "fftDuration": 64}
+    textStore = psdstore.psd_store(params, channel, storage="text")
+    hdf5Store = psdstore.psd_store(params, channel, storage="hdf5")
+    for ii in range(0, args.files, 1000):
+        spectra = 10**rng.uniform(-9, -6, size=(len(ttStart[ii:ii+1000]), len(freq)))
+        textStore.write_segments(ttStart[ii:ii+1000], ttEnd[ii:ii+1000], freq, spectra)
+        hdf5Store.write_segments(ttStart[ii:ii+1000], ttEnd[ii:ii+1000], freq, spectra)
+
+    # original, on a window holding the first legacyFraction of the files
+    numLegacy = max(int(args.files*args.legacyFraction), 1)
+    segment = [int(ttStart[0]), int(ttEnd[numLegacy-1])]
+    t0 = time.perf_counter()
+    legacyStart, legacyEnd, legacyAmp = legacy_loadChannelPSD(textStore.directory, segment[0], segment[1])
+    legacy = (time.perf_counter() - t0)*args.files/numLegacy
+
+    # the band step alone
+    ttStartOut, ttEndOut, freqOut, spectraOut = hdf5Store.read_segments(segment[0], segment[1])
+    t0 = time.perf_counter()
+    for spectrum in spectraOut:
+        legacy_band(freqOut, spectrum)
+    legacyBands = (time.perf_counter() - t0)*args.files/numLegacy
+
+    segment = [int(ttStart[0]), int(ttEnd[-1])]
+    timings = {}
+    for storage in ["text", "hdf5"]:
+        params["psdStorage"] = storage
+        t0 = time.perf_counter()
+        data = eqmon.loadChannelPSD(params, channel, segment)
+        timings[storage] = time.perf_counter() - t0
+        if storage == "text":
+            assert np.array_equal(data["data"][:numLegacy], legacyAmp)
+
+    spectraOut = hdf5Store.read_segments()[3]
+    t0 = time.perf_counter()
+    eqmon.psd_band_amplitudes(freq, spectraOut, FF_AVE)
+    bands = time.perf_counter() - t0
+
+    print("%d PSD files x %d frequencies" % (args.files, len(freq)))
+    print("band averaging   original %9.1f ms   vectorized %9.1f ms   (%.0fx)" % (
+        1e3*legacyBands, 1e3*bands, legacyBands/bands))
+    print("loadChannelPSD   original %9.1f ms   (timed on %d files, scaled)" % (1e3*legacy, numLegacy))
+    print("                 text     %9.1f ms   (%.0fx)" % (1e3*timings["text"], legacy/timings["text"]))
+    print("                 hdf5     %9.1f ms   (%.0fx)" % (1e3*timings["hdf5"], legacy/timings["hdf5"]))
+finally:
+    shutil.rmtree(tmpdir)
@@ -0,0 +1,59 @@
+# read every PSD segment of one channel back from the text store (one
+# file per segment) and from the HDF5 store (one chunked dataset)
+#
+#   python benchmark_psdstore.py [--segments 100000] [--freqs 129]
+
+import os
+import shutil
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from seismon import psdstore
+
+parser = ArgumentParser()
+parser.add_argument('--segments', default=100000, type=int,
+                    help='number of PSD segments')
+parser.add_argument('--freqs', default=129, type=int,
+                    help='frequency bins per PSD')
+args = parser.parse_args()
+
+rng = np.random.RandomState(0)
+freq = np.linspace(0, 16, args.freqs)
+ttStart = 1200000000 + 64*np.arange(args.segments)
+ttEnd = ttStart + 64
+
+tmpdir = tempfile.mkdtemp()
+try:
+    textStore = psdstore.TextPSDStore(tmpdir, "H1_ISI-GND_STS_ITMY_Z_DQ", 64)
+    hdf5Store = psdstore.HDF5PSDStore(tmpdir, "H1_ISI-GND_STS_ITMY_Z_DQ", 64)
+    for ii in range(0, args.segments, 1000):
+        spectra = 10**rng.uniform(-9, -6, size=(len(ttStart[ii:ii+1000]), args.freqs))
+        textStore.write_segments(ttStart[ii:ii+1000], ttEnd[ii:ii+1000], freq, spectra)
+    psdstore.migrate_store(textStore, hdf5Store)
+
+    textSize = sum(os.path.getsize(textStore.filename(start, end)) for start, end in zip(ttStart, ttEnd))
+    hdf5Size = os.path.getsize(hdf5Store.filename)
+
+    timings = {}
+    for name, store in [("text", textStore), ("hdf5", hdf5Store)]:
+        t0 = time.perf_counter()
+        ttStartOut, ttEndOut, freqOut, spectraOut = store.read_segments()
+        timings[name] = time.perf_counter() - t0
+        assert spectraOut.shape == (args.segments, args.freqs)
+
+        # a one-day window, as loadChannelPSD asks for
+        t0 = time.perf_counter()
+        store.read_segments(ttStart[args.segments//2], ttStart[args.segments//2] + 86400)
+        timings[name + "day"] = time.perf_counter() - t0
+
+    print("%d segments x %d frequencies" % (args.segments, args.freqs))
+    print("size         text %9.1f MB   hdf5 %9.1f MB" % (textSize/1e6, hdf5Size/1e6))
+    print("read all     text %9.1f ms   hdf5 %9.1f ms   (%.0fx)" % (
+        1e3*timings["text"], 1e3*timings["hdf5"], timings["text"]/timings["hdf5"]))
+    print("read a day   text %9.1f ms   hdf5 %9.1f ms   (%.0fx)" % (
+        1e3*timings["textday"], 1e3*timings["hdf5day"], timings["textday"]/timings["hdf5day"]))
+finally:
+    shutil.rmtree(tmpdir)
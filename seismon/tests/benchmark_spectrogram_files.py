@@ -0,0 +1,75 @@
+# write a day-long spectrogram with the original cell-by-cell writer
+# (Quantity lookup and f.write per cell), the vectorized text writer and
+# the binary .npy writer
+#
+#   python benchmark_spectrogram_files.py [--times 86400] [--freqs 512] [--legacyFraction 0.01]
+#
+# The original writer is timed on the first legacyFraction of the times
+# and scaled up; it is linear in the number of cells.
+
+import os
+import shutil
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+import astropy.units
+
+from seismon import psdstore
+
+parser = ArgumentParser()
+parser.add_argument('--times', default=86400, type=int,
+                    help='spectrogram times')
+parser.add_argument('--freqs', default=512, type=int,
+                    help='spectrogram frequencies')
+parser.add_argument('--legacyFraction', default=0.01, type=float,
+                    help='fraction of the times the original writer is timed on')
+args = parser.parse_args()
+
+
+def legacy_text(file, times, freq, specgram):
+    f = open(file, "w")
+    f.write("-1")
+    for jj in range(len(times)):
+        f.write(" %.10f " % times[jj])
+    f.write("\n")
+    for ii in range(len(freq)):
+        f.write("%.10f" % freq[ii])
+        for jj in range(len(times)):
+            f.write(" %e " % (specgram[jj, ii].value))
+        f.write("\n")
+    f.close()
+
+
+rng = np.random.RandomState(0)
+times = 1200000000 + np.arange(args.times, dtype=np.float64)
+freq = np.linspace(0, 0.5, args.freqs)
+values = 10**rng.uniform(-9, -6, size=(args.times, args.freqs))
+
+tmpdir = tempfile.mkdtemp()
+try:
+    numLegacy = max(int(args.times*args.legacyFraction), 1)
+    # gwpy spectrograms are astropy Quantities
+    specgram = values[:numLegacy]*astropy.units.Unit("m/s")
+    t0 = time.perf_counter()
+    legacy_text(os.path.join(tmpdir, "legacy.txt"), times[:numLegacy], freq, specgram)
+    legacy = (time.perf_counter() - t0)*args.times/numLegacy
+
+    t0 = time.perf_counter()
+    textFile = psdstore.write_spectrogram(tmpdir, 0, 1, times, freq, values)
+    text = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    binaryFile = psdstore.write_spectrogram(tmpdir, 0, 1, times, freq, values,
+                                            spectrogramFormat="binary")
+    binary = time.perf_counter() - t0
+
+    binarySize = os.path.getsize(binaryFile) + os.path.getsize(binaryFile.replace(".npy", ".json"))
+
+    print("%d times x %d frequencies" % (args.times, args.freqs))
+    print("original text  %9.1f s   (timed on %d times, scaled)" % (legacy, numLegacy))
+    print("text           %9.1f s   %8.1f MB   (%.0fx)" % (text, os.path.getsize(textFile)/1e6, legacy/text))
+    print("binary         %9.1f s   %8.1f MB   (%.0fx)" % (binary, binarySize/1e6, legacy/binary))
+finally:
+    shutil.rmtree(tmpdir)
@@ -0,0 +1,79 @@
+# glob and load every Timeseries file of a few channels with
+# loadChannelTimeseries, from loose files and after seismon_compact has
+# packed them into per-day archives
+#
+#   python benchmark_textarchive.py [--files 1000000] [--channels 10]
+#
+# Each channel gets files/channels consecutive 64 s segments, i.e. 1350
+# files per channel and day.
+
+import os
+import glob
+import shutil
+import tempfile
+import time
+from argparse import ArgumentParser
+from collections import namedtuple
+
+import numpy as np
+
+from seismon import eqmon, textarchive
+
+parser = ArgumentParser()
+parser.add_argument('--files', default=1000000, type=int,
+                    help='number of Timeseries files')
+parser.add_argument('--channels', default=10, type=int,
+                    help='number of channels the files are spread over')
+args = parser.parse_args()
+
+Channel = namedtuple("Channel", ["station_underscore"])
+CHANNELS = [Channel("H1_ISI-GND_STS_%02d_Z_DQ" % ii) for ii in range(args.channels)]
+GPS_START = 1200009600 // 86400 * 86400
+FFT_DURATION = 64
+
+dirPath = tempfile.mkdtemp(prefix="benchmark_textarchive_")
+params = {"dirPath": dirPath, "fftDuration": FFT_DURATION}
+numSegments = args.files // args.channels
+segment = [GPS_START, GPS_START + FFT_DURATION*numSegments]
+
+try:
+    start = time.time()
+    rng = np.random.RandomState(0)
+    for channel in CHANNELS:
+        directory = os.path.join(dirPath, "Text_Files", "Timeseries", channel.station_underscore, str(FFT_DURATION))
+        os.makedirs(directory)
+        values = rng.uniform(size=(numSegments, 3))
+        for ii in range(numSegments):
+            gpsStart = GPS_START + FFT_DURATION*ii
+            with open(os.path.join(directory, "%d-%d.txt" % (gpsStart, gpsStart+FFT_DURATION)), "w") as f:
+                f.write("%.1f %e\n%.1f %e\n" % (gpsStart, values[ii, 0], gpsStart+values[ii, 1]*64, values[ii, 2]))
+    print("wrote %d files for %d channels in %.1f s" % (numSegments*len(CHANNELS), len(CHANNELS), time.time()-start))
+
+    def run(label):
+        start = time.time()
+        numFiles = 0
+        for channel in CHANNELS:
+            directory = os.path.join(dirPath, "Text_Files", "Timeseries", channel.station_underscore, str(FFT_DURATION))
+            numFiles += len(textarchive.list_files(directory))
+        listed = time.time() - start
+
+        start = time.time()
+        data = [eqmon.loadChannelTimeseries(params, channel, segment) for channel in CHANNELS]
+        loaded = time.time() - start
+        print("%-10s list %d files %7.2f s, glob + load %7.1f s" % (label, numFiles, listed, loaded))
+        return data
+
+    loose = run("loose")
+
+    start = time.time()
+    compacted = textarchive.compact_tree(dirPath, segment[1] // 86400 + 1, products=["Timeseries"])
+    numArchives = sum(len(textarchive.archives(directory)) for directory, numFiles in compacted)
+    print("compacted %d files into %d archives in %.1f s" % (
+        sum(numFiles for directory, numFiles in compacted), numArchives, time.time()-start))
+
+    archived = run("compacted")
+    for x, y in zip(loose, archived):
+        for key in x:
+            assert np.array_equal(x[key], y[key])
+finally:
+    shutil.rmtree(dirPath)
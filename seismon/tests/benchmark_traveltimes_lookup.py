@@ -0,0 +1,50 @@
+# per-event wall time of ifotraveltimes_lookup: one makePredictions call
+# per distance point versus a single makePredictionsGrid call
+#
+#   python benchmark_traveltimes_lookup.py [--events 20]
+
+import os
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from seismon import eqmon
+
+parser = ArgumentParser()
+parser.add_argument('--events', default=20, type=int,
+                    help='number of random events per site')
+args = parser.parse_args()
+
+seismonpath = os.path.dirname(eqmon.__file__)
+trainFile = os.path.join(seismonpath, 'input',
+                         'LHO_processed_USGS_global_EQ_catalogue.csv')
+
+rng = np.random.RandomState(0)
+events = [{"Magnitude": rng.uniform(5, 8), "Latitude": rng.uniform(-60, 60),
+           "Longitude": rng.uniform(-180, 180), "Depth": rng.uniform(0, 600),
+           "GPS": 1e9, "traveltimes": {}} for ii in range(args.events)]
+sites = [('Arbitrary', 0.0, 0.0, 18), ('LHO', 46.6475, -119.5986, 100)]
+
+# warm the catalogue and index caches
+eqmon.makePredictionsGrid(trainFile, 6.0, 0.0, 0.0, 10.0)
+
+print('%10s %8s %16s %16s' % ('site', 'points', 'per-point [ms]',
+                              'batched [ms]'))
+for ifo, ifolat, ifolon, points in sites:
+    start = time.perf_counter()
+    for attributeDic in events:
+        for ii in range(points):
+            eqmon.makePredictions(trainFile, attributeDic["Magnitude"],
+                                  attributeDic["Latitude"],
+                                  attributeDic["Longitude"], 0.0,
+                                  max(attributeDic["Depth"], 2.0), 0.0,
+                                  siteLat=ifolat, siteLon=ifolon)
+    before = (time.perf_counter() - start) / args.events
+
+    start = time.perf_counter()
+    for attributeDic in events:
+        eqmon.ifotraveltimes_lookup(attributeDic, ifo, ifolat, ifolon)
+    after = (time.perf_counter() - start) / args.events
+
+    print('%10s %8d %16.2f %16.2f' % (ifo, points, before*1e3, after*1e3))
@@ -0,0 +1,71 @@
+# startup and per-event cost of the Rayleigh velocity map lookup in
+# ifotraveltimes_velocitymap: np.loadtxt + cKDTree build on every call
+# versus the resident (and optionally pickled) tree
+#
+# seismon does not ship GR025_1_GDM52.pix, so a synthetic map in the
+# same (lat, lon, size, dv) pixel format is written to a temp directory.
+#
+#   python benchmark_velocity_map.py [--resolution 0.5] [--events 20]
+
+import os
+import shutil
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from seismon import eqmon
+
+parser = ArgumentParser()
+parser.add_argument('--resolution', default=0.5, type=float,
+                    help='pixel size of the synthetic map [deg]')
+parser.add_argument('--events', default=20, type=int,
+                    help='number of random events')
+args = parser.parse_args()
+
+tmpdir = tempfile.mkdtemp()
+lat, lon = np.meshgrid(np.arange(-90+args.resolution/2, 90, args.resolution),
+                       np.arange(args.resolution/2, 360, args.resolution),
+                       indexing='ij')
+rng = np.random.RandomState(0)
+velocity_map = np.column_stack((lat.ravel(), lon.ravel(),
+                                args.resolution*np.ones(lat.size),
+                                rng.normal(0, 3, lat.size)))
+velocityFile = os.path.join(tmpdir, 'map.pix')
+np.savetxt(velocityFile, velocity_map)
+
+distances = np.linspace(0, 8e6, 1000)
+paths = [eqmon.shoot_array(rng.uniform(0, 360), rng.uniform(-60, 60),
+                           rng.uniform(0, 360), distances/1000)
+         for ii in range(args.events)]
+
+start = time.perf_counter()
+for lons, lats, bazs in paths:
+    velocity_map = np.loadtxt(velocityFile)
+    combined_x_y_arrays = np.dstack([velocity_map[:, 0],
+                                     velocity_map[:, 1]])[0]
+    eqmon.do_kdtree(combined_x_y_arrays, np.dstack([lats, lons]))
+before = (time.perf_counter() - start) / args.events
+
+start = time.perf_counter()
+eqmon.load_velocity_map(velocityFile, treeCache=tmpdir)
+coldStart = time.perf_counter() - start
+
+eqmon._velocity_map_cache.clear()
+start = time.perf_counter()
+velocityMap = eqmon.load_velocity_map(velocityFile, treeCache=tmpdir)
+pickleStart = time.perf_counter() - start
+
+start = time.perf_counter()
+for lons, lats, bazs in paths:
+    eqmon.velocity_map_indexes(velocityMap, lats, lons)
+after = (time.perf_counter() - start) / args.events
+
+print('pixels                 %10d' % len(velocity_map))
+print('startup (parse+build)  %10.1f ms' % (coldStart*1e3))
+print('startup (pickle)       %10.1f ms' % (pickleStart*1e3))
+print('per event, reload      %10.2f ms' % (before*1e3))
+print('per event, resident    %10.2f ms' % (after*1e3))
+
+shutil.rmtree(tmpdir)
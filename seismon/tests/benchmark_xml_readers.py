@@ -0,0 +1,109 @@
+# throughput and peak RSS of reading a large multi-event QuakeML
+# catalogue: etree.parse + parse_xml over the whole tree versus the
+# streaming iterparse_quakeml reader
+#
+#   python benchmark_xml_readers.py [--events 100000]
+
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+parser = ArgumentParser()
+parser.add_argument('--events', default=100000, type=int,
+                    help='number of events in the generated catalogue')
+parser.add_argument('--mode', default=None, choices=['tree', 'stream'],
+                    help='(internal) run one reader and report')
+parser.add_argument('--file', default=None,
+                    help='(internal) catalogue to read')
+args = parser.parse_args()
+
+EVENT = """<event publicID="quakeml:us.anss.org/event/us%08d">
+<type>earthquake</type>
+<description><type>region name</type><text>Somewhere</text></description>
+<origin publicID="quakeml:us.anss.org/origin/us%08d">
+<time><value>%s</value></time>
+<longitude><value>%.4f</value><uncertainty>1.2</uncertainty></longitude>
+<latitude><value>%.4f</value><uncertainty>1.3</uncertainty></latitude>
+<depth><value>%.0f</value><uncertainty>1800</uncertainty></depth>
+<quality><usedPhaseCount>48</usedPhaseCount><standardError>0.9</standardError></quality>
+<evaluationMode>manual</evaluationMode>
+<creationInfo><agencyID>us</agencyID><creationTime>%s</creationTime></creationInfo>
+</origin>
+<magnitude publicID="quakeml:us.anss.org/magnitude/us%08d">
+<mag><value>%.1f</value><uncertainty>0.1</uncertainty></mag>
+<type>mww</type><stationCount>20</stationCount>
+</magnitude>
+<creationInfo><agencyID>us</agencyID><creationTime>%s</creationTime><version>4</version></creationInfo>
+</event>
+"""
+
+
+def generate(filename, numEvents):
+    rng = np.random.RandomState(0)
+    times = np.datetime64('2000-01-01T00:00:00') + \
+        np.sort(rng.randint(0, 20*365*86400, numEvents)).astype('timedelta64[s]')
+    with open(filename, 'w') as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<q:quakeml xmlns="http://quakeml.org/xmlns/bed/1.2" '
+                'xmlns:q="http://quakeml.org/xmlns/quakeml/1.2">\n'
+                '<eventParameters publicID="quakeml:us.anss.org/catalog">\n')
+        for ii in range(numEvents):
+            timeString = "%s.000Z" % times[ii]
+            f.write(EVENT % (ii, ii, timeString, rng.uniform(-180, 180),
+                             rng.uniform(-90, 90), rng.uniform(0, 7e5),
+                             timeString, ii, rng.uniform(2, 9), timeString))
+        f.write('</eventParameters>\n</q:quakeml>\n')
+
+
+def run(mode, filename):
+    from lxml import etree
+    from seismon import eqmon
+
+    start = time.perf_counter()
+    if mode == 'tree':
+        root = etree.parse(filename).getroot()
+        events = [eqmon.parse_xml(element)
+                  for element in root.iter(eqmon._QUAKEML_EVENT)]
+    else:
+        events = list(eqmon.iterparse_quakeml(filename))
+    elapsed = time.perf_counter() - start
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print('%d %f %d' % (len(events), elapsed, peak))
+
+
+if args.mode is not None:
+    run(args.mode, args.file)
+    sys.exit(0)
+
+tmpdir = tempfile.mkdtemp()
+filename = os.path.join(tmpdir, 'catalogue.xml')
+generate(filename, args.events)
+size = os.path.getsize(filename)
+
+# baseline RSS of an interpreter that has imported seismon
+baseline = subprocess.check_output(
+    [sys.executable, '-c', 'import resource, seismon.eqmon; '
+     'print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)'],
+    stderr=subprocess.DEVNULL)
+baseline = int(baseline.split()[-1])
+
+print('catalogue: %d events, %.1f MB' % (args.events, size/1e6))
+print('%8s %12s %14s %16s' % ('reader', 'time [s]', 'events/s',
+                              'peak RSS [MB]'))
+for mode in ['tree', 'stream']:
+    output = subprocess.check_output(
+        [sys.executable, __file__, '--mode', mode, '--file', filename],
+        stderr=subprocess.DEVNULL)
+    numEvents, elapsed, peak = output.split()[-3:]
+    print('%8s %12.2f %14.0f %16.1f' % (mode, float(elapsed),
+                                         int(numEvents)/float(elapsed),
+                                         (int(peak)-baseline)/1024.0))
+
+os.remove(filename)
+os.rmdir(tmpdir)
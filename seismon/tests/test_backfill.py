@@ -0,0 +1,105 @@
+# check the resumable backfill: interrupted runs resume where they stopped,
+# pooled runs give the serial results, and atomic writes never leave a
+# partial file behind
+import os
+
+import pytest
+
+from seismon import backfill, eventregistry
+
+
+def square(outputDir, value):
+    with backfill.atomic_write(os.path.join(outputDir, "%d.txt" % value)) as f:
+        f.write("%d\n" % (value * value))
+    return value * value
+
+
+class Interrupted(Exception):
+    pass
+
+
+def test_resume_after_interruption(tmpdir):
+    stateFile = str(tmpdir.join("state.txt"))
+    units = [("unit-%d" % value, (str(tmpdir), value)) for value in range(10)]
+
+    def interrupt(key, result):
+        if key == "unit-4":
+            raise Interrupted()
+
+    with pytest.raises(Interrupted):
+        backfill.run_units(units, square, stateFile=stateFile, callback=interrupt)
+    assert backfill.load_state(stateFile) == set("unit-%d" % value for value in range(4))
+
+    results = backfill.run_units(units, square, stateFile=stateFile)
+    assert sorted(results) == ["unit-%d" % value for value in range(4, 10)]
+    assert backfill.load_state(stateFile) == set(key for key, args in units)
+    assert backfill.run_units(units, square, stateFile=stateFile) == {}
+
+
+def test_pool_matches_serial(tmpdir):
+    units = [("unit-%d" % value, (str(tmpdir), value)) for value in range(20)]
+    serial = backfill.run_units(units, square)
+    pooled = backfill.run_units(units, square, jobs=3)
+    assert pooled == serial
+    assert open(str(tmpdir.join("7.txt"))).read() == "49\n"
+
+
+def test_truncated_state_line(tmpdir):
+    stateFile = str(tmpdir.join("state.txt"))
+    with open(stateFile, "w") as f:
+        f.write("unit-0\nunit-1\nuni")
+    assert backfill.load_state(stateFile) == set(["unit-0", "unit-1"])
+    assert backfill.load_state(str(tmpdir.join("missing.txt"))) == set()
+
+
+def test_atomic_write(tmpdir):
+    filename = str(tmpdir.join("event.json"))
+    with backfill.atomic_write(filename) as f:
+        f.write("old")
+
+    with pytest.raises(Interrupted):
+        with backfill.atomic_write(filename) as f:
+            f.write("partial")
+            raise Interrupted()
+    assert open(filename).read() == "old"
+    assert os.listdir(str(tmpdir)) == ["event.json"]
+
+
+def test_atomic_write_mode(tmpdir):
+    # new files get what open() gives them, rewrites keep their mode
+    plainFile = str(tmpdir.join("plain.json"))
+    open(plainFile, "w").close()
+    filename = str(tmpdir.join("event.json"))
+    with backfill.atomic_write(filename) as f:
+        f.write("new")
+    assert os.stat(filename).st_mode & 0o7777 == os.stat(plainFile).st_mode & 0o7777
+
+    os.chmod(filename, 0o640)
+    with backfill.atomic_write(filename) as f:
+        f.write("rewritten")
+    assert os.stat(filename).st_mode & 0o7777 == 0o640
+
+
+def test_registry_subset_and_merge():
+    registry = eventregistry.new_registry()
+    registry["events"]["us1"] = {"updated": 100.0, "hash": "a"}
+    registry["events"]["us2"] = {"updated": 100.0, "hash": "b"}
+
+    subset = eventregistry.subset_registry(registry, ["us1", "us3"])
+    assert subset["events"] == {"us1": {"updated": 100.0, "hash": "a"}}
+    subset["events"]["us1"] = {"updated": 200.0, "hash": "c"}
+    subset["events"]["us3"] = {"updated": 50.0, "hash": "d"}
+    subset["processed"] = 2
+    subset["skipped"] = 1
+    assert registry["events"]["us1"]["hash"] == "a"
+
+    stale = eventregistry.new_registry()
+    stale["events"]["us2"] = {"updated": 10.0, "hash": "e"}
+
+    eventregistry.merge_registry(registry, subset)
+    eventregistry.merge_registry(registry, stale)
+    assert registry["events"]["us1"] == {"updated": 200.0, "hash": "c"}
+    assert registry["events"]["us2"] == {"updated": 100.0, "hash": "b"}
+    assert registry["events"]["us3"] == {"updated": 50.0, "hash": "d"}
+    assert registry["processed"] == 2
+    assert registry["skipped"] == 1
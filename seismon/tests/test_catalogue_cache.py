@@ -0,0 +1,92 @@
+# check the resident training-catalogue cache used by makePredictionsV3
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from seismon import eqmon
+
+seismonpath = os.path.dirname(eqmon.__file__)
+trainFile = os.path.join(seismonpath, 'input',
+                         'LHO_processed_USGS_global_EQ_catalogue.csv')
+
+
+def test_catalogue_matches_csv():
+    eqmon.clear_catalogue_cache()
+    catalogue = eqmon.load_catalogue(trainFile)
+    trainData = pd.read_csv(trainFile)
+    for name in ['latitude', 'longitude', 'depth', 'mag',
+                 'peak_data_um_mean_subtracted']:
+        assert catalogue[name].dtype == np.float64
+        assert catalogue[name].flags['C_CONTIGUOUS']
+        np.testing.assert_array_equal(catalogue[name], trainData[name].values)
+
+
+def test_catalogue_is_parsed_once():
+    eqmon.clear_catalogue_cache()
+    first = eqmon.load_catalogue(trainFile)
+    second = eqmon.load_catalogue(trainFile)
+    assert first is second
+
+
+def test_catalogue_invalidated_on_change(tmp_path):
+    csvFile = str(tmp_path / 'catalogue.csv')
+    pd.DataFrame({'latitude': [1.0, 2.0], 'longitude': [3.0, 4.0]}).to_csv(
+        csvFile, index=False)
+    first = eqmon.load_catalogue(csvFile)
+
+    pd.DataFrame({'latitude': [1.0, 2.0, 5.0],
+                  'longitude': [3.0, 4.0, 6.0]}).to_csv(csvFile, index=False)
+    second = eqmon.load_catalogue(csvFile)
+    assert second is not first
+    np.testing.assert_array_equal(second['latitude'], [1.0, 2.0, 5.0])
+
+
+def test_catalogue_keeps_every_column():
+    eqmon.clear_catalogue_cache()
+    catalogue = eqmon.load_catalogue(trainFile)
+    trainData = pd.read_csv(trainFile)
+    assert list(catalogue) == list(trainData.columns)
+    for name in ['time', 'id', 'place', 'type', 'channel']:
+        np.testing.assert_array_equal(catalogue[name], trainData[name].values)
+
+    TD = eqmon.make_prediction(catalogue, 35.0, 139.0, 6.5, 10.0,
+                               46.6475, -119.5986, 0.1,
+                               'peak_data_um_mean_subtracted', 1e-5)[4]
+    expected = eqmon.make_prediction(trainData, 35.0, 139.0, 6.5, 10.0,
+                                     46.6475, -119.5986, 0.1,
+                                     'peak_data_um_mean_subtracted', 1e-5)[4]
+    assert list(TD.columns) == list(expected.columns)
+    assert list(TD['place']) == list(expected['place'])
+
+
+def test_catalogue_sidecar(tmp_path, monkeypatch):
+    csvFile = str(tmp_path / 'catalogue.csv')
+    pd.DataFrame({'latitude': [1.0, 2.0], 'longitude': [3.0, 4.0],
+                  'place': ['a', None]}).to_csv(csvFile, index=False)
+    eqmon.clear_catalogue_cache()
+    first = eqmon.load_catalogue(csvFile, sidecar=True)
+    assert os.path.isfile(str(tmp_path / 'catalogue.npz'))
+
+    eqmon.clear_catalogue_cache()
+    # the second load comes from the sidecar alone
+    monkeypatch.setattr(eqmon.pd, 'read_csv', None)
+    second = eqmon.load_catalogue(csvFile, sidecar=True)
+    assert list(second) == ['latitude', 'longitude', 'place']
+    np.testing.assert_array_equal(first['longitude'], second['longitude'])
+    assert second['place'][0] == 'a' and pd.isnull(second['place'][1])
+
+
+def test_prediction_unchanged():
+    trainData = pd.read_csv(trainFile)
+    catalogue = eqmon.load_catalogue(trainFile)
+    for lat, lon, mag, depth in [(35.0, 139.0, 6.5, 10.0),
+                                 (-20.0, -70.0, 7.1, 50.0)]:
+        expected = eqmon.make_prediction(trainData, lat, lon, mag, depth,
+                                         46.6475, -119.5986, 0.1,
+                                         'peak_data_um_mean_subtracted', 1e-5)
+        result = eqmon.make_prediction(catalogue, lat, lon, mag, depth,
+                                       46.6475, -119.5986, 0.1,
+                                       'peak_data_um_mean_subtracted', 1e-5)
+        assert result[:4] == expected[:4]
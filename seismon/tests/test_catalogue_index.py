@@ -0,0 +1,51 @@
+# check the cKDTree catalogue index against brute-force Mahalanobis cdist
+import os
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from seismon import eqmon
+
+seismonpath = os.path.dirname(eqmon.__file__)
+trainFile = os.path.join(seismonpath, 'input',
+                         'LHO_processed_USGS_global_EQ_catalogue.csv')
+predictor = 'peak_data_um_mean_subtracted'
+
+
+def test_neighbours_match_cdist():
+    rng = np.random.RandomState(0)
+    features = np.column_stack((rng.normal(10, 20, 500),
+                                rng.normal(-40, 60, 500)))
+    index = eqmon.build_catalogue_index({'latitude': features[:, 0],
+                                         'longitude': features[:, 1]})
+
+    # queries both inside the catalogue and far outside it
+    queries = np.vstack((features[:50] + rng.normal(0, 2, (50, 2)),
+                         np.column_stack((rng.uniform(-90, 90, 50),
+                                          rng.uniform(-180, 180, 50)))))
+    for lat, lon in queries:
+        P = cdist(features, [[lat, lon]], 'mahalanobis').ravel()
+        for thresh in [0.05, 0.1, 0.5]:
+            rows, dist = eqmon.catalogue_neighbours(index, lat, lon, thresh)
+            expected = np.where(P <= thresh)[0]
+            np.testing.assert_array_equal(np.sort(rows), expected)
+            np.testing.assert_allclose(dist, P[rows], rtol=1e-10)
+            assert np.all(np.diff(dist) >= 0)
+
+
+def test_prediction_with_index():
+    trainData = eqmon.load_catalogue(trainFile)
+    index = eqmon.load_catalogue_index(trainFile)
+    assert eqmon.load_catalogue_index(trainFile) is index
+
+    lat = np.append(trainData['latitude'][:5] + 0.02, [35.0, -20.0])
+    lon = np.append(trainData['longitude'][:5] - 0.02, [139.0, -70.0])
+    for ii in range(len(lat)):
+        expected = eqmon.make_prediction(trainData, lat[ii], lon[ii], 6.0,
+                                         10.0, 46.6475, -119.5986, 0.1,
+                                         predictor, 1e-5)
+        result = eqmon.make_prediction(trainData, lat[ii], lon[ii], 6.0,
+                                       10.0, 46.6475, -119.5986, 0.1,
+                                       predictor, 1e-5, index=index)
+        np.testing.assert_allclose(result[0], expected[0], rtol=1e-10)
+        assert result[1] == expected[1]
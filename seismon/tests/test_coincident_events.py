@@ -0,0 +1,44 @@
+# check the sort-based coincident event search against the pairwise loop
+# run_earthquakes_analysis used to run
+import numpy as np
+
+from seismon import eqmon
+
+
+def coincident_reference(gps, minDiff):
+    coincident = []
+    for i in range(len(gps)):
+        for j in range(len(gps)):
+            if j <= i:
+                continue
+            gpsDiff = gps[i] - gps[j]
+            if np.absolute(gpsDiff) < minDiff:
+                coincident.append(j)
+    return sorted(set(coincident))
+
+
+def test_coincident_events_match_reference():
+    rng = np.random.RandomState(0)
+    for trial in range(200):
+        num = rng.randint(1, 150)
+        gps = 1e9 + rng.uniform(0, rng.choice([1e3, 1e4, 1e5]), num)
+        if trial % 3 == 0:
+            # whole seconds give exact ties on the window edge
+            gps = np.round(gps / 300.0) * 300.0
+        coincident = eqmon.find_coincident_events(gps, 600)
+        assert list(coincident) == coincident_reference(gps, 600)
+
+    for trial in range(100):
+        # a decimal grid puts differences within rounding of the window
+        gps = 1e9 + rng.randint(0, 60, 80)*0.1
+        coincident = eqmon.find_coincident_events(gps, 0.3)
+        assert list(coincident) == coincident_reference(gps, 0.3)
+
+
+def test_coincident_events_edge_cases():
+    assert len(eqmon.find_coincident_events([], 600)) == 0
+    assert len(eqmon.find_coincident_events([1e9], 600)) == 0
+    assert list(eqmon.find_coincident_events([1e9, 1e9, 1e9], 600)) == [1, 2]
+    assert list(eqmon.find_coincident_events([1e9 + 600, 1e9], 600)) == []
+    assert list(eqmon.find_coincident_events([1e9 + 599, 1e9], 600)) == [1]
+    assert list(eqmon.find_coincident_events([1e9, 1e9], 0)) == []
@@ -0,0 +1,40 @@
+# check the cached country lookup against an argmin of distance_latlon
+# over the whole centroid table, as run_earthquakes_info used to do
+import os
+
+import numpy as np
+
+from seismon import eqmon
+
+csvFile = os.path.join(os.path.dirname(eqmon.__file__), 'input',
+                       'countries.csv')
+
+
+def test_nearest_country_matches_argmin():
+    countriesTable = eqmon.load_countries(csvFile)
+    latitudes = countriesTable["latitudes"]
+    longitudes = countriesTable["longitudes"]
+
+    rng = np.random.RandomState(0)
+    num = 5000
+    lats = np.degrees(np.arcsin(rng.uniform(-1, 1, num)))
+    lons = rng.uniform(-180, 180, num)
+    # events right on a centroid and on the antimeridian
+    picks = rng.randint(0, len(latitudes), 100)
+    lats[:100], lons[:100] = latitudes[picks], longitudes[picks]
+    lons[100:150] = rng.choice([-180.0, 180.0], 50)
+
+    countries = eqmon.nearest_country(countriesTable, lats, lons)
+    for lat, lon, country in zip(lats, lons, countries):
+        distances = eqmon.distance_latlon(lat, lon, latitudes, longitudes)
+        assert country == countriesTable["countries"][np.argmin(distances)]
+
+
+def test_nearest_country_scalar_and_empty():
+    countriesTable = eqmon.load_countries(csvFile)
+    assert eqmon.nearest_country(countriesTable, 35.7, 139.7) == "Japan"
+    assert eqmon.nearest_country(countriesTable, [], []) == []
+
+
+def test_load_countries_cached():
+    assert eqmon.load_countries(csvFile) is eqmon.load_countries(csvFile)
@@ -0,0 +1,69 @@
+# check that read_eqmons gets the same earthquakes from the binary
+# sidecar as from earthquakes.xml, and falls back to the xml when the
+# sidecar is missing or older
+import os
+
+import numpy as np
+
+from seismon import eqmon, utils
+
+CATEGORIES = ["Latitudes", "Longitudes", "Distances", "Ptimes", "Stimes", "Rtwotimes",
+              "RthreePointFivetimes", "Rfivetimes", "Rfamp", "Lockloss", "Pamp"]
+
+
+def events():
+    rng = np.random.RandomState(0)
+    attributeDics = []
+    for ii in range(20):
+        attributeDic = {"eventName": "us%04d" % ii, "eventID": "%08d" % ii,
+                        "GPS": np.float64(1200000000.5 + 600*ii), "Magnitude": 4.0 + (ii % 5)*0.5,
+                        "Version": "1", "Region": "Off the coast", "Review": "",
+                        "Depth": np.float32(10.0), "Count": np.int64(ii), "Flag": True}
+        attributeDic["traveltimes"] = {}
+        for site in ["Arbitrary", "LHO", "LLO"]:
+            attributeDic["traveltimes"][site] = {}
+            for category in CATEGORIES:
+                attributeDic["traveltimes"][site][category] = list(1e9 + 1e4*rng.rand(18))
+            attributeDic["traveltimes"][site]["Distances"] = 1e7*rng.rand(18)
+            attributeDic["traveltimes"][site]["Azimuth"] = float(rng.rand())
+        attributeDics.append(attributeDic)
+    return attributeDics
+
+
+def read_xml(file):
+    os.remove(utils.eqmons_sidecar(file))
+    return utils.read_eqmons(file)
+
+
+def test_sidecar_matches_xml(tmpdir):
+    file = str(tmpdir.join("earthquakes.xml"))
+    eqmon.write_info(file, events())
+    assert os.path.isfile(str(tmpdir.join("earthquakes.npz")))
+
+    sidecar = utils.read_eqmons(file)
+    xml = read_xml(file)
+    assert len(sidecar) == 20
+    assert sidecar == xml
+    for attributeDic, attributeDicXML in zip(sidecar, xml):
+        assert list(attributeDic) == list(attributeDicXML)
+        assert list(attributeDic["traveltimes"]["LHO"]) == list(attributeDicXML["traveltimes"]["LHO"])
+    assert sidecar[3]["Review"] is None
+    assert sidecar[3]["Version"] == 1.0
+    assert sidecar[3]["Flag"] == "True"
+
+
+def test_stale_sidecar(tmpdir):
+    file = str(tmpdir.join("earthquakes.xml"))
+    eqmon.write_info(file, events())
+    sidecarFile = utils.eqmons_sidecar(file)
+    with open(sidecarFile, "wb") as f:
+        f.write(b"not a sidecar")
+    os.utime(sidecarFile, ns=(0, 0))
+    assert len(utils.read_eqmons(file)) == 20
+
+
+def test_empty(tmpdir):
+    file = str(tmpdir.join("earthquakes.xml"))
+    eqmon.write_info(file, [])
+    assert utils.read_eqmons(file) == []
+    assert read_xml(file) == []
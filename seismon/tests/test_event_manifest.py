@@ -0,0 +1,131 @@
+# check that retrieve_earthquakes resolves windows through the event
+# manifest exactly as the directory glob does
+import json
+import os
+
+from seismon import eqmon
+
+TRAVELTIMES = {"LHO": {"Ptimes": [1.0], "Stimes": [2.0], "Rtwotimes": [3.0],
+                       "RthreePointFivetimes": [4.0], "Rfivetimes": [5.0]}}
+
+
+def write_events(directory, manifest=True):
+    os.makedirs(directory)
+    names = []
+    for ii in range(200):
+        gps = 1200000000 + 600*ii
+        attributeDic = {"eventName": "us%04d" % ii, "GPS": gps,
+                        "SentGPS": gps + 30, "Magnitude": 4.0 + (ii % 5)*0.5,
+                        "traveltimes": TRAVELTIMES}
+        if ii % 2:
+            name = "%s-%.0f-%.0f.json" % ("us%04d" % ii, gps, gps + 30)
+        else:
+            name = "%s-%.0f.json" % ("us%04d" % ii, gps)
+        filename = os.path.join(directory, name)
+        with open(filename, 'w') as json_file:
+            json.dump(attributeDic, json_file)
+        if manifest:
+            eqmon.manifest_add(filename, attributeDic)
+        names.append(filename)
+    return names
+
+
+def names(attributeDics):
+    return sorted(attributeDic["eventName"] for attributeDic in attributeDics)
+
+
+def test_manifest_matches_glob(tmpdir):
+    write_events(str(tmpdir.join('indexed', 'private')))
+    write_events(str(tmpdir.join('globbed', 'private')), manifest=False)
+
+    for gpsStart, gpsEnd, minMag in [(1200003600, 1200030000, 5.0),
+                                     (1200000000, 1200000030, 0.0),
+                                     (1200119000, 1300000000, 6.0),
+                                     (1100000000, 1100000100, 4.0)]:
+        results = []
+        for location in ['indexed', 'globbed']:
+            params = {"eventfilesLocation": str(tmpdir.join(location)),
+                      "eventfilesType": "private",
+                      "earthquakesMinMag": minMag}
+            results.append(names(eqmon.retrieve_earthquakes(params, gpsStart, gpsEnd)))
+        assert results[0] == results[1]
+
+    assert os.path.isfile(str(tmpdir.join('indexed', 'private', eqmon.MANIFEST_FILE)))
+    assert not os.path.isfile(str(tmpdir.join('globbed', 'private', eqmon.MANIFEST_FILE)))
+
+
+def test_manifest_window_uses_filename_gps(tmpdir):
+    directory = str(tmpdir.join('private'))
+    write_events(directory)
+    # us0001 is written as name-GPS-SentGPS, so it is keyed on SentGPS
+    files = eqmon.query_manifest(directory, 1200000630, 1200000630, 0.0)
+    assert [os.path.basename(file) for file in files] == ["us0001-1200000600-1200000630.json"]
+
+
+def test_rebuild_manifest(tmpdir):
+    directory = str(tmpdir.join('private'))
+    files = write_events(directory, manifest=False)
+    assert eqmon.query_manifest(directory, 0, 2e9, 0.0) is None
+
+    assert eqmon.rebuild_manifest(directory) == len(files)
+    assert sorted(eqmon.query_manifest(directory, 0, 2e9, 0.0)) == sorted(files)
+
+    os.remove(files[0])
+    params = {"eventfilesLocation": str(tmpdir), "eventfilesType": "private",
+              "earthquakesMinMag": 0.0}
+    attributeDics = eqmon.retrieve_earthquakes(params, 1200000000, 1200000000)
+    assert attributeDics == []
+    assert eqmon.rebuild_manifest(directory) == len(files) - 1
+
+
+def test_files_written_without_manifest(tmpdir):
+    directory = str(tmpdir.join('private'))
+    files = write_events(directory)
+    params = {"eventfilesLocation": str(tmpdir), "eventfilesType": "private",
+              "earthquakesMinMag": 0.0}
+    assert len(eqmon.retrieve_earthquakes(params, 1200000000, 1300000000)) == len(files)
+
+    # copied in, or the writer died before manifest_add
+    attributeDic = {"eventName": "us9999", "GPS": 1200500000, "SentGPS": 1200500030,
+                    "Magnitude": 7.0, "traveltimes": TRAVELTIMES}
+    with open(os.path.join(directory, "us9999-1200500000.json"), 'w') as json_file:
+        json.dump(attributeDic, json_file)
+    # and rewritten in place with a new magnitude
+    with open(files[0]) as json_file:
+        attributeDic = json.load(json_file)
+    attributeDic["Magnitude"] = 2.0
+    with open(files[0], 'w') as json_file:
+        json.dump(attributeDic, json_file)
+    os.utime(files[0], ns=(0, 0))
+    os.remove(files[1])
+
+    attributeDics = eqmon.retrieve_earthquakes(params, 1200000000, 1300000000)
+    assert "us9999" in names(attributeDics)
+    assert "us0001" not in names(attributeDics)
+    assert len(attributeDics) == len(files)
+    # the manifest still has the old magnitude until it is rebuilt
+    indexed = eqmon.query_manifest(directory, 1200000000, 1300000000, 3.0)
+    assert files[0] in indexed
+    assert files[1] not in indexed
+    assert eqmon.rebuild_manifest(directory) == len(files)
+    indexed = eqmon.query_manifest(directory, 1200000000, 1300000000, 3.0)
+    assert files[0] not in indexed
+    assert len(indexed) == len(files) - 1
+
+
+def test_query_does_not_write(tmpdir):
+    directory = str(tmpdir.join('private'))
+    files = write_events(directory)
+    with open(os.path.join(directory, "us9999-1200500000.json"), 'w') as json_file:
+        json.dump({"eventName": "us9999", "Magnitude": 7.0}, json_file)
+    manifestFile = os.path.join(directory, eqmon.MANIFEST_FILE)
+    before = sorted(os.listdir(directory)), os.stat(manifestFile).st_mtime_ns
+    with open(manifestFile, 'rb') as manifest:
+        content = manifest.read()
+
+    files = eqmon.query_manifest(directory, 1200000000, 1300000000, 6.0)
+    assert os.path.join(directory, "us9999-1200500000.json") in files
+
+    assert (sorted(os.listdir(directory)), os.stat(manifestFile).st_mtime_ns) == before
+    with open(manifestFile, 'rb') as manifest:
+        assert manifest.read() == content
@@ -0,0 +1,99 @@
+# check product-version deduplication: unchanged and stale revisions are
+# skipped, anything the predictions depend on is processed again
+import os
+import queue
+import threading
+
+import numpy as np
+
+from seismon import eventregistry, pdlwatch
+
+EQXML = """<?xml version="1.0" encoding="UTF-8"?>
+<EQMessage xmlns="http://www.usgs.gov/ansseqmsg"><Source>us</Source><Sent>%(sent)s</Sent><Event><DataSource>us</DataSource><EventID>%(id)s</EventID><Version>%(version)d</Version><Type>Earthquake</Type><Origin><Time>2019-07-06T03:19:53.040Z</Time><Latitude>35.77</Latitude><Longitude>-117.599</Longitude><Depth>8</Depth><Status>Reviewed</Status><Magnitude><TypeKey>Mww</TypeKey><Value>%(mag).1f</Value></Magnitude></Origin></Event></EQMessage>
+"""
+
+
+def product(eventName, sent, mag=6.4, depth=8.0):
+    return {"eventName": eventName, "SentGPS": sent, "Time": "2019-07-06T03:19:53.040Z",
+            "Latitude": 35.77, "Longitude": -117.599, "Depth": depth, "Magnitude": mag}
+
+
+def test_check_product():
+    registry = eventregistry.new_registry()
+    assert eventregistry.check_product(registry, product("us1", 100.0))
+    # a later revision with the same solution
+    assert not eventregistry.check_product(registry, product("us1", 200.0))
+    # a revised magnitude and a revised depth
+    assert eventregistry.check_product(registry, product("us1", 300.0, mag=6.5))
+    assert eventregistry.check_product(registry, product("us1", 400.0, mag=6.5, depth=10.0))
+    # a stale revision arriving late
+    assert not eventregistry.check_product(registry, product("us1", 250.0, mag=7.0))
+    # numpy scalars hash like python floats
+    assert not eventregistry.check_product(
+        registry, product("us1", np.float64(500.0), mag=np.float64(6.5), depth=np.float64(10.0)))
+    assert eventregistry.check_product(registry, product("us2", 100.0))
+
+    assert registry["processed"] == 4
+    assert registry["skipped"] == 3
+    assert registry["events"]["us1"]["updated"] == 500.0
+
+
+def test_registry_round_trip(tmpdir):
+    registryFile = str(tmpdir.join("registry.json"))
+    registry = eventregistry.load_registry(registryFile)
+    eventregistry.check_product(registry, product("us1", 100.0))
+    eventregistry.save_registry(registry, registryFile)
+
+    registry = eventregistry.load_registry(registryFile)
+    assert registry["processed"] == registry["skipped"] == 0
+    assert not eventregistry.check_product(registry, product("us1", 200.0))
+    assert tmpdir.listdir() == [tmpdir.join("registry.json")]
+
+
+def write_revisions(directory):
+    revisions = [(1, "2019-07-06T03:25:00.000Z", 6.4),
+                 (2, "2019-07-06T03:40:00.000Z", 6.4),
+                 (3, "2019-07-06T04:10:00.000Z", 6.5),
+                 (4, "2019-07-06T05:00:00.000Z", 6.5)]
+    for version, sent, mag in revisions:
+        folder = os.path.join(directory, "ci38457511", "ci", "%d" % version)
+        os.makedirs(folder)
+        with open(os.path.join(folder, "eqxml.xml"), "w") as f:
+            f.write(EQXML % {"id": "38457511", "sent": sent, "version": version, "mag": mag})
+
+
+def test_ingest_products_with_registry(tmpdir):
+    directory = str(tmpdir)
+    write_revisions(directory)
+    registry = eventregistry.new_registry()
+    productQueue = queue.Queue()
+    stop = threading.Event()
+    stop.set()
+    pdlwatch.ingest_products(directory, productQueue, stop=stop,
+                             useInotify=False, registry=registry)
+
+    mags = []
+    while not productQueue.empty():
+        attributeDic = productQueue.get()
+        assert "Arbitrary" in attributeDic["traveltimes"]
+        mags.append(attributeDic["Magnitude"])
+    assert mags == [6.4, 6.5]
+    assert registry["processed"] == 2
+    assert registry["skipped"] == 2
+
+
+def test_ingest_products_without_traveltimes(tmpdir):
+    directory = str(tmpdir)
+    write_revisions(directory)
+    productQueue = queue.Queue()
+    stop = threading.Event()
+    stop.set()
+    pdlwatch.ingest_products(directory, productQueue, stop=stop, useInotify=False,
+                             registry=eventregistry.new_registry(), traveltimes=False)
+
+    mags = []
+    while not productQueue.empty():
+        attributeDic = productQueue.get()
+        assert not "traveltimes" in attributeDic
+        mags.append(attributeDic["Magnitude"])
+    assert mags == [6.4, 6.5]
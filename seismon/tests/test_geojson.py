@@ -0,0 +1,108 @@
+# check the columnar GeoJSON loader and its lazy attributeDics against
+# jsonread feature by feature
+import json
+
+import numpy as np
+import pytest
+
+from seismon import eqmon, geojson, gpstime
+
+# fields that depend on when an event was read rather than on the event
+VOLATILE = ["Sent", "SentGPS", "SentUTC", "WrittenGPS", "WrittenUTC"]
+
+
+def make_features(num, seed=0):
+    rng = np.random.RandomState(seed)
+    features = []
+    for ii in range(num):
+        millis = int(rng.uniform(1.0e12, 1.7e12))
+        features.append({
+            "type": "Feature",
+            "properties": {"mag": round(rng.uniform(2.5, 8.0), 1),
+                           "place": "%d km N of Somewhere" % ii,
+                           "time": millis, "code": "%08d" % ii,
+                           "ids": ",us%08d,at%08d," % (ii, ii),
+                           "sources": ",us,at,",
+                           "status": ["reviewed", "AUTOMATIC"][ii % 2]},
+            "geometry": {"type": "Point",
+                         "coordinates": [round(rng.uniform(-180, 180), 4),
+                                         round(rng.uniform(-80, 80), 4),
+                                         round(rng.uniform(0, 600), 2)]},
+            "id": "us%08d" % ii})
+    return features
+
+
+def write_collection(file, features):
+    with open(file, 'w') as f:
+        json.dump({"type": "FeatureCollection", "features": features}, f)
+
+
+def test_columns(tmpdir):
+    features = make_features(500)
+    file = str(tmpdir.join('events.json'))
+    write_collection(file, features)
+
+    catalogue = geojson.read_geojson(file)
+    assert geojson.catalogue_size(catalogue) == 500
+    np.testing.assert_array_equal(catalogue["mag"],
+                                  [f["properties"]["mag"] for f in features])
+    np.testing.assert_array_equal(catalogue["depth"],
+                                  [f["geometry"]["coordinates"][2] for f in features])
+    assert list(catalogue["id"]) == ["us%08d" % ii for ii in range(500)]
+    for ii in range(0, 500, 50):
+        seconds = features[ii]["properties"]["time"] // 1000
+        assert catalogue["gps"][ii] == gpstime.utc_to_gps(np.datetime64(seconds, 's'))
+
+
+def test_attributeDics_match_jsonread(tmpdir):
+    features = make_features(10, seed=1)
+    file = str(tmpdir.join('events.json'))
+    write_collection(file, features)
+    catalogue = geojson.read_geojson(file)
+
+    for feature, attributeDic in zip(features, geojson.iter_attributeDics(catalogue)):
+        expected = eqmon.jsonread(feature)
+        assert sorted(attributeDic) == sorted(expected)
+        for key in expected:
+            if key in VOLATILE:
+                continue
+            if key == "traveltimes":
+                for ifo in expected[key]:
+                    for name in expected[key][ifo]:
+                        np.testing.assert_array_equal(attributeDic[key][ifo][name],
+                                                      expected[key][ifo][name])
+            else:
+                assert attributeDic[key] == expected[key], key
+
+
+def test_directory_and_lazy_cut(tmpdir):
+    features = make_features(300, seed=2)
+    write_collection(str(tmpdir.join('a.json')), features[:100])
+    write_collection(str(tmpdir.join('b.geojson')), features[100:])
+    features[5]["properties"]["mag"] = None
+    write_collection(str(tmpdir.join('a.json')), features[:100])
+
+    catalogue = geojson.read_geojson(str(tmpdir))
+    assert geojson.catalogue_size(catalogue) == 300
+    assert np.isnan(catalogue["mag"][5])
+
+    indexes = np.nonzero(catalogue["mag"] >= 7.0)[0]
+    events = list(geojson.iter_attributeDics(catalogue, indexes, traveltimes=False))
+    assert [event["eventName"] for event in events] == list(catalogue["id"][indexes])
+    assert all(not "traveltimes" in event for event in events)
+
+
+def test_iter_features():
+    features = make_features(20, seed=3)
+    collection = {"type": "FeatureCollection",
+                  "metadata": {"title": "features: [not these]", "count": 20},
+                  "features": features, "bbox": [-180, -80, 0, 180, 80, 600]}
+    for text in [json.dumps(collection), json.dumps(collection, indent=2)]:
+        assert list(geojson.iter_features(text)) == features
+
+    assert list(geojson.iter_features('{"type": "FeatureCollection", "features": [ ]}')) == []
+    catalogue = geojson.geojson_columns([])
+    assert geojson.catalogue_size(catalogue) == 0
+
+    with pytest.raises(ValueError):
+        list(geojson.iter_features('{"features": [{"type": "Feature"} {}]}'))
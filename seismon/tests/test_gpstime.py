@@ -0,0 +1,66 @@
+# check seismon.gpstime against astropy around every leap second since 1980
+from datetime import datetime, timedelta, timezone
+
+import astropy.time
+import numpy as np
+
+from seismon import eqmon, gpstime
+
+offsets = [-86400.25, -2, -1, -0.5, -1e-6, 0, 1e-6, 0.5, 1, 2, 86400.75]
+
+
+def boundaries():
+    times = [datetime(1980, 1, 6), datetime(1980, 1, 6, 0, 0, 1)]
+    for leap in gpstime.LEAP_SECONDS.astype('datetime64[s]').astype(object):
+        times.extend(leap + timedelta(seconds=offset) for offset in offsets)
+    return times
+
+
+# astropy works on two-double Julian dates and can be off by ~1e-12 s
+# (e.g. 1.000000000001755 one second after the GPS epoch)
+ATOL = 1e-9
+
+
+def test_utc_to_gps_matches_astropy():
+    times = boundaries()
+    expected = astropy.time.Time(times, format='datetime', scale='utc').gps
+    for dt, gps in zip(times, expected):
+        assert abs(gpstime.utc_to_gps(dt) - gps) < ATOL
+    # whole arrays, and ISO strings as the parsers see them
+    np.testing.assert_allclose(gpstime.utc_to_gps(times), expected,
+                               rtol=0, atol=ATOL)
+    strings = [dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ") for dt in times]
+    np.testing.assert_allclose(gpstime.utc_to_gps(strings), expected,
+                               rtol=0, atol=ATOL)
+
+
+def test_timezone_aware_datetimes():
+    naive = datetime(2019, 7, 6, 3, 19, 53)
+    expected = gpstime.utc_to_gps(naive)
+    assert gpstime.utc_to_gps(naive.replace(tzinfo=timezone.utc)) == expected
+    pacific = timezone(timedelta(hours=-7))
+    assert gpstime.utc_to_gps(datetime(2019, 7, 5, 20, 19, 53, tzinfo=pacific)) == expected
+    np.testing.assert_array_equal(
+        gpstime.utc_to_gps([naive, datetime(2019, 7, 5, 20, 19, 53, tzinfo=pacific)]),
+        [expected, expected])
+
+
+def test_gps_to_utc_round_trip():
+    times = boundaries()
+    gps = gpstime.utc_to_gps(times)
+    np.testing.assert_array_equal(gpstime.gps_to_utc(gps),
+                                  np.array(times, dtype='datetime64[us]'))
+
+    rng = np.random.RandomState(0)
+    gps = np.round(rng.uniform(0, 1.4e9, 200), 3)
+    expected = astropy.time.Time(gps, format='gps', scale='utc').isot
+    np.testing.assert_array_equal(gpstime.gps_to_isot(gps), expected)
+
+
+def test_fakeeventread():
+    params = {"gps": 1246418411.04, "latitude": 35.7695,
+              "longitude": -117.5993, "depth": 8.0, "magnitude": 7.1}
+    attributeDic = eqmon.fakeeventread(params)
+    assert attributeDic["GPS"] == 1246418411.04
+    assert attributeDic["Time"] == "2019-07-06T03:19:53.040"
+    assert abs(attributeDic["SentGPS"] - attributeDic["WrittenGPS"]) < 5
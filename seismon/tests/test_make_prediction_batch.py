@@ -0,0 +1,69 @@
+# check the batched make_prediction against the scalar path
+import os
+
+import numpy as np
+
+from seismon import eqmon
+
+seismonpath = os.path.dirname(eqmon.__file__)
+trainFile = os.path.join(seismonpath, 'input',
+                         'LLO_processed_USGS_global_EQ_catalogue.csv')
+predictor = 'peak_data_um_mean_subtracted'
+
+
+def random_queries(num, seed=0):
+    rng = np.random.RandomState(seed)
+    return (rng.uniform(-60, 60, num), rng.uniform(-180, 180, num),
+            rng.uniform(4, 8, num), rng.uniform(2, 100, num),
+            rng.uniform(-60, 60, num), rng.uniform(-180, 180, num))
+
+
+def test_batch_matches_scalar():
+    trainData = eqmon.load_catalogue(trainFile)
+    lat, lon, mag, depth, siteLat, siteLon = random_queries(40)
+    # include queries sitting close to catalogue events so the
+    # threshold branch is exercised as well as the fallback
+    lat[:10] = trainData['latitude'][:10] + 0.01
+    lon[:10] = trainData['longitude'][:10] - 0.01
+
+    # a small maxElements forces several chunks
+    amp, lockloss, amp_sigma, lockloss_sigma = eqmon.make_prediction_batch(
+        trainData, lat, lon, mag, depth, siteLat, siteLon, 0.1, predictor,
+        1e-5, maxElements=10*len(trainData['latitude']))
+
+    for ii in range(len(lat)):
+        expected = eqmon.make_prediction(trainData, lat[ii], lon[ii], mag[ii],
+                                         depth[ii], siteLat[ii], siteLon[ii],
+                                         0.1, predictor, 1e-5)
+        np.testing.assert_allclose(amp[ii], expected[0], rtol=1e-10)
+        assert lockloss[ii] == expected[1]
+    assert not np.any(amp_sigma)
+    assert not np.any(lockloss_sigma)
+
+
+def test_batch_broadcasts_site():
+    trainData = eqmon.load_catalogue(trainFile)
+    lat, lon, mag, depth, _, _ = random_queries(5, seed=1)
+    amp = eqmon.make_prediction_batch(trainData, lat, lon, mag, depth,
+                                      30.4986, -90.7483, 0.1, predictor,
+                                      1e-5)[0]
+    assert amp.shape == (5,)
+    expected = eqmon.make_prediction_batch(trainData, lat, lon, mag, depth,
+                                           30.4986*np.ones(5),
+                                           -90.7483*np.ones(5), 0.1,
+                                           predictor, 1e-5)[0]
+    np.testing.assert_array_equal(amp, expected)
+
+
+def test_grid_matches_makePredictions():
+    lat, lon, mag, depth, _, _ = random_queries(6, seed=2)
+    # repeated rows are evaluated once and scattered back
+    lat, lon, mag, depth = [np.concatenate((x, x[:3])) for x in (lat, lon, mag, depth)]
+    grid = eqmon.makePredictionsGrid(trainFile, mag, lat, lon, depth,
+                                     siteLat=30.4986, siteLon=-90.7483)
+    for ii in range(len(lat)):
+        expected = eqmon.makePredictions(trainFile, mag[ii], lat[ii], lon[ii],
+                                         0.0, depth[ii], 0.0,
+                                         siteLat=30.4986, siteLon=-90.7483)
+        for values, value in zip(grid, expected):
+            np.testing.assert_allclose(values[ii], value, rtol=1e-10)
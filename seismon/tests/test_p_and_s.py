@@ -0,0 +1,46 @@
+# check the resident p.dat / s.dat tables and their interpolator
+import os
+import shutil
+
+import numpy as np
+
+from seismon import traveltimes
+
+scriptpath = os.path.join(os.path.dirname(traveltimes.__file__), 'input')
+
+
+def test_table_matches_loadtxt():
+    table = traveltimes.load_p_and_s()
+    np.testing.assert_array_equal(table["Ptimes"],
+                                  np.loadtxt(os.path.join(scriptpath, 'p.dat')))
+    np.testing.assert_array_equal(table["Stimes"],
+                                  np.loadtxt(os.path.join(scriptpath, 's.dat')))
+    assert traveltimes.load_p_and_s() is table
+
+
+def test_interpolation():
+    table = traveltimes.load_p_and_s()
+    degrees, depths = np.meshgrid(table["degrees"], table["depths"],
+                                  indexing='ij')
+    ptimes, stimes = traveltimes.p_and_s_times(table, depths, degrees)
+    np.testing.assert_array_equal(ptimes, table["Ptimes"])
+    np.testing.assert_array_equal(stimes, table["Stimes"])
+
+    # halfway between two depths and two distances
+    ptime, stime = traveltimes.p_and_s_times(table, 10.5, 20.5)
+    np.testing.assert_allclose(ptime, table["Ptimes"][19:21, 9:11].mean())
+    np.testing.assert_allclose(stime, table["Stimes"][19:21, 9:11].mean())
+
+
+def test_sidecar(tmpdir):
+    for name in ['p.dat', 's.dat']:
+        shutil.copy(os.path.join(scriptpath, name), str(tmpdir))
+
+    table = traveltimes.load_p_and_s(str(tmpdir), sidecar=True)
+    assert tmpdir.join('p.npy').check() and tmpdir.join('s.npy').check()
+
+    traveltimes._p_and_s_cache.clear()
+    reloaded = traveltimes.load_p_and_s(str(tmpdir), sidecar=True)
+    assert reloaded is not table
+    np.testing.assert_array_equal(reloaded["Ptimes"], table["Ptimes"])
+    np.testing.assert_array_equal(reloaded["Stimes"], table["Stimes"])
@@ -0,0 +1,135 @@
+# end-to-end check of event-driven PDL ingestion: fake products written
+# into a temp directory must come out of the queue parsed, quickly
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from seismon import pdlwatch
+
+EQXML = """<?xml version="1.0" encoding="UTF-8"?>
+<EQMessage xmlns="http://www.usgs.gov/ansseqmsg"><Source>AK</Source><Sent>2013-12-07T17:03:03.436Z</Sent><Event><DataSource>AK</DataSource><EventID>%(id)s</EventID><Version>2</Version><Type>Earthquake</Type><Origin><Time>2013-12-07T16:44:10.000Z</Time><Latitude>55.1867</Latitude><Longitude>-157.8347</Longitude><Depth>13.1</Depth><Status>Reviewed</Status><Magnitude><TypeKey>Ml</TypeKey><Value>%(mag).1f</Value></Magnitude></Origin></Event></EQMessage>
+"""
+
+# generous bound for a loaded CI machine; typical latencies are ~10 ms
+MAX_LATENCY = 1.0
+
+
+def write_product(directory, eventName, timeFolder, mag=5.3):
+    folder = os.path.join(directory, eventName, eventName[0:2], timeFolder)
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, "eqxml.xml"), "w") as f:
+        f.write(EQXML % {"id": eventName[2:], "mag": mag})
+    return folder
+
+
+def start(directory, **kwargs):
+    productQueue = queue.Queue()
+    stop = threading.Event()
+    thread = threading.Thread(target=pdlwatch.ingest_products,
+                              args=(directory, productQueue),
+                              kwargs=dict(stop=stop, **kwargs), daemon=True)
+    thread.start()
+    return productQueue, stop, thread
+
+
+def test_existing_products_are_ingested_once(tmpdir):
+    directory = str(tmpdir)
+    write_product(directory, "ak0001", "1386434650000")
+    folder = write_product(directory, "ak0002", "1386434650000")
+    open(os.path.join(folder, pdlwatch.MARKER_FILE), "w").close()
+
+    productQueue, stop, thread = start(directory)
+    attributeDic = productQueue.get(timeout=10)
+    assert attributeDic["eventName"] == "ak0001"
+    assert attributeDic["Magnitude"] == 5.3
+    with pytest.raises(queue.Empty):
+        productQueue.get(timeout=0.5)
+    stop.set()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_inotify_latency(tmpdir):
+    try:
+        pdlwatch.Inotify().close()
+    except (OSError, AttributeError):
+        pytest.skip("inotify not available")
+
+    directory = str(tmpdir)
+    productQueue, stop, thread = start(directory)
+    time.sleep(0.2)
+
+    latencies = []
+    for ii in range(20):
+        eventName = "ak%04d" % ii
+        t0 = time.perf_counter()
+        folder = write_product(directory, eventName, "13864346%05d" % ii,
+                               mag=4.0 + ii*0.1)
+        attributeDic = productQueue.get(timeout=10)
+        latencies.append(time.perf_counter() - t0)
+        assert attributeDic["eventName"] == eventName
+        assert os.path.isfile(os.path.join(folder, pdlwatch.MARKER_FILE))
+    stop.set()
+    thread.join(timeout=5)
+
+    print("median latency %.1f ms" % (1e3*np.median(latencies)))
+    assert np.median(latencies) < MAX_LATENCY
+
+
+def test_glob_fallback(tmpdir):
+    directory = str(tmpdir)
+    productQueue, stop, thread = start(directory, useInotify=False, poll=0.05)
+    write_product(directory, "ak0003", "1386434650000")
+    attributeDic = productQueue.get(timeout=10)
+    assert attributeDic["eventName"] == "ak0003"
+    stop.set()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
+
+
+def test_bad_product_does_not_stop_ingestion(tmpdir, monkeypatch):
+    read_product_folder = pdlwatch.read_product_folder
+
+    def read(timeFolder, eventName, **kwargs):
+        if eventName == "ak0004":
+            # e.g. the KeyError read_quakeml raises without an agencyID
+            raise KeyError("agencyID")
+        return read_product_folder(timeFolder, eventName, **kwargs)
+
+    monkeypatch.setattr(pdlwatch, "read_product_folder", read)
+    directory = str(tmpdir)
+    productQueue, stop, thread = start(directory, poll=0.05)
+    time.sleep(0.2)
+    bad = write_product(directory, "ak0004", "1386434650000")
+    time.sleep(0.2)
+    write_product(directory, "ak0005", "1386434650000")
+    attributeDic = productQueue.get(timeout=10)
+    assert attributeDic["eventName"] == "ak0005"
+    assert os.path.isfile(os.path.join(bad, pdlwatch.MARKER_FILE))
+    assert thread.is_alive()
+    stop.set()
+    thread.join(timeout=5)
+
+
+def test_glob_when_a_watch_cannot_be_added(tmpdir, monkeypatch):
+    try:
+        pdlwatch.Inotify().close()
+    except (OSError, AttributeError):
+        pytest.skip("inotify not available")
+
+    def add_watch(self, path, mask):
+        raise OSError(28, os.strerror(28), path)
+
+    monkeypatch.setattr(pdlwatch.Inotify, "add_watch", add_watch)
+    directory = str(tmpdir)
+    productQueue, stop, thread = start(directory, poll=0.05)
+    write_product(directory, "ak0006", "1386434650000")
+    attributeDic = productQueue.get(timeout=10)
+    assert attributeDic["eventName"] == "ak0006"
+    stop.set()
+    thread.join(timeout=5)
+    assert not thread.is_alive()
@@ -0,0 +1,118 @@
+# check seismon_predictd answers match local predictions
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from seismon import eqmon, predictd
+
+event = {"Magnitude": 6.5, "Latitude": 10.0, "Longitude": 120.0,
+         "Depth": 30.0, "GPS": 1e9, "eventID": "test"}
+
+
+@pytest.fixture
+def socketFile(tmpdir):
+    socketFile = str(tmpdir.join('predictd.sock'))
+    server = predictd.PredictdServer(socketFile, predictd.PredictdHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield socketFile
+    server.shutdown()
+    server.server_close()
+
+
+def assert_same(traveltimes, expected):
+    assert sorted(traveltimes) == sorted(expected)
+    for key in expected:
+        assert type(traveltimes[key]) == type(expected[key])
+        np.testing.assert_array_equal(traveltimes[key], expected[key])
+
+
+def test_client_matches_local(socketFile):
+    assert predictd.request({"method": "ping"}, socketFile) == "pong"
+
+    local = eqmon.calculate_traveltimes(dict(event))
+    remote = eqmon.calculate_traveltimes(dict(event), client=True,
+                                         socketFile=socketFile)
+    assert_same(remote["traveltimes"]["Arbitrary"],
+                local["traveltimes"]["Arbitrary"])
+
+    result = predictd.request({"method": "loc", "event": event,
+                               "ifos": ["LHO"]}, socketFile)
+    local = eqmon.eqmon_loc(local, "LHO")
+    assert_same(result["LHO"], local["traveltimes"]["LHO"])
+
+
+def test_errors(socketFile):
+    with pytest.raises(RuntimeError):
+        predictd.request({"method": "nonsense", "event": event}, socketFile)
+
+
+def test_fallback_without_daemon(tmpdir):
+    socketFile = str(tmpdir.join('missing.sock'))
+    local = eqmon.calculate_traveltimes(dict(event))
+    fallback = eqmon.calculate_traveltimes(dict(event), client=True,
+                                           socketFile=socketFile)
+    assert_same(fallback["traveltimes"]["Arbitrary"],
+                local["traveltimes"]["Arbitrary"])
+
+
+def test_pred_forwarded(socketFile):
+    local = eqmon.calculate_traveltimes(dict(event), pred=False)
+    remote = eqmon.calculate_traveltimes(dict(event), pred=False, client=True,
+                                         socketFile=socketFile)
+    assert_same(remote["traveltimes"]["Arbitrary"],
+                local["traveltimes"]["Arbitrary"])
+
+
+def test_fallback_on_daemon_error(socketFile, monkeypatch):
+    def fail(request):
+        raise RuntimeError("broken")
+    monkeypatch.setattr(predictd, "handle", fail)
+
+    local = eqmon.calculate_traveltimes(dict(event))
+    fallback = eqmon.calculate_traveltimes(dict(event), client=True,
+                                           socketFile=socketFile)
+    assert_same(fallback["traveltimes"]["Arbitrary"],
+                local["traveltimes"]["Arbitrary"])
+
+
+def test_use_predictd(socketFile, monkeypatch):
+    requests = []
+    request = predictd.request
+    monkeypatch.setattr(predictd, "request",
+                        lambda message, socketFile=None: requests.append(socketFile) or request(message, socketFile))
+    try:
+        eqmon.use_predictd({"doPredictd": True, "predictdSocket": socketFile})
+        eqmon.calculate_traveltimes(dict(event))
+    finally:
+        eqmon.use_predictd({})
+    eqmon.calculate_traveltimes(dict(event))
+    assert requests == [socketFile]
+
+
+def test_socket_is_private(socketFile):
+    assert os.stat(socketFile).st_mode & 0o077 == 0
+
+
+def test_socket_of_another_user_is_refused(socketFile, monkeypatch):
+    monkeypatch.setattr(predictd.os, 'getuid', lambda: os.stat(socketFile).st_uid + 1)
+    with pytest.raises(OSError):
+        predictd.request({"method": "ping"}, socketFile)
+    # and calculate_traveltimes falls back to computing locally
+    local = eqmon.calculate_traveltimes(dict(event))
+    fallback = eqmon.calculate_traveltimes(dict(event), client=True,
+                                           socketFile=socketFile)
+    assert_same(fallback["traveltimes"]["Arbitrary"],
+                local["traveltimes"]["Arbitrary"])
+
+
+def test_default_socket_is_per_user(monkeypatch, tmpdir):
+    monkeypatch.delenv("SEISMON_PREDICTD_SOCKET", raising=False)
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmpdir))
+    assert predictd.default_socket_file() == str(tmpdir.join("seismon_predictd.sock"))
+    monkeypatch.delenv("XDG_RUNTIME_DIR")
+    monkeypatch.setenv("HOME", str(tmpdir))
+    assert predictd.default_socket_file().startswith(str(tmpdir.join(".cache")))
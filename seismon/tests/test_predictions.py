@@ -0,0 +1,42 @@
+# check the in-memory prediction entry point and its opt-in debug files
+import os
+
+import numpy as np
+import pandas as pd
+
+from seismon import eqmon
+
+seismonpath = os.path.dirname(eqmon.__file__)
+trainFile = os.path.join(seismonpath, 'input',
+                         'LHO_processed_USGS_global_EQ_catalogue.csv')
+
+
+def test_prediction_in_memory(tmpdir):
+    tmpdir.chdir()
+    prediction = eqmon.makePredictions(trainFile, 6.5, 10.0, 120.0,
+                                       1e6, 30.0, 0.0,
+                                       siteLat=46.6475, siteLon=-119.5986)
+
+    trainData = eqmon.load_catalogue(trainFile)
+    expected = eqmon.make_prediction(trainData, 10.0, 120.0, 6.5, 30.0,
+                                     46.6475, -119.5986, 0.1,
+                                     'peak_data_um_mean_subtracted', 10*1e-6)
+    assert prediction == expected[:4]
+    assert tmpdir.listdir() == []
+
+
+def test_prediction_debug_files(tmpdir):
+    testFile = str(tmpdir.join('test.csv'))
+    predictionFile = str(tmpdir.join('prediction.csv'))
+    prediction = eqmon.makePredictions(trainFile, 6.5, 10.0, 120.0,
+                                       1e6, 30.0, 0.0,
+                                       siteLat=46.6475, siteLon=-119.5986,
+                                       testFile=testFile,
+                                       predictionFile=predictionFile)
+
+    features = pd.read_csv(testFile)
+    assert features['mag'][0] == 6.5
+    assert features['depth'][0] == 30.0
+    written = pd.read_csv(predictionFile)
+    np.testing.assert_allclose(written['Rfamp'][0], prediction[0])
+    assert written['Lockloss'][0] == prediction[1]
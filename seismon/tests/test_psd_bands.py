@@ -0,0 +1,75 @@
+# check that the vectorized band amplitude matches the per-bin running
+# mean loop loadChannelPSD used, bit for bit
+import numpy as np
+import pytest
+
+from seismon import eqmon
+
+FF_AVE = [1/float(128), 1/float(64),  0.1, 1, 3, 5, 10]
+
+
+def legacy_amplitudes(freq, spectra, ff_ave):
+    amp = []
+    for thisSpectra_out in spectra:
+        freqAmps = []
+        for i in range(len(ff_ave)-1):
+            newSpectraNow = []
+            for j in range(len(freq)):
+                if ff_ave[i] <= freq[j] and freq[j] <= ff_ave[i+1]:
+                    newSpectraNow.append(thisSpectra_out[j])
+                    freqAmps.append(np.mean(newSpectraNow))
+        amp.append(freqAmps[1])
+    return np.array(amp)
+
+
+@pytest.mark.parametrize("freq", [
+    np.arange(0, 8 + 1/64., 1/64.),      # band edges fall on bins
+    np.arange(0, 16 + 1/256., 1/256.),   # several bins in the first band
+    np.linspace(0, 16, 129),             # first two bands empty
+    np.array([0.2, 0.5, 2.0]),
+    np.array([0.5, 2.0, 4.0]),
+])
+def test_matches_legacy(freq):
+    rng = np.random.RandomState(0)
+    spectra = 10**rng.uniform(-9, -6, size=(40, len(freq)))
+    amp = eqmon.psd_band_amplitudes(freq, spectra, FF_AVE)
+    assert np.array_equal(amp, legacy_amplitudes(freq, spectra, FF_AVE))
+
+
+def test_random_grids():
+    rng = np.random.RandomState(1)
+    for ii in range(200):
+        freq = np.sort(rng.choice(np.concatenate([FF_AVE, rng.uniform(0, 12, 50)]),
+                                  size=rng.randint(2, 20), replace=False))
+        spectra = 10**rng.uniform(-9, -6, size=(5, len(freq)))
+        try:
+            expected = legacy_amplitudes(freq, spectra, FF_AVE)
+        except IndexError:
+            with pytest.raises(IndexError):
+                eqmon.psd_band_amplitudes(freq, spectra, FF_AVE)
+            continue
+        assert np.array_equal(eqmon.psd_band_amplitudes(freq, spectra, FF_AVE), expected)
+
+
+def test_no_segments():
+    amp = eqmon.psd_band_amplitudes(np.arange(10.0), np.zeros((0, 10)), FF_AVE)
+    assert len(amp) == 0
+
+
+@pytest.mark.parametrize("freq", [
+    np.arange(0, 8 + 1/64., 1/64.),
+    np.linspace(0, 16, 129),
+    np.array([0.2, 0.5, 2.0]),
+])
+def test_band_means(freq):
+    rng = np.random.RandomState(2)
+    spectra = 10**rng.uniform(-9, -6, size=(7, len(freq)))
+    means = eqmon.psd_band_means(freq, spectra, FF_AVE)
+    assert means.shape == (7, len(FF_AVE)-1)
+    for i in range(len(FF_AVE)-1):
+        # a bin on an edge counts in both bands, as in viz.psd_plot
+        inBand = (FF_AVE[i] <= freq) & (freq <= FF_AVE[i+1])
+        if np.any(inBand):
+            np.testing.assert_allclose(means[:, i], np.mean(spectra[:, inBand], axis=1), rtol=1e-12)
+        else:
+            assert np.all(np.isnan(means[:, i]))
@@ -0,0 +1,164 @@
+# check that percentiles from merged hourly and daily PSD rollups match
+# the full computation over the raw spectra to within one histogram bin
+from collections import namedtuple
+
+import numpy as np
+
+from seismon import psdrollup, psdstore
+
+Channel = namedtuple("Channel", ["station_underscore"])
+CHANNEL = Channel("H1_ISI-GND_STS_ITMY_Z_DQ")
+GPS_START = 1200009600 // 86400 * 86400
+PERCENTS = [1, 10, 50, 90, 99]
+
+
+def make_spectra(numSegments=3*144, duration=600):
+    rng = np.random.RandomState(0)
+    freq = np.linspace(0.01, 16, 65)
+    ttStart = GPS_START + duration*np.arange(numSegments)
+    # log-normal around a falling background, with a quiet and a loud channel edge
+    logSpectra = -7 - np.log10(freq)[np.newaxis, :]/2 + 0.5*rng.normal(size=(numSegments, len(freq)))
+    return ttStart, freq, 10**logSpectra
+
+
+def bin_of(values):
+    return np.searchsorted(psdrollup.BIN_EDGES, np.log10(values), side="right") - 1
+
+
+def test_percentiles_match_spectra(tmpdir):
+    dirPath = str(tmpdir)
+    ttStart, freq, spectra = make_spectra()
+    # as save_data does, one segment at a time
+    for start, spectrum in zip(ttStart, spectra):
+        psdrollup.update_rollups(dirPath, CHANNEL.station_underscore, 64, [start], freq, [spectrum])
+
+    # a range of whole hours covering a full day and parts of two others
+    gpsStart, gpsEnd = GPS_START + 20*3600, GPS_START + 2*86400 + 5*3600
+    rollup = psdrollup.read_rollups(dirPath, CHANNEL.station_underscore, 64, gpsStart, gpsEnd)
+    keep = (ttStart >= gpsStart) & (ttStart < gpsEnd)
+    assert rollup["count"] == np.sum(keep)
+    assert np.array_equal(rollup["ttStart"], ttStart[keep])
+
+    expected = np.percentile(spectra[keep], PERCENTS, axis=0)
+    values = psdrollup.percentiles(rollup, PERCENTS)
+    assert np.all(np.abs(bin_of(values) - bin_of(expected)) <= 1)
+
+    mean, std = psdrollup.mean_std(rollup)
+    assert np.allclose(mean, np.mean(spectra[keep], axis=0))
+    assert np.allclose(std, np.std(spectra[keep], axis=0))
+
+    edges, variance = psdrollup.spectral_variance(rollup)
+    assert variance.shape == (len(freq), len(edges)-1)
+    assert np.allclose(np.sum(variance, axis=1), 100.0)
+
+
+def test_merge_and_repeats(tmpdir):
+    dirPath = str(tmpdir)
+    ttStart, freq, spectra = make_spectra(numSegments=48)
+    psdrollup.update_rollups(dirPath, CHANNEL.station_underscore, 64, ttStart, freq, spectra)
+    before = psdrollup.read_rollups(dirPath, CHANNEL.station_underscore, 64, GPS_START, GPS_START+86400)
+
+    # saving segments again does not count them twice
+    psdrollup.update_rollups(dirPath, CHANNEL.station_underscore, 64, ttStart[:10], freq, spectra[:10])
+    after = psdrollup.read_rollups(dirPath, CHANNEL.station_underscore, 64, GPS_START, GPS_START+86400)
+    assert after["count"] == before["count"] == 48
+    assert np.array_equal(after["hist"], before["hist"])
+
+    # the daily rollup is the merge of its hourly ones
+    hourly = psdrollup.read_rollups(dirPath, CHANNEL.station_underscore, 64, GPS_START, GPS_START+8*3600)
+    whole = psdrollup.empty_rollup(GPS_START, GPS_START+86400, freq)
+    psdrollup.add_spectra(whole, ttStart, spectra)
+    assert np.array_equal(hourly["hist"], whole["hist"])
+    assert np.allclose(hourly["sum"], whole["sum"])
+
+
+def test_rebuild_from_store(tmpdir):
+    params = {"dirPath": str(tmpdir), "fftDuration": 64, "psdStorage": "text"}
+    ttStart, freq, spectra = make_spectra(numSegments=30)
+    store = psdstore.psd_store(params, CHANNEL)
+    for start, spectrum in zip(ttStart, spectra):
+        store.write(start, start+600, freq, spectrum)
+
+    assert psdrollup.rebuild_rollups(params, CHANNEL, batch=7) == 30
+    rollup = psdrollup.read_rollups(str(tmpdir), CHANNEL.station_underscore, 64, GPS_START, GPS_START+86400)
+    storeStart, storeEnd, storeFreq, storeSpectra = store.read_segments()
+    expected = psdrollup.empty_rollup(GPS_START, GPS_START+86400, storeFreq)
+    psdrollup.add_spectra(expected, storeStart, storeSpectra)
+    assert rollup["count"] == 30
+    assert np.array_equal(rollup["hist"], expected["hist"])
+
+
+def test_out_of_range_amplitudes(tmpdir):
+    ttStart, freq, spectra = make_spectra(numSegments=40)
+    spectra[:5, 0] = 0.0
+    spectra[5:8, 0] = 1e-20
+    spectra[8:10, 0] = 1e6
+    spectra[10, 0] = np.nan
+    rollup = psdrollup.empty_rollup(GPS_START, GPS_START+86400, freq)
+    psdrollup.add_spectra(rollup, ttStart, spectra)
+    assert (rollup["underflow"][0], rollup["overflow"][0], rollup["nan"][0]) == (8, 2, 1)
+    assert np.sum(rollup["hist"][0]) == 40 - 11
+    assert np.sum(rollup["hist"][1:]) == 40*(len(freq)-1)
+
+    # percentiles and spectral variance rank only the amplitudes in the bins
+    inRange = spectra[11:, 0]
+    values = psdrollup.percentiles(rollup, PERCENTS)
+    assert np.all(np.abs(bin_of(values[:, 0]) - bin_of(np.percentile(inRange, PERCENTS))) <= 1)
+    edges, variance = psdrollup.spectral_variance(rollup)
+    assert np.allclose(np.sum(variance, axis=1), 100.0)
+    mean, std = psdrollup.mean_std(rollup)
+    assert np.isclose(mean[0], np.nanmean(spectra[:, 0]))
+
+    # the counts survive a save, and older rollups without them still load
+    file = str(tmpdir.join("rollup.npz"))
+    psdrollup.save_rollup(file, rollup)
+    assert np.array_equal(psdrollup.load_rollup(file)["underflow"], rollup["underflow"])
+    old = dict((key, value) for key, value in rollup.items()
+               if key not in ["underflow", "overflow", "nan"])
+    psdrollup.save_rollup(file, old)
+    assert np.all(psdrollup.load_rollup(file)["nan"] == 0)
+
+
+def test_mixed_frequency_grids(tmpdir):
+    dirPath = str(tmpdir)
+    ttStart, freq, spectra = make_spectra(numSegments=12, duration=3600)
+    otherFreq = np.linspace(0.01, 32, 129)
+    psdrollup.update_rollups(dirPath, CHANNEL.station_underscore, 64, ttStart[:6], freq, spectra[:6])
+    # a segment on another grid in a period already rolled up is skipped
+    psdrollup.update_rollups(dirPath, CHANNEL.station_underscore, 64, ttStart[5:6] + 600,
+                             otherFreq, np.ones((1, len(otherFreq))))
+    psdrollup.update_rollups(dirPath, CHANNEL.station_underscore, 64, ttStart[6:], otherFreq,
+                             np.ones((6, len(otherFreq))))
+
+    # only the rollups on the grid of the latest hour are merged
+    rollup = psdrollup.read_rollups(dirPath, CHANNEL.station_underscore, 64, GPS_START, GPS_START+12*3600)
+    assert np.array_equal(rollup["freq"], otherFreq)
+    assert np.array_equal(rollup["ttStart"], ttStart[6:])
+
+
+def test_fraction_below_matches_rank(tmpdir):
+    ttStart, freq, spectra = make_spectra(numSegments=200)
+    rollup = psdrollup.empty_rollup(GPS_START, GPS_START+86400, freq)
+    psdrollup.add_spectra(rollup, ttStart[1:], spectra[1:])
+    now = spectra[0]
+    fraction = psdrollup.fraction_below(rollup, now)
+    expected = np.mean(spectra[1:] < now, axis=0)
+    # within the share of the segments in the same bin as now
+    inBin = np.mean(bin_of(spectra[1:]) == bin_of(now), axis=0)
+    assert np.all(np.abs(fraction - expected) <= inBin/2 + 1e-12)
+    # beyond the bins on either side
+    assert np.all(psdrollup.fraction_below(rollup, np.zeros(len(freq))) == 0.0)
+    assert np.all(psdrollup.fraction_below(rollup, 1e6*np.ones(len(freq))) == 1.0)
+
+
+def test_saved_rollups_keep_used_bins_only(tmpdir):
+    ttStart, freq, spectra = make_spectra(numSegments=24)
+    rollup = psdrollup.empty_rollup(GPS_START, GPS_START+86400, freq)
+    psdrollup.add_spectra(rollup, ttStart, spectra)
+    file = str(tmpdir.join("rollup.npz"))
+    psdrollup.save_rollup(file, rollup)
+    with np.load(file) as data:
+        assert data["hist"].shape[1] < len(psdrollup.BIN_EDGES)-1
+    loaded = psdrollup.load_rollup(file)
+    assert np.array_equal(loaded["hist"], rollup["hist"])
+    assert "histStart" not in loaded
@@ -0,0 +1,112 @@
+# check that the text and HDF5 PSD stores hold the same segments and
+# that loadChannelPSD reads the same from either
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+from seismon import eqmon, psdstore
+
+h5py = pytest.importorskip("h5py")
+
+Channel = namedtuple("Channel", ["station_underscore"])
+CHANNEL = Channel("H1_ISI-GND_STS_ITMY_Z_DQ")
+
+
+def fill(store, numSegments=50):
+    rng = np.random.RandomState(0)
+    freq = np.linspace(0, 16, 129)
+    spectra = 10**rng.uniform(-9, -6, size=(numSegments, len(freq)))
+    order = rng.permutation(numSegments)
+    for ii in order:
+        store.write(1200000000 + 64*ii, 1200000064 + 64*ii, freq, spectra[ii])
+    return freq, spectra
+
+
+@pytest.mark.parametrize("storage", psdstore.STORAGE_TYPES)
+def test_round_trip(tmpdir, storage):
+    params = {"dirPath": str(tmpdir), "fftDuration": 64, "psdStorage": storage}
+    store = psdstore.psd_store(params, CHANNEL)
+    freq, spectra = fill(store)
+
+    ttStart, ttEnd = store.segments()
+    assert np.array_equal(ttStart, 1200000000 + 64*np.arange(50))
+    assert np.array_equal(ttEnd, ttStart + 64)
+
+    ttStart, ttEnd, freqOut, spectraOut = store.read_segments(1200000640, 1200001280)
+    assert np.array_equal(ttStart, 1200000000 + 64*np.arange(10, 20))
+    assert np.allclose(freqOut, freq, rtol=1e-5)
+    assert np.allclose(spectraOut, spectra[10:20], rtol=1e-5)
+    assert len(store.read_segments(count=7)[0]) == 7
+
+    freqOut, spectrum = store.read(1200000064, 1200000128)
+    assert np.allclose(spectrum, spectra[1], rtol=1e-5)
+    assert store.read(1200000001, 1200000065) is None
+
+    # rewriting a segment replaces it
+    store.write(1200000064, 1200000128, freq, np.ones(len(freq)))
+    assert len(store.segments()[0]) == 50
+    assert np.allclose(store.read(1200000064, 1200000128)[1], 1.0)
+
+
+def test_empty(tmpdir):
+    for storage in psdstore.STORAGE_TYPES:
+        params = {"dirPath": str(tmpdir), "fftDuration": 64, "psdStorage": storage}
+        store = psdstore.psd_store(params, CHANNEL)
+        assert len(store.segments()[0]) == 0
+        assert store.read_segments()[3].shape[0] == 0
+        assert store.read(1200000000, 1200000064) is None
+
+
+@pytest.mark.parametrize("storage", psdstore.STORAGE_TYPES)
+def test_mixed_frequency_grids(tmpdir, storage):
+    params = {"dirPath": str(tmpdir), "fftDuration": 64, "psdStorage": storage}
+    store = psdstore.psd_store(params, CHANNEL)
+    # the sample rate changes after 5 segments, and back for the last 2
+    freqs = [np.linspace(0, 16, 33), np.linspace(0, 32, 65)]
+    grids = [0]*5 + [1]*5 + [0]*2
+    for ii, grid in enumerate(grids):
+        store.write(64*ii, 64*(ii+1), freqs[grid], np.full(len(freqs[grid]), ii + 1.0))
+    assert len(store.segments()[0]) == 12
+
+    # the segments on the grid of the latest one selected, each paired
+    # with its own spectrum
+    ttStart, ttEnd, freq, spectra = store.read_segments()
+    assert np.allclose(freq, freqs[0])
+    assert np.array_equal(ttStart, 64*np.array([0, 1, 2, 3, 4, 10, 11]))
+    assert np.allclose(spectra[:, 0], ttStart/64 + 1.0)
+    ttStart, ttEnd, freq, spectra = store.read_segments(0, 64*10)
+    assert np.allclose(freq, freqs[1])
+    assert np.array_equal(ttStart, 64*np.arange(5, 10))
+    assert np.allclose(spectra[:, -1], ttStart/64 + 1.0)
+
+    freq, spectrum = store.read(64*6, 64*7)
+    assert len(freq) == len(spectrum) == 65
+    # rewriting a segment on another grid replaces it
+    store.write(64*6, 64*7, freqs[0], np.zeros(33))
+    freq, spectrum = store.read(64*6, 64*7)
+    assert len(freq) == len(spectrum) == 33
+    assert len(store.segments()[0]) == 12
+
+    hdf5Store = psdstore.psd_store(params, CHANNEL, storage="hdf5" if storage == "text" else "text")
+    assert psdstore.migrate_store(store, hdf5Store, batch=4) == 12
+    for x, y in zip(store.read_segments(), hdf5Store.read_segments()):
+        assert np.allclose(x, y, rtol=1e-5)
+
+
+def test_migrate_and_loadChannelPSD(tmpdir):
+    params = {"dirPath": str(tmpdir), "fftDuration": 64, "psdStorage": "text"}
+    fill(psdstore.psd_store(params, CHANNEL))
+    assert psdstore.text_stores(str(tmpdir)) == [(CHANNEL.station_underscore, "64")]
+
+    textStore = psdstore.psd_store(params, CHANNEL)
+    hdf5Store = psdstore.psd_store(params, CHANNEL, storage="hdf5")
+    assert psdstore.migrate_store(textStore, hdf5Store, batch=16) == 50
+
+    segment = [1200000320, 1200002560]
+    text = eqmon.loadChannelPSD(params, CHANNEL, segment)
+    params["psdStorage"] = "hdf5"
+    hdf5 = eqmon.loadChannelPSD(params, CHANNEL, segment)
+    assert len(text["data"]) == 35
+    for key in ["ttStart", "ttEnd", "data"]:
+        assert np.array_equal(text[key], hdf5[key])
@@ -0,0 +1,39 @@
+# check the vectorized geodesic forward solver against the scalar shoot()
+import numpy as np
+from obspy.geodetics.base import gps2dist_azimuth
+
+from seismon import eqmon
+
+
+def test_shoot_array_matches_shoot():
+    rng = np.random.RandomState(0)
+    num = 500
+    lon = rng.uniform(-180, 180, num)
+    lat = rng.uniform(-89, 89, num)
+    azimuth = rng.uniform(0, 360, num)
+    distance = rng.uniform(0, 20000, num)
+    # pure N-S and E-W courses take the cf == 0 / sf == 0 branches
+    azimuth[:30] = rng.choice([0.0, 90.0, 180.0, 270.0], 30)
+
+    lons, lats, bazs = eqmon.shoot_array(lon, lat, azimuth, distance)
+    for ii in range(num):
+        glon2, glat2, baz = eqmon.shoot(lon[ii], lat[ii], azimuth[ii],
+                                        distance[ii])
+        # sub-metre agreement on the end point
+        assert gps2dist_azimuth(glat2, glon2, lats[ii], lons[ii])[0] < 1.0
+        np.testing.assert_allclose(bazs[ii], baz, atol=1e-9)
+
+
+def test_shoot_array_broadcasts():
+    distances = np.linspace(0, 10000, 25)
+    lons, lats, bazs = eqmon.shoot_array(139.0, 35.0, 45.0, distances)
+    assert lons.shape == lats.shape == bazs.shape == (25,)
+
+
+def test_equi():
+    X, Y = eqmon.equi(lambda x, y: (x, y), -90.7483, 30.4986, 1000.0)
+    assert len(X) == len(Y) == 361
+    assert X[0] == X[-1] and Y[0] == Y[-1]
+    for azimuth in [0, 90, 211]:
+        glon2, glat2, baz = eqmon.shoot(-90.7483, 30.4986, azimuth, 1000.0)
+        assert gps2dist_azimuth(glat2, glon2, Y[azimuth], X[azimuth])[0] < 1.0
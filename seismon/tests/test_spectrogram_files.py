@@ -0,0 +1,60 @@
+# check the spectrogram writers: the text table matches the original
+# cell-by-cell writer byte for byte, and both formats read back
+import os
+
+import numpy as np
+import pytest
+
+from seismon import psdstore
+
+
+def legacy_text(file, times, freq, values):
+    f = open(file, "w")
+    f.write("-1")
+    for jj in range(len(times)):
+        f.write(" %.10f " % times[jj])
+    f.write("\n")
+    for ii in range(len(freq)):
+        f.write("%.10f" % freq[ii])
+        for jj in range(len(times)):
+            f.write(" %e " % (values[jj, ii]))
+        f.write("\n")
+    f.close()
+
+
+def spectrogram():
+    rng = np.random.RandomState(0)
+    times = 1200000000 + 64.0*np.arange(30)
+    freq = np.linspace(0, 8, 17)
+    return times, freq, 10**rng.uniform(-9, -6, size=(len(times), len(freq)))
+
+
+def test_text_matches_legacy(tmpdir):
+    times, freq, values = spectrogram()
+    legacy_text(str(tmpdir.join("legacy.txt")), times, freq, values)
+    file = psdstore.write_spectrogram(str(tmpdir), 1200000000, 1200001920, times, freq, values)
+    assert file == str(tmpdir.join("1200000000-1200001920.txt"))
+    assert open(file).read() == open(str(tmpdir.join("legacy.txt"))).read()
+
+    timesOut, freqOut, valuesOut = psdstore.read_spectrogram(file)
+    assert np.allclose(timesOut, times)
+    assert np.allclose(freqOut, freq)
+    assert np.allclose(valuesOut, values, rtol=1e-6)
+
+
+def test_binary_round_trip(tmpdir):
+    times, freq, values = spectrogram()
+    file = psdstore.write_spectrogram(str(tmpdir), 1200000000, 1200001920, times, freq, values,
+                                      spectrogramFormat="binary")
+    assert sorted(os.listdir(str(tmpdir))) == ["1200000000-1200001920.json", "1200000000-1200001920.npy"]
+
+    timesOut, freqOut, valuesOut = psdstore.read_spectrogram(file)
+    assert np.array_equal(timesOut, times)
+    assert np.array_equal(freqOut, freq)
+    assert np.array_equal(valuesOut, values)
+
+
+def test_unknown_format(tmpdir):
+    times, freq, values = spectrogram()
+    with pytest.raises(ValueError):
+        psdstore.write_spectrogram(str(tmpdir), 0, 1, times, freq, values, spectrogramFormat="csv")
@@ -0,0 +1,145 @@
+# check that compacting Text_Files into per-day archives keeps every file
+# byte for byte and that the loaders read the same before and after
+import os
+from collections import namedtuple
+
+import numpy as np
+import pytest
+
+from seismon import eqmon, psdstore, textarchive
+
+Channel = namedtuple("Channel", ["station_underscore"])
+CHANNEL = Channel("H1_ISI-GND_STS_ITMY_Z_DQ")
+DAY = 1200009600 // 86400
+
+
+def write_text(file, text):
+    os.makedirs(os.path.dirname(file), exist_ok=True)
+    with open(file, "w") as f:
+        f.write(text)
+
+
+def fill(dirPath, numSegments=100):
+    rng = np.random.RandomState(0)
+    files = {}
+    timeseriesDirectory = os.path.join(dirPath, "Text_Files", "Timeseries", CHANNEL.station_underscore, "64")
+    # 100 segments of 1800 s cross into the next two days
+    for ii in range(numSegments):
+        gpsStart = DAY*86400 + 1800*ii
+        values = rng.uniform(size=4)
+        file = os.path.join(timeseriesDirectory, "%d-%d.txt" % (gpsStart, gpsStart+1800))
+        files[file] = "%.1f %e\n%.1f %e\n" % (gpsStart, values[0], gpsStart+values[1], values[2])
+    tripsDirectory = os.path.join(dirPath, "Text_Files", "Trips", CHANNEL.station_underscore, "64", "ITMX", "ST1")
+    for ii in range(5):
+        file = os.path.join(tripsDirectory, "%d.txt" % (DAY*86400 + 1000*ii))
+        files[file] = "%d %e\n" % (DAY*86400 + 1000*ii, rng.uniform())
+    for file, text in files.items():
+        write_text(file, text)
+    return files
+
+
+def test_round_trip(tmpdir):
+    dirPath = str(tmpdir)
+    files = fill(dirPath)
+    params = {"dirPath": dirPath, "fftDuration": 64}
+    segment = [DAY*86400, (DAY+3)*86400]
+    timeseries = eqmon.loadChannelTimeseries(params, CHANNEL, segment)
+    trips = eqmon.loadChannelTrips(params, CHANNEL)
+
+    # the day still being written stays loose
+    compacted = textarchive.compact_tree(dirPath, DAY+2)
+    assert sum(numFiles for directory, numFiles in compacted) == 96 + 5
+    timeseriesDirectory = os.path.dirname(sorted(files)[0])
+    assert [os.path.basename(file) for file in textarchive.archives(timeseriesDirectory)] == \
+        ["%d-%d.pack" % (day*86400, (day+1)*86400) for day in [DAY, DAY+1]]
+    assert len(os.listdir(timeseriesDirectory)) == 2 + 4
+
+    for file, text in files.items():
+        assert textarchive.isfile(file)
+        assert textarchive.read_file(file) == text.encode()
+    for archiveFile in textarchive.archives(timeseriesDirectory):
+        textarchive.verify_archive(archiveFile)
+    assert textarchive.list_files(timeseriesDirectory) == \
+        sorted(file for file in files if file.startswith(timeseriesDirectory))
+    assert not textarchive.isfile(os.path.join(timeseriesDirectory, "1-2.txt"))
+
+    after = eqmon.loadChannelTimeseries(params, CHANNEL, segment)
+    for key in timeseries:
+        assert np.array_equal(after[key], timeseries[key])
+    after = eqmon.loadChannelTrips(params, CHANNEL)
+    assert np.array_equal(after["ITMX"]["ST1"]["gps"], trips["ITMX"]["ST1"]["gps"])
+    assert np.array_equal(after["ITMX"]["ST1"]["velocity"], trips["ITMX"]["ST1"]["velocity"])
+
+
+def test_late_files_and_rewrites(tmpdir):
+    dirPath = str(tmpdir)
+    files = fill(dirPath)
+    textarchive.compact_tree(dirPath, DAY+1)
+    file = sorted(files)[0]
+    directory = os.path.dirname(file)
+
+    # a rewritten file shadows its archived copy ...
+    write_text(file, "1.0 2.0\n3.0 4.0\n")
+    assert np.array_equal(textarchive.loadtxt(file), [[1.0, 2.0], [3.0, 4.0]])
+    # ... and replaces it when compacted again, next to a late arrival
+    late = os.path.join(directory, "%d-%d.txt" % (DAY*86400 + 86000, DAY*86400 + 86400))
+    write_text(late, "5.0 6.0\n")
+    assert textarchive.compact_directory(directory, DAY+1) == 2
+    assert not os.path.isfile(file)
+    assert textarchive.read_file(file) == b"1.0 2.0\n3.0 4.0\n"
+    assert textarchive.read_file(late) == b"5.0 6.0\n"
+    assert len(textarchive.read_index(textarchive.archive_filename(directory, DAY))) == 48 + 1
+
+
+def test_corrupt_archive(tmpdir):
+    archiveFile = os.path.join(str(tmpdir), "0-86400.pack")
+    textarchive.write_archive(archiveFile, {"a.txt": b"1 2\n", "b.txt": b"3 4\n"})
+    with pytest.raises(ValueError):
+        textarchive.verify_archive(archiveFile, {"a.txt": b"1 3\n"})
+
+    with open(archiveFile, "r+b") as f:
+        f.write(b"9")
+    os.utime(archiveFile, ns=(0, 0))
+    with pytest.raises(ValueError):
+        textarchive.verify_archive(archiveFile)
+
+    with open(archiveFile, "wb") as f:
+        f.write(b"not an archive")
+    with pytest.raises(ValueError):
+        textarchive.read_index(archiveFile)
+
+
+def test_psd_store(tmpdir):
+    params = {"dirPath": str(tmpdir), "fftDuration": 64}
+    store = psdstore.psd_store(params, CHANNEL, storage="text")
+    freq = np.linspace(0, 16, 33)
+    for ii in range(10):
+        store.write(DAY*86400 + 64*ii, DAY*86400 + 64*(ii+1), freq, np.full(len(freq), ii + 1.0))
+    before = store.read_segments()
+
+    textarchive.compact_tree(str(tmpdir), DAY+1, products=["PSD"])
+    assert len(textarchive.archives(store.directory)) == 1
+    after = store.read_segments()
+    for x, y in zip(before, after):
+        assert np.array_equal(x, y)
+    assert np.array_equal(store.read(DAY*86400 + 64, DAY*86400 + 128)[1], np.full(len(freq), 2.0))
+
+
+def test_archives_unmapped(tmpdir, monkeypatch):
+    monkeypatch.setattr(textarchive, "MAX_ARCHIVES", 3)
+    archiveFiles = [textarchive.archive_filename(str(tmpdir), DAY+ii) for ii in range(5)]
+    for ii, archiveFile in enumerate(archiveFiles):
+        textarchive.write_archive(archiveFile, {"a.txt": b"%d\n" % ii})
+    mappings = [textarchive._open_archive(archiveFile)[2] for archiveFile in archiveFiles]
+
+    # the least recently used are unmapped, and reopened when read again
+    assert len(textarchive._ARCHIVES) <= 3
+    assert mappings[0].closed and mappings[1].closed and not mappings[4].closed
+    assert textarchive.read_members(archiveFiles[0]) == {"a.txt": b"0\n"}
+    assert mappings[2].closed
+
+    # a rewritten archive replaces (and unmaps) the old mapping
+    textarchive.write_archive(archiveFiles[4], {"a.txt": b"new\n"})
+    assert textarchive.read_members(archiveFiles[4]) == {"a.txt": b"new\n"}
+    assert mappings[4].closed
+    assert len(textarchive._ARCHIVES) <= 3
@@ -0,0 +1,53 @@
+# check that the batched grid prediction in ifotraveltimes_lookup matches
+# the per-distance makePredictions loop it replaced
+import os
+
+import numpy as np
+import pytest
+
+from seismon import eqmon
+
+seismonpath = os.path.dirname(eqmon.__file__)
+trainFile = os.path.join(seismonpath, 'input',
+                         'LHO_processed_USGS_global_EQ_catalogue.csv')
+
+events = [(10.0, 120.0, 6.5, 30.0),
+          (-33.0, -72.0, 7.1, 1.0),
+          (40.0, 140.0, 5.5, 400.0)]
+
+
+def per_point(attributeDic, distances, ifolat, ifolon):
+    depth = max(attributeDic["Depth"], 2.0)
+    predictions = []
+    for distance in distances:
+        predictions.append(eqmon.makePredictions(
+            trainFile, attributeDic["Magnitude"],
+            attributeDic["Latitude"], attributeDic["Longitude"],
+            distance, depth, 0.0, siteLat=ifolat, siteLon=ifolon))
+    return np.array(predictions).T
+
+
+@pytest.mark.parametrize('event', events)
+@pytest.mark.parametrize('site', [('Arbitrary', 0.0, 0.0),
+                                  ('LHO', 46.6475, -119.5986)])
+def test_lookup_matches_per_point(event, site):
+    ifo, ifolat, ifolon = site
+    lat, lon, mag, depth = event
+    attributeDic = {"Magnitude": mag, "Latitude": lat, "Longitude": lon,
+                    "Depth": depth, "GPS": 1e9, "traveltimes": {}}
+    attributeDic = eqmon.ifotraveltimes_lookup(attributeDic, ifo,
+                                               ifolat, ifolon)
+    traveltimes = attributeDic["traveltimes"][ifo]
+
+    expected = per_point(attributeDic, traveltimes["Distances"],
+                         ifolat, ifolon)
+    for ii, key in enumerate(["Rfamp", "Lockloss", "Rfamp_sigma",
+                              "Lockloss_sigma"]):
+        value = np.asarray(traveltimes[key], dtype=np.float64).ravel()
+        # the batch sums in a different order than the scalar path
+        np.testing.assert_allclose(value, expected[ii], rtol=1e-10)
+
+    # distances and travel times are untouched by the prediction
+    assert len(traveltimes["Ptimes"]) == len(traveltimes["Rtwotimes"])
+    np.testing.assert_array_equal(traveltimes["Rtwotimes"],
+                                  1e9 + traveltimes["Distances"]/2000.0)
@@ -0,0 +1,47 @@
+# check the tabulated travel times against live TauP
+import numpy as np
+from obspy.taup import TauPyModel
+
+from seismon import traveltimes
+
+# Documented accuracy of the shipped iasp91 table (10 km x 1 deg grid,
+# finer at shallow depths and within 10 deg; each phase interpolated on
+# its own, TauP where the first arrival changes branch inside a cell).
+MAX_ERROR = 0.5  # seconds
+
+
+def test_interpolation_reproduces_grid():
+    table = traveltimes.load_table()
+    # the lower left corners of the cells answered from the table
+    ii, jj = np.nonzero(table["Ptrusted"] & table["Strusted"])
+    ptimes, stimes = traveltimes.interpolate(table, table["depths"][ii],
+                                             table["degrees"][jj])
+    np.testing.assert_allclose(ptimes, table["Ptimes"][ii, jj])
+    np.testing.assert_allclose(stimes, table["Stimes"][ii, jj])
+
+
+def check_accuracy(depths, degrees):
+    table = traveltimes.load_table()
+    model = TauPyModel(model=table["model"])
+    ptimes, stimes = traveltimes.interpolate(table, depths, degrees)
+
+    for depth, degree, ptime, stime in zip(depths, degrees, ptimes, stimes):
+        arrivals = model.get_travel_times(source_depth_in_km=depth,
+                                          distance_in_degree=degree)
+        Ptime, Stime = traveltimes.first_arrivals(arrivals)
+        assert abs(ptime - Ptime) < MAX_ERROR
+        assert abs(stime - Stime) < MAX_ERROR
+
+
+def test_table_accuracy():
+    rng = np.random.RandomState(0)
+    check_accuracy(rng.uniform(2, 700, 40), rng.uniform(0, 180, 40))
+
+
+def test_branch_changes():
+    # p / Pn / P near the source, P to Pdiff near 98 deg and Pdiff to
+    # PKIKP near 158 deg, and the sP, S and SKiKP changes of the first s
+    rng = np.random.RandomState(1)
+    degrees = np.concatenate([rng.uniform(0, 3, 8), rng.uniform(96, 100, 4),
+                              rng.uniform(155, 161, 8)])
+    check_accuracy(rng.uniform(2, 100, len(degrees)), degrees)
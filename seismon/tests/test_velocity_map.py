@@ -0,0 +1,55 @@
+# check the resident velocity map tree against a fresh do_kdtree query
+import hashlib
+
+import numpy as np
+
+from seismon import eqmon
+
+
+def write_map(tmpdir):
+    lat, lon = np.meshgrid(np.arange(-89.5, 90, 2.0),
+                           np.arange(0.5, 360, 2.0), indexing='ij')
+    rng = np.random.RandomState(0)
+    velocity_map = np.column_stack((lat.ravel(), lon.ravel(),
+                                    np.ones(lat.size),
+                                    rng.normal(0, 3, lat.size)))
+    velocityFile = str(tmpdir.join('map.pix'))
+    np.savetxt(velocityFile, velocity_map)
+    return velocityFile, velocity_map
+
+
+def test_indexes_match_do_kdtree(tmpdir):
+    velocityFile, velocity_map = write_map(tmpdir)
+    velocityMap = eqmon.load_velocity_map(velocityFile)
+    assert eqmon.load_velocity_map(velocityFile) is velocityMap
+
+    distances = np.linspace(0, 8e6, 1000)
+    lons, lats, bazs = eqmon.shoot_array(120.0, 10.0, 40.0, distances/1000)
+    expected = eqmon.do_kdtree(
+        np.dstack([velocity_map[:, 0], velocity_map[:, 1]])[0],
+        np.dstack([lats, lons]))[0]
+    indexes = eqmon.velocity_map_indexes(velocityMap, lats, lons)
+    np.testing.assert_array_equal(indexes, expected)
+
+
+def test_pickled_tree(tmpdir):
+    velocityFile, velocity_map = write_map(tmpdir)
+    treeCache = tmpdir.mkdir('trees')
+    velocityMap = eqmon.load_velocity_map(velocityFile,
+                                          treeCache=str(treeCache))
+
+    with open(velocityFile, 'rb') as f:
+        sha1 = hashlib.sha1(f.read()).hexdigest()
+    assert treeCache.join('velocitymap_%s.pkl' % sha1).check()
+
+    eqmon._velocity_map_cache.clear()
+    reloaded = eqmon.load_velocity_map(velocityFile,
+                                       treeCache=str(treeCache))
+    assert reloaded is not velocityMap
+    np.testing.assert_array_equal(reloaded["velocity_map"],
+                                  velocityMap["velocity_map"])
+    indexes = eqmon.velocity_map_indexes(reloaded, [10.0, -45.0],
+                                         [120.0, 300.0])
+    np.testing.assert_array_equal(
+        indexes, eqmon.velocity_map_indexes(velocityMap, [10.0, -45.0],
+                                            [120.0, 300.0]))
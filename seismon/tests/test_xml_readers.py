@@ -0,0 +1,121 @@
+# check the streaming QuakeML / EQXML readers against parse_xml
+from lxml import etree
+
+from seismon import eqmon
+
+QUAKEML = """<?xml version="1.0" encoding="UTF-8"?>
+<q:quakeml xmlns="http://quakeml.org/xmlns/bed/1.2"
+           xmlns:q="http://quakeml.org/xmlns/quakeml/1.2">
+  <eventParameters publicID="quakeml:us.anss.org/catalog">
+%s
+  </eventParameters>
+</q:quakeml>
+"""
+
+EVENT = """    <event publicID="quakeml:us.anss.org/event/%(id)s">
+      <type>earthquake</type>
+      <origin>
+        <time><value>%(time)s</value></time>
+        <longitude><value>%(lon)s</value></longitude>
+        <latitude><value>%(lat)s</value></latitude>
+        %(depth)s
+        <evaluationMode>manual</evaluationMode>
+      </origin>
+      <magnitude><mag><value>%(mag)s</value></mag></magnitude>
+      <creationInfo>
+        <agencyID>us</agencyID>
+        <creationTime>2019-07-06T03:25:00.123Z</creationTime>
+        <version>4</version>
+      </creationInfo>
+    </event>"""
+
+EQXML = """<?xml version="1.0" encoding="UTF-8"?>
+<EQMessage xmlns="http://www.usgs.gov/ansseqmsg">
+  <Source>us</Source>
+  <Sent>2019-07-06T03:25:00.123Z</Sent>
+  <Event>
+    <DataSource>us</DataSource>
+    <EventID>38457511</EventID>
+    <Version>3</Version>
+    <Type>Earthquake</Type>
+    <Origin>
+      <Latitude>35.7695</Latitude>
+      <Longitude>-117.5993</Longitude>
+      <Depth>8</Depth>
+      <Time>2019-07-06T03:19:53.040Z</Time>
+      <Status>Reviewed</Status>
+      <Magnitude><Value>7.1</Value></Magnitude>
+    </Origin>
+  </Event>
+</EQMessage>
+"""
+
+events = [{"id": "ci38457511", "time": "2019-07-06T03:19:53.040Z",
+           "lon": "-117.5993", "lat": "35.7695", "mag": "7.1",
+           "depth": "<depth><value>8000</value></depth>"},
+          {"id": "us7000abcd", "time": "2020-01-28T19:10:24.913Z",
+           "lon": "-78.756", "lat": "19.419", "mag": "7.7",
+           "depth": ""}]
+
+
+def write(tmpdir, name, text):
+    filename = str(tmpdir.join(name))
+    with open(filename, 'w') as f:
+        f.write(text)
+    return filename
+
+
+def test_quakeml_fields_match_parse_xml(tmpdir):
+    filename = write(tmpdir, 'quakeml.xml',
+                     QUAKEML % "\n".join(EVENT % event for event in events))
+    streamed = list(eqmon.iterparse_quakeml(filename))
+    assert len(streamed) == len(events)
+
+    root = etree.parse(filename).getroot()
+    for element, event in zip(root.iter(eqmon._QUAKEML_EVENT), streamed):
+        dic = eqmon.parse_xml(element)
+        assert event["time"] == dic["origin"]["time"]["value"]
+        assert event["latitude"] == dic["origin"]["latitude"]["value"]
+        assert event["longitude"] == dic["origin"]["longitude"]["value"]
+        assert event["mag"] == dic["magnitude"]["mag"]["value"]
+        assert event["type"] == dic["type"]
+        assert event["creationTime"] == dic["creationInfo"]["creationTime"]
+        assert event["version"] == dic["creationInfo"]["version"]
+        if "depth" in dic["origin"]:
+            assert event["depth"] == dic["origin"]["depth"]["value"]
+        else:
+            assert event["depth"] is None
+
+
+def test_read_quakeml(tmpdir):
+    filename = write(tmpdir, 'quakeml.xml', QUAKEML % (EVENT % events[0]))
+    attributeDic = eqmon.read_quakeml(filename, "ci38457511")
+    assert attributeDic["Latitude"] == 35.7695
+    assert attributeDic["Longitude"] == -117.5993
+    assert attributeDic["Depth"] == 8.0
+    assert attributeDic["Magnitude"] == 7.1
+    assert attributeDic["Time"] == "2019-07-06T03:19:53.040Z"
+    assert attributeDic["Sent"] == "2019-07-06T03:25:00.123Z"
+    assert attributeDic["DataSource"] == "us"
+    assert attributeDic["Type"] == "earthquake"
+    assert "Arbitrary" in attributeDic["traveltimes"]
+
+
+def test_read_eqxml(tmpdir):
+    filename = write(tmpdir, 'eqxml.xml', EQXML)
+    attributeDic = eqmon.read_eqxml(filename, "ci38457511")
+    assert attributeDic["eventID"] == "38457511"
+    assert attributeDic["Latitude"] == 35.7695
+    assert attributeDic["Depth"] == 8.0
+    assert attributeDic["Magnitude"] == 7.1
+    assert attributeDic["Sent"] == "2019-07-06T03:25:00.123Z"
+    assert attributeDic["DataSource"] == "us"
+    assert attributeDic["Version"] == "3"
+    assert attributeDic["Region"] == "N/A"
+    assert attributeDic["Review"] == "Manual"
+
+    # no magnitude: nothing to report
+    filename = write(tmpdir, 'nomag.xml',
+                     EQXML.replace("<Magnitude><Value>7.1</Value></Magnitude>",
+                                   ""))
+    assert eqmon.read_eqxml(filename, "ci38457511") == {}
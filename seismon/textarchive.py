@@ -0,0 +1,381 @@
+#!/usr/bin/python
+
+"""Per-day archives of the small Text_Files.
+
+Every segment seismon analyses leaves a few-line text file per channel
+in each of Text_Files/PSD, FFT, Timeseries, Acceleration, Displacement,
+Powerlaw, ... and every earthquake one in Earthquakes and EQPowerlaw,
+so a long-running install piles up millions of tiny files.  A completed
+day of them can be packed into one archive per directory (that is, per
+product, station, fftDuration and day):
+
+    <directory>/<dayStart>-<dayEnd>.pack
+
+An archive holds the member files byte for byte, back to back, followed
+by a JSON index of name -> [offset, length, crc32], the index length
+(little-endian uint64) and the magic string SEISPACK, so a reader finds
+the index from the end of the file and reads any member with one slice.
+
+list_files, isfile, read_file and loadtxt stand in for glob, os.path.isfile,
+open and np.loadtxt on the paths the loose files have: a member of an
+archive in <directory> answers to <directory>/<name>.  A loose file
+shadows an archive member of the same name, so files written again after
+compaction win.  Archives are memory-mapped once and their indexes kept
+until the archive changes on disk; the MAX_ARCHIVES most recently used
+stay mapped, and the others are unmapped.
+"""
+
+import os, glob, fnmatch, json, mmap, struct, time, zlib
+import collections
+
+import numpy as np
+
+import seismon.backfill, seismon.gpstime
+
+PRODUCTS = ["PSD", "FFT", "Timeseries", "Acceleration", "Displacement",
+            "Earthquakes", "Powerlaw", "EQPowerlaw", "Trips"]
+
+ARCHIVE_SUFFIX = ".pack"
+MAGIC = b"SEISPACK"
+SECONDS_PER_DAY = 86400
+
+_TRAILER = struct.Struct("<Q8s")
+
+# archives kept mapped (each mapping holds a file descriptor)
+MAX_ARCHIVES = 128
+
+# archive file -> ((inode, mtime_ns, size), index, mapping), least
+# recently used first
+_ARCHIVES = collections.OrderedDict()
+# directory -> (mtime_ns, settled, archive files, member map)
+_DIRECTORIES = {}
+
+def archive_filename(directory,day):
+    """@archive of one GPS day in a directory
+
+    @param directory
+        Text_Files directory
+    @param day
+        GPS day (gps // 86400)
+    """
+
+    return os.path.join(directory,"%d-%d%s"%(day*SECONDS_PER_DAY,(day+1)*SECONDS_PER_DAY,ARCHIVE_SUFFIX))
+
+def file_day(file):
+    """@GPS day a Text_Files file belongs to
+
+    Segment files (<gpsStart>-<gpsEnd>.txt) and trip files (<gps>.txt)
+    belong to the day they start in; files named otherwise (e.g. after
+    an earthquake) to the day they were last written.
+
+    @param file
+        text file
+    """
+
+    name = os.path.basename(file)
+    if name.endswith(".txt"):
+        name = name[:-4]
+    try:
+        return int(name.split("-")[0]) // SECONDS_PER_DAY
+    except ValueError:
+        mtime = np.datetime64(os.stat(file).st_mtime_ns,'ns')
+        return int(seismon.gpstime.utc_to_gps(mtime)) // SECONDS_PER_DAY
+
+def write_archive(archiveFile,members):
+    """@write an archive
+
+    @param archiveFile
+        archive file
+    @param members
+        dictionary of member name -> bytes
+    """
+
+    index = {}
+    offset = 0
+    with seismon.backfill.atomic_write(archiveFile,"wb") as f:
+        for name in sorted(members):
+            data = members[name]
+            f.write(data)
+            index[name] = [offset, len(data), zlib.crc32(data)]
+            offset += len(data)
+        indexBytes = json.dumps(index,separators=(",",":")).encode("utf-8")
+        f.write(indexBytes)
+        f.write(_TRAILER.pack(len(indexBytes),MAGIC))
+        # the loose files are removed once this returns
+        f.flush()
+        os.fsync(f.fileno())
+
+def _open_archive(archiveFile):
+    """@(key, index, mapping) of an archive, cached until it changes on
+    disk (key identifies the archive file version)
+    """
+
+    try:
+        st = os.stat(archiveFile)
+    except FileNotFoundError:
+        _close_archive(archiveFile)
+        raise
+    key = (st.st_ino, st.st_mtime_ns, st.st_size)
+    cached = _ARCHIVES.get(archiveFile)
+    if cached is not None and cached[0] == key:
+        _ARCHIVES.move_to_end(archiveFile)
+        return cached
+    _close_archive(archiveFile)
+
+    with open(archiveFile,"rb") as f:
+        mapping = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+    try:
+        if len(mapping) < _TRAILER.size:
+            raise ValueError("%s is not an archive (too short)"%archiveFile)
+        indexLength, magic = _TRAILER.unpack(mapping[-_TRAILER.size:])
+        if magic != MAGIC or indexLength > len(mapping) - _TRAILER.size:
+            raise ValueError("%s is not an archive (bad trailer)"%archiveFile)
+        indexStart = len(mapping) - _TRAILER.size - indexLength
+        index = json.loads(mapping[indexStart:indexStart+indexLength].decode("utf-8"))
+    except ValueError:
+        mapping.close()
+        raise
+
+    _ARCHIVES[archiveFile] = (key, index, mapping)
+    while len(_ARCHIVES) > MAX_ARCHIVES:
+        _close_archive(next(iter(_ARCHIVES)))
+    return _ARCHIVES[archiveFile]
+
+def _close_archive(archiveFile):
+    """@unmap an archive and drop it from the cache, if it is there
+    """
+
+    cached = _ARCHIVES.pop(archiveFile,None)
+    if cached is not None:
+        # members are handed out as bytes copies, so nothing still
+        # points into the mapping
+        cached[2].close()
+
+def read_index(archiveFile):
+    """@index of an archive, name -> [offset, length, crc32]
+
+    @param archiveFile
+        archive file
+    """
+
+    return _open_archive(archiveFile)[1]
+
+def read_members(archiveFile):
+    """@every member of an archive, name -> bytes
+
+    @param archiveFile
+        archive file
+    """
+
+    key, index, mapping = _open_archive(archiveFile)
+    return dict((name, mapping[offset:offset+length]) for name, (offset, length, crc) in index.items())
+
+def verify_archive(archiveFile,members=None):
+    """@check every member of an archive against its crc32 (and against
+    the expected contents, if given); raises ValueError on a mismatch.
+
+    @param archiveFile
+        archive file
+    @param members
+        optional dictionary of member name -> bytes the archive must hold
+    """
+
+    key, index, mapping = _open_archive(archiveFile)
+    for name, (offset, length, crc) in index.items():
+        if offset + length > len(mapping) or zlib.crc32(mapping[offset:offset+length]) != crc:
+            raise ValueError("%s: member %s is corrupt"%(archiveFile,name))
+    if members is not None:
+        for name, data in members.items():
+            if not name in index or zlib.crc32(data) != index[name][2] or len(data) != index[name][1]:
+                raise ValueError("%s: member %s does not match"%(archiveFile,name))
+
+def _directory(directory,refresh=False):
+    """@(settled, archive files, name -> (archiveFile, key, offset, length))
+    of a directory, kept until the directory changes
+
+    A directory is settled when it was listed over a second after it last
+    changed; an unsettled one may have changed again since without its
+    (coarse) mtime moving on.
+    """
+
+    try:
+        mtime_ns = os.stat(directory).st_mtime_ns
+    except FileNotFoundError:
+        return True, [], {}
+    cached = _DIRECTORIES.get(directory)
+    if not refresh and cached is not None and cached[0] == mtime_ns:
+        return cached[1:]
+
+    archiveFiles = sorted(glob.glob(os.path.join(directory,"*"+ARCHIVE_SUFFIX)))
+    members = {}
+    # a name in more than one archive is taken from the latest day
+    for archiveFile in archiveFiles:
+        try:
+            key, index, mapping = _open_archive(archiveFile)
+        except FileNotFoundError:
+            continue
+        for name, (offset, length, crc) in index.items():
+            members[name] = (archiveFile, key, offset, length)
+    settled = time.time_ns() - mtime_ns > 1000000000
+    _DIRECTORIES[directory] = (mtime_ns, settled, archiveFiles, members)
+    return settled, archiveFiles, members
+
+def _member(file):
+    """@contents of the archive member standing in for a path, or None
+    """
+
+    directory, name = os.path.split(file)
+    for refresh in [False, True]:
+        settled, archiveFiles, members = _directory(directory,refresh=refresh)
+        if name in members:
+            archiveFile, key, offset, length = members[name]
+            try:
+                archiveKey, index, mapping = _open_archive(archiveFile)
+            except FileNotFoundError:
+                continue
+            if archiveKey == key:
+                return mapping[offset:offset+length]
+        elif settled:
+            return None
+    return None
+
+def archives(directory):
+    """@archive files in a directory, oldest day first
+
+    @param directory
+        Text_Files directory
+    """
+
+    return _directory(directory)[1]
+
+def list_files(directory,pattern="*.txt"):
+    """@sorted paths of the loose files and archive members matching a
+    pattern in a directory (the archive-aware glob)
+
+    @param directory
+        Text_Files directory
+    @param pattern
+        fnmatch pattern on the file names
+    """
+
+    files = set(glob.glob(os.path.join(directory,pattern)))
+    members = _directory(directory)[2]
+    if members:
+        for name in fnmatch.filter(members,pattern):
+            files.add(os.path.join(directory,name))
+    return sorted(files)
+
+def isfile(file):
+    """@whether a loose file or an archive member has this path
+
+    @param file
+        text file
+    """
+
+    return os.path.isfile(file) or _member(file) is not None
+
+def read_file(file):
+    """@contents of a loose file or archive member, as bytes
+
+    @param file
+        text file
+    """
+
+    try:
+        with open(file,"rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        # not written yet, or packed since
+        pass
+    data = _member(file)
+    if data is None:
+        raise IOError("%s not found"%file)
+    return data
+
+def loadtxt(file,**kwargs):
+    """@np.loadtxt of a loose file or archive member
+
+    @param file
+        text file
+    @param kwargs
+        passed on to np.loadtxt
+    """
+
+    return np.loadtxt(read_file(file).decode("latin-1").splitlines(),**kwargs)
+
+def compact_directory(directory,beforeDay,doRemove=True):
+    """@pack the loose text files of every day before beforeDay into that
+    day's archive, merging with an existing one
+
+    Loose files are removed only after the archive is written, synced and
+    verified, and only if they did not change while being packed.
+    Returns the number of files packed.
+
+    @param directory
+        Text_Files directory
+    @param beforeDay
+        first GPS day not to pack (days still being written)
+    @param doRemove
+        remove the packed loose files
+    """
+
+    days = {}
+    for file in glob.glob(os.path.join(directory,"*.txt")):
+        day = file_day(file)
+        if day < beforeDay:
+            days.setdefault(day,[]).append(file)
+
+    numFiles = 0
+    for day in sorted(days):
+        archiveFile = archive_filename(directory,day)
+        members = {}
+        if os.path.isfile(archiveFile):
+            members.update(read_members(archiveFile))
+
+        packed = {}
+        for file in days[day]:
+            st = os.stat(file)
+            with open(file,"rb") as f:
+                data = f.read()
+            members[os.path.basename(file)] = data
+            packed[file] = (st.st_mtime_ns, st.st_size, data)
+
+        write_archive(archiveFile,members)
+        verify_archive(archiveFile,dict((os.path.basename(file), packed[file][2]) for file in packed))
+
+        if doRemove:
+            for file, (mtime_ns, size, data) in packed.items():
+                st = os.stat(file)
+                if st.st_mtime_ns == mtime_ns and st.st_size == size:
+                    os.remove(file)
+        numFiles += len(packed)
+
+    return numFiles
+
+def compact_tree(dirPath,beforeDay,products=PRODUCTS,doRemove=True):
+    """@compact every directory below Text_Files/<product> for the given
+    products (see compact_directory)
+
+    Returns a list of (directory, number of files packed).
+
+    @param dirPath
+        seismon output directory
+    @param beforeDay
+        first GPS day not to pack
+    @param products
+        Text_Files products to compact
+    @param doRemove
+        remove the packed loose files
+    """
+
+    compacted = []
+    for product in products:
+        productDirectory = os.path.join(dirPath,"Text_Files",product)
+        for directory, dirnames, filenames in os.walk(productDirectory):
+            dirnames.sort()
+            if not any(filename.endswith(".txt") for filename in filenames):
+                continue
+            numFiles = compact_directory(directory,beforeDay,doRemove=doRemove)
+            if numFiles > 0:
+                compacted.append((directory, numFiles))
+    return compacted
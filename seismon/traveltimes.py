@@ -0,0 +1,336 @@
+#!/usr/bin/python
+
+"""Tabulated TauP travel times.
+
+First-P and first-S travel times are tabulated once over a
+(depth, epicentral distance) grid and saved as a compressed .npz; the
+table is then interpolated instead of calling TauP for every event.
+
+The first arrival jumps from one phase to another across the grid (p to
+P and Pn near the source, Pdiff to PKIKP near 158 deg, sP to S or SKiKP,
+...), so it is not interpolated itself.  The table holds the travel times
+of every phase that is the first P (resp. S) somewhere on the grid, each
+is interpolated on its own and the earliest taken.  Cells in which a
+phase that is first at one corner does not reach every corner (a branch
+starting or ending inside the cell) are answered by TauP instead.
+"""
+
+import os
+
+import numpy as np
+
+import seismon
+
+# process-wide cache of loaded tables, keyed by file path
+_table_cache = {}
+
+# process-wide cache of TauP models, keyed by model name
+_taup_models = {}
+
+def default_table_file(model="iasp91"):
+    """@path of the travel time table shipped with seismon.
+
+    @param model
+        TauP velocity model name
+    """
+
+    seismonpath = os.path.dirname(seismon.__file__)
+    return os.path.join(seismonpath,'input','traveltimes_%s.npz'%model)
+
+def taup_model(model="iasp91"):
+    """@TauP model (loaded once per process).
+
+    @param model
+        TauP velocity model name
+    """
+
+    if not model in _taup_models:
+        from obspy.taup import TauPyModel
+        _taup_models[model] = TauPyModel(model=model)
+    return _taup_models[model]
+
+def first_arrivals(arrivals):
+    """@first P and first S travel times of a TauP arrival list.
+
+    Follows the convention used throughout seismon: the first arrival
+    whose phase name starts with p (resp. s).  Missing phases are nan.
+
+    @param arrivals
+        obspy.taup arrivals
+    """
+
+    Ptime = np.nan
+    Stime = np.nan
+    for phase in arrivals:
+        if np.isnan(Ptime) and phase.name.lower()[0] == "p":
+            Ptime = phase.time
+        if np.isnan(Stime) and phase.name.lower()[0] == "s":
+            Stime = phase.time
+    return Ptime, Stime
+
+def table_from_arrivals(depths,degrees,arrivals,model="iasp91"):
+    """@travel time table from the TauP arrivals at each grid point.
+
+    @param depths
+        source depths [km]
+    @param degrees
+        epicentral distances [deg]
+    @param arrivals
+        arrivals[ii][jj] is the list of (phase name, time) at
+        depths[ii], degrees[jj], in order of time
+    @param model
+        TauP velocity model name
+    """
+
+    depths = np.asarray(depths, dtype=np.float64)
+    degrees = np.asarray(degrees, dtype=np.float64)
+
+    table = {}
+    table["depths"] = depths
+    table["degrees"] = degrees
+    table["model"] = model
+    for wave in ["P","S"]:
+        # the phases that are the first arrival somewhere
+        phases = []
+        for row in arrivals:
+            for point in row:
+                names = [name for name, time in point if name.lower()[0] == wave.lower()]
+                if names and not names[0] in phases:
+                    phases.append(names[0])
+
+        branches = np.full((len(phases),len(depths),len(degrees)),np.nan)
+        for ii, row in enumerate(arrivals):
+            for jj, point in enumerate(row):
+                for name, time in reversed(point):
+                    if name in phases:
+                        branches[phases.index(name),ii,jj] = time
+
+        table["%sphases"%wave] = np.array(phases, dtype=str)
+        table["%sbranches"%wave] = branches
+    _derive(table)
+    return table
+
+def _derive(table):
+    """@add the first arrival times and the cells interpolation is trusted
+    in to a table (in place)
+    """
+
+    for wave in ["P","S"]:
+        branches = table["%sbranches"%wave]
+        defined = np.isfinite(branches)
+        times = np.full(branches.shape[1:],np.nan)
+        first = np.full(branches.shape[1:],-1,dtype=np.int64)
+        if len(branches) > 0:
+            times = np.fmin.reduce(branches,axis=0)
+            first = np.where(np.any(defined,axis=0),np.argmin(np.where(defined,branches,np.inf),axis=0),-1)
+
+        # each branch defined at all four corners of a cell
+        whole = defined[:,:-1,:-1] & defined[:,1:,:-1] & defined[:,:-1,1:] & defined[:,1:,1:]
+        corners = [first[:-1,:-1], first[1:,:-1], first[:-1,1:], first[1:,1:]]
+        trusted = np.all([corner < 0 for corner in corners],axis=0)
+        if len(branches) > 0:
+            trusted |= np.all([(corner >= 0) & np.take_along_axis(whole,np.maximum(corner,0)[np.newaxis],axis=0)[0]
+                               for corner in corners],axis=0)
+
+        table["%stimes"%wave] = times
+        table["%strusted"%wave] = trusted
+
+def build_table(depths,degrees,model="iasp91"):
+    """@tabulate first P and S travel times with TauP.
+
+    @param depths
+        source depths [km]
+    @param degrees
+        epicentral distances [deg]
+    @param model
+        TauP velocity model name
+    """
+
+    taupModel = taup_model(model)
+
+    arrivals = []
+    for depth in depths:
+        arrivals.append([])
+        for degree in degrees:
+            points = taupModel.get_travel_times(source_depth_in_km=float(depth),
+                                                distance_in_degree=float(degree))
+            arrivals[-1].append([(phase.name, phase.time) for phase in points])
+    return table_from_arrivals(depths,degrees,arrivals,model=model)
+
+def save_table(file,table):
+    """@save travel time table as compressed npz.
+
+    @param file
+        output file
+    @param table
+        table from build_table
+    """
+
+    np.savez_compressed(file, depths=table["depths"], degrees=table["degrees"],
+                        Pphases=table["Pphases"], Pbranches=table["Pbranches"],
+                        Sphases=table["Sphases"], Sbranches=table["Sbranches"],
+                        model=np.array(table["model"]))
+
+def load_table(file=None):
+    """@load a travel time table (once per process).
+
+    Members of a compressed npz cannot be memory-mapped, so the table is
+    decompressed on first use and kept resident; it is re-read if the
+    file's mtime or size changes.
+
+    @param file
+        table file (defaults to the shipped iasp91 table)
+    """
+
+    if file is None:
+        file = default_table_file()
+
+    stat = os.stat(file)
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    cached = _table_cache.get(file)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    table = {}
+    with np.load(file, allow_pickle=False) as data:
+        for name in ["depths","degrees","Pbranches","Sbranches"]:
+            table[name] = np.ascontiguousarray(data[name], dtype=np.float64)
+        for name in ["Pphases","Sphases"]:
+            table[name] = data[name]
+        table["model"] = str(data["model"])
+    _derive(table)
+
+    _table_cache[file] = (key, table)
+    return table
+
+def _bracket(grid,values):
+    """@lower grid index and fractional offset of values (clipped to grid).
+    """
+
+    values = np.clip(values, grid[0], grid[-1])
+    index = np.searchsorted(grid, values, side='right') - 1
+    index = np.clip(index, 0, len(grid)-2)
+    frac = (values - grid[index]) / (grid[index+1] - grid[index])
+    return index, frac
+
+def interpolate(table,depth,degree):
+    """@interpolated first P and S travel times.
+
+    Any number of (depth, distance) queries are answered at once; inputs
+    broadcast against each other and are clipped to the table range.
+    Each phase is interpolated bilinearly and the earliest taken; queries
+    in cells where the first phase changes branch go to TauP.
+
+    @param table
+        table from load_table
+    @param depth
+        source depth [km]
+    @param degree
+        epicentral distance [deg]
+    """
+
+    depth, degree = np.broadcast_arrays(np.asarray(depth, dtype=np.float64),
+                                        np.asarray(degree, dtype=np.float64))
+    shape = depth.shape
+    depth = np.clip(depth.ravel(), table["depths"][0], table["depths"][-1])
+    degree = np.clip(degree.ravel(), table["degrees"][0], table["degrees"][-1])
+
+    ii, u = _bracket(table["depths"], depth)
+    jj, v = _bracket(table["degrees"], degree)
+
+    times = []
+    trusted = np.ones(depth.shape, dtype=bool)
+    for wave in ["P","S"]:
+        grid = table["%sbranches"%wave]
+        time = np.full(depth.shape, np.nan)
+        if len(grid) > 0:
+            time = np.fmin.reduce((1-u)*(1-v)*grid[:,ii,jj] + (1-u)*v*grid[:,ii,jj+1] +
+                                  u*(1-v)*grid[:,ii+1,jj] + u*v*grid[:,ii+1,jj+1], axis=0)
+        times.append(time)
+        trusted &= table["%strusted"%wave][ii,jj]
+
+    if not np.all(trusted):
+        taupModel = taup_model(table["model"])
+        for index in np.nonzero(~trusted)[0]:
+            arrivals = taupModel.get_travel_times(source_depth_in_km=depth[index],
+                                                  distance_in_degree=degree[index])
+            times[0][index], times[1][index] = first_arrivals(arrivals)
+    return times[0].reshape(shape), times[1].reshape(shape)
+
+# process-wide cache of the p.dat / s.dat lookup tables, keyed by directory
+_p_and_s_cache = {}
+
+def load_p_and_s(scriptpath=None,sidecar=False):
+    """@load the p.dat / s.dat arrival tables (once per process).
+
+    The tables are written by p_and_s/write_p_and_s.py with one row per
+    degree (1-180) and one column per depth (1-100 km).  They are parsed
+    once and kept resident, together with a RegularGridInterpolator for
+    each; they are re-read if either file's mtime or size changes.
+
+    @param scriptpath
+        directory holding p.dat and s.dat (defaults to seismon/input)
+    @param sidecar
+        read (and write) pre-parsed .npy copies next to the .dat files
+    """
+
+    from scipy.interpolate import RegularGridInterpolator
+
+    if scriptpath is None:
+        scriptpath = os.path.join(os.path.dirname(seismon.__file__),'input')
+
+    files = [os.path.join(scriptpath,'p.dat'),os.path.join(scriptpath,'s.dat')]
+    stats = [os.stat(file) for file in files]
+    key = tuple((stat.st_mtime_ns, stat.st_size) for stat in stats)
+
+    cached = _p_and_s_cache.get(scriptpath)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    arrivals = []
+    for file, stat in zip(files, stats):
+        sidecarFile = "%s.npy"%os.path.splitext(file)[0]
+        if sidecar and os.path.isfile(sidecarFile) and \
+            os.stat(sidecarFile).st_mtime_ns >= stat.st_mtime_ns:
+            data = np.load(sidecarFile, allow_pickle=False)
+        else:
+            data = np.loadtxt(file)
+            if sidecar:
+                try:
+                    np.save(sidecarFile, data)
+                except OSError:
+                    print("Could not write %s..."%sidecarFile)
+        arrivals.append(np.ascontiguousarray(data, dtype=np.float64))
+
+    table = {}
+    table["degrees"] = np.linspace(1,180,arrivals[0].shape[0])
+    table["depths"] = np.linspace(1,100,arrivals[0].shape[1])
+    table["Ptimes"], table["Stimes"] = arrivals
+    for name in ["Ptimes","Stimes"]:
+        table[name.replace("times","interp")] = RegularGridInterpolator(
+            (table["degrees"], table["depths"]), table[name])
+
+    _p_and_s_cache[scriptpath] = (key, table)
+    return table
+
+def p_and_s_times(table,depth,degree):
+    """@linear interpolation of the p.dat / s.dat arrival times.
+
+    Any number of (depth, distance) queries are answered at once; inputs
+    broadcast against each other and are clipped to the table range.
+
+    @param table
+        table from load_p_and_s
+    @param depth
+        source depth [km]
+    @param degree
+        epicentral distance [deg]
+    """
+
+    depth, degree = np.broadcast_arrays(np.asarray(depth, dtype=np.float64),
+                                        np.asarray(degree, dtype=np.float64))
+    points = np.stack((np.clip(degree, table["degrees"][0], table["degrees"][-1]),
+                       np.clip(depth, table["depths"][0], table["depths"][-1])),
+                      axis=-1)
+    return table["Pinterp"](points), table["Sinterp"](points)
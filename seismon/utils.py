@@ -1,6 +1,6 @@
 #!/usr/bin/python
 
-import os, sys, code, glob, optparse, shutil, warnings, matplotlib, pickle, math, copy, pickle, time
+import os, sys, code, glob, optparse, shutil, warnings, matplotlib, pickle, math, copy, pickle, time, json, gc
 import numpy as np
 import scipy.signal, scipy.stats, scipy.fftpack
 from collections import namedtuple
@@ -15,7 +15,7 @@ import __future__
 #import ligo.segments as segments
 
 import seismon.NLNM
-import seismon.eqmon
+import seismon.eqmon, seismon.backfill
 
 try:
     import gwpy.time, gwpy.timeseries, gwpy.plotter
@@ -158,18 +158,110 @@ def envelope(data):
     data = (data ** 2 + hilb ** 2) ** 0.5
     return data
 
-def read_eqmons(file):
-    """@read eqmon file, returning earthquakes
+def eqmons_sidecar(file):
+    """@binary sidecar written next to an eqmon file
 
     @param file
-        eqmon file
+        eqmon file (earthquakes.xml)
     """
 
-    attributeDics = []
+    return os.path.splitext(file)[0] + ".npz"
 
-    if not os.path.isfile(file):
-        print("Missing eqmon file: %s"%file)
-        return attributeDics
+def eqmon_text_value(value):
+    """@a value as it comes back from an eqmon file (float, text or None)
+
+    @param value
+        attribute value
+    """
+
+    text = str(value)
+    if text == "":
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+def write_eqmons_sidecar(file,attributeDics):
+    """@write the binary sidecar of an eqmon file
+
+    Holds what read_eqmons gets out of the xml: the attributes as json
+    (converted like the xml text) and every traveltime array
+    concatenated into one float64 column with the array lengths.
+
+    @param file
+        eqmon file (earthquakes.xml)
+    @param attributeDics
+        list of eqmon structures
+    """
+
+    events = []
+    lengths = []
+    values = []
+    for attributeDic in attributeDics:
+        attributes = {}
+        for key, value in attributeDic.items():
+            if not key == "traveltimes":
+                attributes[key] = eqmon_text_value(value)
+        traveltimes = []
+        for key, value in attributeDic["traveltimes"].items():
+            for category in value:
+                array = np.asarray(value[category], dtype=np.float64).ravel()
+                lengths.append(len(array))
+                values.append(array)
+            traveltimes.append([key, list(value)])
+        events.append({"attributes": attributes, "traveltimes": traveltimes})
+
+    if values:
+        values = np.concatenate(values)
+    else:
+        values = np.zeros(0)
+    eventsText = json.dumps(events).encode('utf-8')
+
+    with seismon.backfill.atomic_write(eqmons_sidecar(file),"wb") as f:
+        np.savez(f, events=np.frombuffer(eventsText, dtype=np.uint8),
+                 lengths=np.array(lengths, dtype=np.int64), values=values)
+
+def read_eqmons_sidecar(sidecarFile):
+    """@eqmon structures stored in a binary sidecar
+
+    @param sidecarFile
+        sidecar file (earthquakes.npz)
+    """
+
+    with np.load(sidecarFile, allow_pickle=False) as data:
+        events = json.loads(data["events"].tobytes().decode('utf-8'))
+        lengths = data["lengths"].tolist()
+        values = data["values"].tolist()
+
+    # millions of small lists and nothing cyclic: keep the collector out
+    gcEnabled = gc.isenabled()
+    gc.disable()
+    try:
+        attributeDics = []
+        index = 0
+        offset = 0
+        for event in events:
+            attributeDic = event["attributes"]
+            attributeDic["traveltimes"] = {}
+            for key, categories in event["traveltimes"]:
+                attributeDic["traveltimes"][key] = {}
+                for category in categories:
+                    attributeDic["traveltimes"][key][category] = values[offset:offset+lengths[index]]
+                    offset = offset + lengths[index]
+                    index = index + 1
+            attributeDics.append(attributeDic)
+    finally:
+        if gcEnabled:
+            gc.enable()
+    return attributeDics
+
+def read_eqmons_xml(file):
+    """@yield the eqmon structures stored in an eqmon file
+
+    @param file
+        eqmon file
+    """
 
     tree = etree.parse(file)
     baseroot = tree.getroot()       # get the document root
@@ -189,6 +281,32 @@ def read_eqmons(file):
                     attributeDic[element.tag] = float(element.text)
                 except:
                     attributeDic[element.tag] = element.text
+        yield attributeDic
+
+def read_eqmons(file):
+    """@read eqmon file, returning earthquakes
+
+    The binary sidecar written by seismon.eqmon.write_info is used
+    instead of the xml when it is at least as new.
+
+    @param file
+        eqmon file
+    """
+
+    attributeDics = []
+
+    if not os.path.isfile(file):
+        print("Missing eqmon file: %s"%file)
+        return attributeDics
+
+    sidecarFile = eqmons_sidecar(file)
+    if os.path.isfile(sidecarFile) and \
+       os.stat(sidecarFile).st_mtime_ns >= os.stat(file).st_mtime_ns:
+        events = read_eqmons_sidecar(sidecarFile)
+    else:
+        events = read_eqmons_xml(file)
+
+    for attributeDic in events:
 
         magThreshold = 0
         if not "Magnitude" in attributeDic or attributeDic["Magnitude"] < magThreshold:
@@ -296,6 +414,21 @@ def html_bgcolor(snr,data):
 
     data = np.append(data,snr)
 
+    data = np.sort(data)
+    itemIndex = np.where(data==snr)
+
+    # Determine significance of snr (between 0 and 1)
+    snrSig = itemIndex[0][0] / float(len(data)+1)
+
+    return snrSig, html_bgcolor_sig(snrSig)
+
+def html_bgcolor_sig(snrSig):
+    """@calculate html color of a significance
+
+    @param snrSig
+        significance between 0 and 1
+    """
+
     # Number of colors in array
     N = 256
 
@@ -307,21 +440,15 @@ def html_bgcolor(snr,data):
         b = int(round((b* 255),0))
         colormap.append((r,g,b))
 
-    data = np.sort(data)
-    itemIndex = np.where(data==snr)
-
-    # Determine significance of snr (between 0 and 1)
-    snrSig = itemIndex[0][0] / float(len(data)+1)
-
     # Determine color index of this significance
-    index = int(np.floor(N * snrSig))
+    index = min(int(np.floor(N * snrSig)),N-1)
 
     # Return colors of this index
     thisColor = colormap[index]
     # Return rgb string containing these colors
     bgcolor = "rgb(%d,%d,%d)"%(thisColor[0],thisColor[1],thisColor[2])
 
-    return snrSig, bgcolor
+    return bgcolor
 
 def html_hexcolor(snr,data):
     """@calculate html color
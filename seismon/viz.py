@@ -7,7 +7,7 @@ import scipy.signal, scipy.stats, scipy.fftpack, scipy.ndimage.filters
 from collections import namedtuple
 from operator import itemgetter
 import seismon.NLNM, seismon.html
-import seismon.eqmon
+import seismon.eqmon, seismon.psdstore
 
 import bokeh.objects, bokeh.glyphs, bokeh.plotting
 
@@ -110,52 +110,14 @@ def earthquakes_plot(params,channel,sess):
 
 def psd_plot(params,channel,sess):
 
-    psdLocation = params["dirPath"] + "/Text_Files/PSD/" + channel.station_underscore
-    psdLocation = os.path.join(psdLocation,str(params["fftDuration"]))
-    files = glob.glob(os.path.join(psdLocation,"*.txt"))
-
-    files = sorted(files)
-
-    ttStart = []
-    ttEnd = []
-    amp = []
+    store = seismon.psdstore.psd_store(params,channel)
+    ttStart, ttEnd, thisFreq, spectra = store.read_segments(params["gpsStart"],params["gpsEnd"])
 
     # Break up entire frequency band into 6 segments
     ff_ave = [1/float(128), 1/float(64),  0.1, 1, 3, 5, 10]
 
-    for file in files:
-
-        fileSplit = file.split("/")
-        txtFile = fileSplit[-1].replace(".txt","")
-        txtFileSplit = txtFile.split("-")
-        thisTTStart = int(txtFileSplit[0])
-        thisTTEnd = int(txtFileSplit[1])
-
-        if (thisTTStart < params["gpsStart"]) or (thisTTEnd > params["gpsEnd"]):
-            continue
-
-        ttStart.append(thisTTStart)
-        ttEnd.append(thisTTEnd)
-
-        data = np.loadtxt(file)
-        thisSpectra = data[:,1]
-        thisFreq = data[:,0]
-
-        freqAmps = []
-
-        for i in range(len(ff_ave)-1):
-            newSpectraNow = []
-            for j in range(len(thisFreq)):
-                if ff_ave[i] <= thisFreq[j] and thisFreq[j] <= ff_ave[i+1]:
-                    newSpectraNow.append(thisSpectra[j])
-            freqAmps.append(np.mean(newSpectraNow))
-
-        thisAmp = freqAmps[1]
-        amp.append(thisAmp)
-
-    ttStart = np.array(ttStart)
-    ttEnd = np.array(ttEnd)
-    amp = np.array(amp)
+    # mean over the second band
+    amp = seismon.eqmon.psd_band_means(thisFreq,spectra,ff_ave)[:,1]
 
     gps = (ttStart - 1056672016.0) / 86400.0
     amp = np.log10(amp)